@@ -1,30 +1,232 @@
+import codecs
 import json
 import os
-import boto3
+import time
+import aws_clients
 from datetime import datetime
+from interactive import get_management_client, get_request_id, hand_off, put_once, store_event
 
 # Initialize Bedrock Agent Runtime client
-bedrock_agent_runtime = boto3.client('bedrock-agent-runtime', region_name='us-east-1')
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+bedrock_agent_runtime = aws_clients.client('bedrock-agent-runtime', region_name='us-east-1')
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
 
 # Agent configuration
 AGENT_ID = os.environ.get('AGENT_ID', '8W0ULUYHAE')
 AGENT_ALIAS_ID = os.environ.get('AGENT_ALIAS_ID', 'I84EATXKU5')
 
+# Trace steps kept on the stored transcript
+MAX_TRACE_STEPS = 50
+
+def summarize_trace(trace_event):
+    """Reduce an agent trace event to {'step', ...} without prompt or rationale text"""
+    trace = trace_event.get('trace', {})
+
+    if 'orchestrationTrace' in trace:
+        orchestration = trace['orchestrationTrace']
+        if 'invocationInput' in orchestration:
+            invocation = orchestration['invocationInput']
+            action = invocation.get('actionGroupInvocationInput', {})
+            knowledge_base = invocation.get('knowledgeBaseLookupInput', {})
+            return {
+                'step': 'invocation',
+                'type': invocation.get('invocationType'),
+                'name': action.get('actionGroupName') or knowledge_base.get('knowledgeBaseId'),
+                'function': action.get('function') or action.get('apiPath')
+            }
+        if 'observation' in orchestration:
+            return {'step': 'observation', 'type': orchestration['observation'].get('type')}
+        if 'rationale' in orchestration:
+            return {'step': 'rationale'}
+        if 'modelInvocationInput' in orchestration:
+            return {'step': 'model_input'}
+        if 'modelInvocationOutput' in orchestration:
+            return {'step': 'model_output'}
+
+    if 'failureTrace' in trace:
+        return {'step': 'failure', 'reason': trace['failureTrace'].get('failureReason')}
+    if 'guardrailTrace' in trace:
+        return {'step': 'guardrail', 'action': trace['guardrailTrace'].get('action')}
+    if 'preProcessingTrace' in trace:
+        return {'step': 'preprocessing'}
+    if 'postProcessingTrace' in trace:
+        return {'step': 'postprocessing'}
+    return None
+
+def stream_agent(message, session_id, on_event=None):
+    """
+    Invoke the agent and decode its event stream incrementally.
+
+    on_event(kind, data) is called with ('delta', text) as each chunk decodes
+    and ('trace', step) for each trace step. Returns (response_text, timing)
+    where timing holds per-chunk latency and the trace steps.
+    """
+    start = time.monotonic()
+    response = bedrock_agent_runtime.invoke_agent(
+        agentId=AGENT_ID,
+        agentAliasId=AGENT_ALIAS_ID,
+        sessionId=session_id,
+        inputText=message,
+        enableTrace=True
+    )
+
+    # Chunks can split a multi-byte character; the incremental decoder holds the partial bytes
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    parts = []
+    chunks = []
+    trace = []
+    last = start
+
+    for stream_event in response.get('completion', []):
+        now = time.monotonic()
+        elapsed_ms = int((now - start) * 1000)
+
+        if 'chunk' in stream_event:
+            data = stream_event['chunk'].get('bytes', b'')
+            text = decoder.decode(data)
+            chunks.append({'elapsedMs': elapsed_ms, 'gapMs': int((now - last) * 1000), 'bytes': len(data)})
+            last = now
+            if text:
+                parts.append(text)
+                if on_event:
+                    on_event('delta', text)
+
+        elif 'trace' in stream_event:
+            step = summarize_trace(stream_event['trace'])
+            if step:
+                step['elapsedMs'] = elapsed_ms
+                trace.append(step)
+                if on_event:
+                    on_event('trace', step)
+
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        parts.append(tail)
+        if on_event:
+            on_event('delta', tail)
+
+    timing = {
+        'timeToFirstChunkMs': chunks[0]['elapsedMs'] if chunks else None,
+        'totalMs': int((time.monotonic() - start) * 1000),
+        'chunkCount': len(chunks)
+    }
+    print(f"⏱️ Agent stream: first chunk {timing['timeToFirstChunkMs']}ms, "
+          f"{len(chunks)} chunks, {len(trace)} trace steps, complete {timing['totalMs']}ms")
+    return ''.join(parts), dict(timing, chunks=chunks, trace=trace)
+
+def transcript_item(user_id, message, agent_response, session_id, timing, request_id):
+    """DynamoDB item for the finished exchange"""
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    item = {
+        'PK': f'USER#{user_id}',
+        'SK': f'CHAT#{timestamp}',
+        'type': 'CHAT',
+        'userId': user_id,
+        'userMessage': message,
+        'aiResponse': agent_response,
+        'sessionId': session_id,
+        'agentId': AGENT_ID,
+        'timestamp': timestamp,
+        'source': 'bedrock-agent',
+        'latency': {
+            'timeToFirstChunkMs': timing['timeToFirstChunkMs'],
+            'totalMs': timing['totalMs'],
+            'chunkCount': timing['chunkCount']
+        },
+        'trace': timing['trace'][:MAX_TRACE_STEPS]
+    }
+    if request_id:
+        item['requestId'] = request_id
+    return item
+
+def handle_websocket(event):
+    """
+    WebSocket route: {"action": "agentChat", "userId", "message", "sessionId"}.
+    Sends {"type": "delta", "text"} frames as chunks decode, {"type": "trace",
+    "trace"} frames when the agent calls an action group, then {"type": "done"}.
+    """
+    request_context = event['requestContext']
+    if request_context.get('routeKey') in ('$connect', '$disconnect'):
+        return {'statusCode': 200}
+
+    connection_id = request_context['connectionId']
+    client = get_management_client(request_context)
+    state = {'connected': True}
+
+    def send(frame):
+        if not state['connected']:
+            return
+        try:
+            client.post_to_connection(ConnectionId=connection_id, Data=json.dumps(frame).encode('utf-8'))
+        except client.exceptions.GoneException:
+            # Client went away; finish the turn so the transcript is still stored
+            print(f"⚠️ WebSocket {connection_id} closed mid-stream")
+            state['connected'] = False
+
+    def on_event(kind, data):
+        if kind == 'delta':
+            send({'type': 'delta', 'text': data})
+        elif data['step'] in ('invocation', 'failure'):
+            # Tool calls are the slow part; let the client show what the agent is doing
+            send({'type': 'trace', 'trace': data})
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+        user_id = body.get('userId', 'demo-user')
+        message = body.get('message', '')
+        session_id = body.get('sessionId', f"{user_id}-{datetime.utcnow().strftime('%Y%m%d')}")
+
+        if not message:
+            send({'type': 'error', 'error': 'message is required'})
+            return {'statusCode': 400}
+
+        print(f"Agent chat stream - User: {user_id}, Session: {session_id}")
+        agent_response, timing = stream_agent(message, session_id, on_event)
+
+        request_id = get_request_id(body)
+        item = transcript_item(user_id, message, agent_response, session_id, timing, request_id)
+        send({
+            'type': 'done',
+            'response': agent_response,
+            'sessionId': session_id,
+            'timestamp': item['timestamp'],
+            'timeToFirstChunkMs': timing['timeToFirstChunkMs'],
+            'totalMs': timing['totalMs']
+        })
+        # The client already has the reply, so the transcript is stored inline
+        put_once(table, item, request_id)
+        return {'statusCode': 200}
+
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        send({'type': 'error', 'error': str(e)})
+        return {'statusCode': 500}
+
 def lambda_handler(event, context):
     """
     Bedrock Agent chat handler
     Uses AWS Bedrock Agents for orchestrated AI conversations
+
+    HTTP requests get the whole reply in one response; requests on the
+    WebSocket API get it streamed chunk by chunk.
     """
+    if event.get('requestContext', {}).get('connectionId'):
+        return handle_websocket(event)
+
+    if 'persist' in event:
+        # Transcript queued by an earlier HTTP turn
+        store_event(event, table)
+        return {'statusCode': 200}
+
     try:
         # Parse request
         body = json.loads(event.get('body', '{}')) if isinstance(event.get('body'), str) else event
-        
+
         user_id = body.get('userId', 'demo-user')
         message = body.get('message', '')
         session_id = body.get('sessionId', f"{user_id}-{datetime.utcnow().strftime('%Y%m%d')}")
-        
+
         if not message:
             return {
                 'statusCode': 400,
@@ -36,48 +238,20 @@ def lambda_handler(event, context):
                 },
                 'body': json.dumps({'error': 'message is required'})
             }
-        
+
         print(f"Agent chat request - User: {user_id}, Session: {session_id}")
-        
+
         # Invoke Bedrock Agent
-        response = bedrock_agent_runtime.invoke_agent(
-            agentId=AGENT_ID,
-            agentAliasId=AGENT_ALIAS_ID,
-            sessionId=session_id,
-            inputText=message
-        )
-        
-        # Process streaming response
-        agent_response = ""
-        event_stream = response.get('completion', [])
-        
-        for event in event_stream:
-            if 'chunk' in event:
-                chunk = event['chunk']
-                if 'bytes' in chunk:
-                    agent_response += chunk['bytes'].decode('utf-8')
-        
+        agent_response, timing = stream_agent(message, session_id)
+
         print(f"Agent response length: {len(agent_response)}")
-        
-        # Store conversation in DynamoDB
-        timestamp = datetime.utcnow().isoformat() + 'Z'
-        try:
-            table.put_item(Item={
-                'PK': f'USER#{user_id}',
-                'SK': f'CHAT#{timestamp}',
-                'type': 'CHAT',
-                'userId': user_id,
-                'userMessage': message,
-                'aiResponse': agent_response,
-                'sessionId': session_id,
-                'agentId': AGENT_ID,
-                'timestamp': timestamp,
-                'source': 'bedrock-agent'
-            })
-        except Exception as e:
-            print(f"Error storing chat: {e}")
-        
-        return {
+
+        # Store the transcript in an async invocation, off the reply path
+        request_id = get_request_id(body)
+        item = transcript_item(user_id, message, agent_response, session_id, timing, request_id)
+        hand_off(context, table, item, request_id)
+
+        response = {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
@@ -89,15 +263,16 @@ def lambda_handler(event, context):
                 'response': agent_response,
                 'sessionId': session_id,
                 'agentId': AGENT_ID,
-                'timestamp': timestamp
+                'timestamp': item['timestamp']
             })
         }
-        
+        return response
+
     except Exception as e:
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
-        
+
         return {
             'statusCode': 500,
             'headers': {
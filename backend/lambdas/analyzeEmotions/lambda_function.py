@@ -1,9 +1,626 @@
+import hashlib
 import json
+import math
 import os
-import boto3
+import re
+import threading
+import time
+import unicodedata
+import aws_clients
+from risk_screen import compile_terms, screen_message
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
+bedrock = aws_clients.client('bedrock-runtime', region_name='us-east-1')
+cache_table = aws_clients.table(os.environ.get('EMOTION_CACHE_TABLE', 'MindMate-EmotionCache'))
+
+MODEL_ID = 'anthropic.claude-3-haiku-20240307-v1:0'
+TEMPERATURE = 0.3  # Lower temperature for more consistent analysis
+
+# Bedrock prompt for emotion analysis
+SYSTEM_PROMPT = """You are an expert mental health AI that analyzes text for emotional indicators and mental health signals.
+
+Analyze the user's message and return a JSON response with:
+1. Primary emotion (sad, anxious, hopeless, angry, neutral, happy, etc.)
+2. Sentiment (negative, neutral, positive) 
+3. Risk indicators (crisis_language, isolation, hopelessness, etc.)
+4. Confidence score (0-100)
+5. Brief explanation
+
+CRITICAL: Pay attention to context. "not feeling good" is NEGATIVE, not positive.
+
+Example response format:
+{
+  "primary_emotion": "sad",
+  "sentiment": "negative", 
+  "risk_indicators": ["low_mood", "distress"],
+  "confidence": 85,
+  "explanation": "User expresses negative feelings and low mood"
+}
+
+Be accurate and contextually aware. Focus on mental health indicators."""
+
+USER_TEMPLATE = "Analyze this message for emotions and mental health indicators: '{message}'"
+
+# Cached results are keyed on the prompt version, so editing the prompt or model invalidates them;
+# bump EMOTION_CACHE_GENERATION to drop every cached result without a prompt change
+PROMPT_VERSION = hashlib.sha256(
+    json.dumps([MODEL_ID, TEMPERATURE, SYSTEM_PROMPT, USER_TEMPLATE]).encode('utf-8')
+).hexdigest()[:12]
+CACHE_GENERATION = os.environ.get('EMOTION_CACHE_GENERATION', '1')
+
+# Two tiers: an LRU in this container, then a DynamoDB table whose items expire by TTL
+CACHE_SIZE = int(os.environ.get('EMOTION_CACHE_SIZE', '1024'))
+CACHE_TTL_SECONDS = int(os.environ.get('EMOTION_CACHE_TTL_HOURS', '168')) * 3600
+CACHE_MAX_CHARS = 500  # long messages rarely repeat; not worth a cache slot
+_cache = OrderedDict()
+_source_stats = {'local': 0, 'cache-memory': 0, 'cache-table': 0, 'bedrock': 0}
+
+def normalize_message(message):
+    """Case, whitespace, punctuation and Unicode form folded so repeated check-ins share a key"""
+    text = unicodedata.normalize('NFKC', message).lower().replace('\u2019', "'")
+    text = re.sub(r"[^\w' ]+", ' ', text)
+    return ' '.join(text.split())
+
+def cache_key(normalized):
+    """Hash of the normalized message and prompt version; the message itself is never stored"""
+    return hashlib.sha256(f"{PROMPT_VERSION}:{CACHE_GENERATION}:{normalized}".encode('utf-8')).hexdigest()
+
+def cache_get(key):
+    """Cached emotion data and the tier it came from ('memory' or 'table'), or (None, 'miss')"""
+    now = time.time()
+    entry = _cache.get(key)
+    if entry and entry[1] > now:
+        _cache.move_to_end(key)
+        return entry[0], 'memory'
+
+    try:
+        item = cache_table.get_item(Key={'cacheKey': key}).get('Item')
+        # TTL deletion lags expiry, so check it here too
+        if item and int(item['ttl']) > now:
+            emotion_data = json.loads(item['emotionData'])
+            cache_remember(key, emotion_data, int(item['ttl']))
+            return emotion_data, 'table'
+    except Exception as e:
+        print(f"⚠️ Emotion cache read failed: {e}")
+    return None, 'miss'
+
+def cache_remember(key, emotion_data, expires_at):
+    _cache[key] = (emotion_data, expires_at)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+def cache_put_async(key, emotion_data):
+    """Store a fresh result in both tiers; the table write runs on a thread the caller joins"""
+    expires_at = int(time.time()) + CACHE_TTL_SECONDS
+    cache_remember(key, emotion_data, expires_at)
+
+    def store():
+        try:
+            cache_table.put_item(Item={
+                'cacheKey': key,
+                'emotionData': json.dumps(emotion_data),
+                'promptVersion': PROMPT_VERSION,
+                'ttl': expires_at
+            })
+        except Exception as e:
+            print(f"⚠️ Emotion cache write failed: {e}")
+
+    thread = threading.Thread(target=store, daemon=True)
+    thread.start()
+    return thread
+
+def emit_analysis_metric(source, elapsed_ms):
+    """One CloudWatch embedded-metric log line per message: Analyses and LatencyMs by Source"""
+    _source_stats[source] += 1
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': 'MindMate/EmotionAnalysis',
+                'Dimensions': [['Source']],
+                'Metrics': [{'Name': 'Analyses', 'Unit': 'Count'}, {'Name': 'LatencyMs', 'Unit': 'Milliseconds'}]
+            }]
+        },
+        'Source': source,
+        'Analyses': 1,
+        'LatencyMs': elapsed_ms,
+        'promptVersion': PROMPT_VERSION,
+        'containerStats': dict(_source_stats)
+    }))
+
+# ---------------------------------------------------------------------------
+# Local pre-classifier: confidently neutral or positive messages skip Bedrock
+# ---------------------------------------------------------------------------
+
+LOCAL_CLASSIFIER = os.environ.get('LOCAL_CLASSIFIER', 'on') == 'on'
+LOCAL_CONFIDENCE = float(os.environ.get('LOCAL_CLASSIFIER_CONFIDENCE', '0.85'))
+
+# Risk language the local classifier never judges itself. Messages the chat screen
+# (risk_screen.screen_message) flags for crisis, despair or isolation go to Bedrock too.
+RISK_TERMS = [
+    'hopeless', 'pointless', 'give up', 'giving up', "can't go on", 'cant go on', 'worthless', 'no point',
+    'alone', 'lonely', 'nobody cares', 'no one cares', 'no one understands', 'isolated', 'panic',
+    "can't breathe", 'cant breathe', 'empty', 'numb', 'trapped', 'burden', 'disappear', 'crying',
+    'kms', 'kys', 'goodbye', 'farewell', 'last message', 'meds', 'medication', 'pills', 'plan to',
+    'end it', 'ending it'
+]
+
+# Same substring matcher as chat screening, so both agree on what a term matches
+RISK_PATTERN = compile_terms(RISK_TERMS)
+
+# Sentiment lexicon: word -> (valence, emotion reported when it is the strongest positive word)
+LEXICON = {
+    'good': (1, 'happy'), 'great': (2, 'happy'), 'amazing': (2, 'excited'), 'awesome': (2, 'excited'),
+    'wonderful': (2, 'happy'), 'fantastic': (2, 'excited'), 'happy': (2, 'happy'), 'glad': (1, 'happy'),
+    'excited': (2, 'excited'), 'love': (1, 'happy'), 'loved': (1, 'happy'), 'fun': (1, 'happy'),
+    'grateful': (2, 'grateful'), 'thankful': (2, 'grateful'), 'thanks': (1, 'grateful'),
+    'thank': (1, 'grateful'), 'proud': (2, 'happy'), 'relaxed': (1, 'happy'), 'calm': (1, 'happy'),
+    'peaceful': (1, 'happy'), 'better': (1, 'happy'), 'productive': (1, 'happy'), 'nice': (1, 'happy'),
+    'enjoyed': (1, 'happy'), 'energized': (1, 'excited'), 'hopeful': (1, 'happy'),
+    'bad': (-1, None), 'sad': (-2, None), 'tired': (-1, None), 'exhausted': (-2, None),
+    'stressed': (-2, None), 'anxious': (-2, None), 'worried': (-1, None), 'angry': (-2, None),
+    'upset': (-2, None), 'awful': (-2, None), 'terrible': (-2, None), 'horrible': (-2, None),
+    'depressed': (-2, None), 'down': (-1, None), 'scared': (-2, None), 'afraid': (-2, None),
+    'overwhelmed': (-2, None), 'frustrated': (-1, None), 'hurt': (-2, None), 'hate': (-2, None),
+    'sick': (-1, None), 'lost': (-1, None), 'confused': (-1, None), 'meh': (-1, None), 'fine': (-1, None)
+}
+# Greetings and small talk; plainly neutral on their own
+NEUTRAL_WORDS = {'hi', 'hello', 'hey', 'ok', 'okay', 'morning', 'evening', 'afternoon', 'yes', 'sure', 'cool'}
+NEGATIONS = {'not', 'no', 'never', 'nothing', 'hardly', 'barely', 'without'}
+NEGATION_SCOPE = 3
+# Function words and check-in filler that carry no risk on their own
+STOP_WORDS = {
+    'i', "i'm", 'im', 'me', 'my', 'you', 'we', 'it', "it's", 'its', 'is', 'am', 'are', 'was', 'be', 'been',
+    'a', 'an', 'the', 'and', 'so', 'very', 'really', 'quite', 'pretty', 'just', 'too', 'all', 'much',
+    'feel', 'feeling', 'felt', 'today', 'day', 'now', 'this', 'that', 'had', 'have', 'having',
+    'lot', 'bit', 'of', 'for', 'with', 'at', 'in', 'on', 'everyone', 'there', 'how', 'what'
+}
+# Most messages need every token to be known: words outside the lexicon are what
+# change a message's meaning ("great, going to end things tonight", "happy forever").
+# Messages of at most SHORT_MESSAGE_TOKENS need every token known whatever the coverage setting.
+LOCAL_MIN_COVERAGE = float(os.environ.get('LOCAL_CLASSIFIER_MIN_COVERAGE', '0.9'))
+SHORT_MESSAGE_TOKENS = 3
+
+# Linear model over lexicon features; P(low risk) = sigmoid(w . x). Messages with a
+# negative cue or too many unknown words never reach it; within the rest, every
+# unknown word and every token past the eighth pulls the score towards Bedrock.
+LOCAL_WEIGHTS = {
+    'bias': 0.5, 'positive': 1.6, 'neutral': 1.5, 'negative': -4.0,
+    'negation': -1.0, 'question': -0.4, 'unknown': -1.5, 'extra_tokens': -0.15
+}
+
+def local_features(normalized):
+    """Lexicon counts with negation flipping the valence of the next few words"""
+    features = {
+        'bias': 1, 'positive': 0, 'neutral': 0, 'negative': 0, 'negation': 0, 'question': 0,
+        'unknown': 0, 'extra_tokens': 0
+    }
+    best = (0, None)
+    negate = 0
+    tokens = normalized.split()
+    for token in tokens:
+        if token in NEGATIONS or token.endswith("n't"):
+            features['negation'] += 1
+            negate = NEGATION_SCOPE
+            continue
+        valence, emotion = LEXICON.get(token, (0, None))
+        if negate:
+            valence = -valence
+            negate -= 1
+        if valence > 0:
+            features['positive'] += valence
+            if emotion and valence > best[0]:
+                best = (valence, emotion)
+        elif valence < 0:
+            features['negative'] -= valence
+        elif token in NEUTRAL_WORDS:
+            features['neutral'] += 1
+        elif token not in LEXICON and token not in STOP_WORDS:
+            features['unknown'] += 1
+    features['extra_tokens'] = max(len(tokens) - 8, 0)
+    return features, best[1]
+
+def covered(unknown, n_tokens):
+    """Whether enough of the message is known words for the local model to judge it"""
+    if n_tokens <= SHORT_MESSAGE_TOKENS:
+        return unknown == 0
+    return (n_tokens - unknown) / n_tokens >= LOCAL_MIN_COVERAGE
+
+def classify_locally(message, normalized):
+    """
+    Emotion data in the Bedrock response shape for confidently neutral or
+    positive messages; None when the message must go to Bedrock (anything
+    the chat screen flags, other risk language, any negative cue, words
+    outside the lexicon, or low confidence).
+    """
+    if not LOCAL_CLASSIFIER or not normalized:
+        return None
+    # 'flagged' covers crisis language as well as despair and isolation
+    if screen_message(normalized)['flagged'] or RISK_PATTERN.search(normalized):
+        return None
+    
+    features, emotion = local_features(normalized)
+    features['question'] = int('?' in message)
+    if features['negative']:
+        return None
+    if not covered(features['unknown'], len(normalized.split())):
+        return None
+    
+    z = sum(LOCAL_WEIGHTS[name] * value for name, value in features.items())
+    p_low_risk = 1 / (1 + math.exp(-z))
+    if p_low_risk < LOCAL_CONFIDENCE:
+        return None
+    
+    positive = features['positive'] > 0
+    return {
+        "primary_emotion": emotion if positive else "neutral",
+        "sentiment": "positive" if positive else "neutral",
+        "risk_indicators": [],
+        "confidence": int(p_low_risk * 100),
+        "explanation": "Local classifier: " + ("positive language, no risk cues" if positive else "small talk, no risk cues")
+    }
+
+def analyze_with_bedrock(user_message):
+    """Emotion JSON from Claude; returns (emotion_data, parsed) where parsed is False for the fallback"""
+    bedrock_body = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 300,
+        "system": SYSTEM_PROMPT,
+        "messages": [
+            {
+                "role": "user",
+                "content": USER_TEMPLATE.format(message=user_message)
+            }
+        ],
+        "temperature": TEMPERATURE
+    }
+    
+    response = bedrock.invoke_model(
+        modelId=MODEL_ID,
+        body=json.dumps(bedrock_body)
+    )
+    
+    response_body = json.loads(response['body'].read())
+    ai_response = response_body['content'][0]['text']
+    
+    # Parse JSON response from Claude
+    try:
+        # Extract JSON from response (Claude sometimes adds extra text)
+        json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group()), True
+        # Fallback if JSON parsing fails
+        return {
+            "primary_emotion": "unknown",
+            "sentiment": "neutral",
+            "risk_indicators": [],
+            "confidence": 50,
+            "explanation": "Could not parse emotion analysis"
+        }, False
+    except:
+        # Fallback parsing
+        return {
+            "primary_emotion": "unknown", 
+            "sentiment": "neutral",
+            "risk_indicators": [],
+            "confidence": 50,
+            "explanation": "Error parsing emotion analysis"
+        }, False
+
+def get_emotion_data(user_message):
+    """
+    Emotion data for a message. Confidently low-risk messages are classified
+    locally; the rest come from the cache when this normalized message was
+    analyzed under the current prompt version, else from Bedrock. Returns
+    (emotion_data, source, writer); join writer (if any) before returning.
+    """
+    start = time.monotonic()
+    normalized = normalize_message(user_message)
+    
+    emotion_data = classify_locally(user_message, normalized)
+    if emotion_data:
+        emit_analysis_metric('local', int((time.monotonic() - start) * 1000))
+        return emotion_data, 'local', None
+    
+    cacheable = 0 < len(normalized) <= CACHE_MAX_CHARS
+    if cacheable:
+        key = cache_key(normalized)
+        emotion_data, tier = cache_get(key)
+        if emotion_data is not None:
+            emit_analysis_metric(f'cache-{tier}', int((time.monotonic() - start) * 1000))
+            return emotion_data, f'cache-{tier}', None
+    
+    emotion_data, parsed = analyze_with_bedrock(user_message)
+    # Fallbacks are not cached, so the next request gets another chance at a real analysis
+    writer = cache_put_async(key, emotion_data) if cacheable and parsed else None
+    emit_analysis_metric('bedrock', int((time.monotonic() - start) * 1000))
+    return emotion_data, 'bedrock', writer
+
+# ---------------------------------------------------------------------------
+# Batch mode: {"messages": [...]} packed into as few Bedrock calls as the token limits allow
+# ---------------------------------------------------------------------------
+
+BATCH_MAX_MESSAGES = int(os.environ.get('BATCH_MAX_MESSAGES', '200'))
+BATCH_INPUT_TOKENS = int(os.environ.get('BATCH_INPUT_TOKENS', '8000'))  # message text per call
+BATCH_OUTPUT_TOKENS = 4096  # Haiku's output limit
+TOKENS_PER_RESULT = 90      # one indexed result object
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '4'))
+BATCH_MESSAGE_CHARS = 2000  # longer messages are truncated in batch mode only
+
+BATCH_INSTRUCTIONS = """
+
+You will receive several messages as a JSON array of {"i": index, "text": message}. Analyze each
+message on its own, exactly as you would a single message. Respond with ONLY this JSON object,
+one result per message, keeping each index:
+{"results": [{"i": 0, "primary_emotion": "...", "sentiment": "...", "risk_indicators": [], "confidence": 0, "explanation": "..."}]}"""
+
+def estimate_tokens(text):
+    """Rough token count for packing (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+def pack_batches(items):
+    """Split [(index, text)] into chunks within the input and output token limits, in order"""
+    max_items = (BATCH_OUTPUT_TOKENS - 100) // TOKENS_PER_RESULT
+    chunks, current, used = [], [], 0
+    for index, text in items:
+        cost = estimate_tokens(text) + 8  # JSON framing per item
+        if current and (used + cost > BATCH_INPUT_TOKENS or len(current) >= max_items):
+            chunks.append(current)
+            current, used = [], 0
+        current.append((index, text))
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+def analyze_batch_with_bedrock(chunk):
+    """One Bedrock call for a chunk; returns {index: emotion_data} for the results that parsed"""
+    payload = [{'i': index, 'text': text} for index, text in chunk]
+    response = bedrock.invoke_model(
+        modelId=MODEL_ID,
+        body=json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": min(BATCH_OUTPUT_TOKENS, 100 + TOKENS_PER_RESULT * len(chunk)),
+            "system": SYSTEM_PROMPT + BATCH_INSTRUCTIONS,
+            "messages": [{"role": "user", "content": json.dumps(payload, ensure_ascii=False)}],
+            "temperature": TEMPERATURE
+        })
+    )
+    ai_response = json.loads(response['body'].read())['content'][0]['text']
+    
+    json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
+    results = json.loads(json_match.group()).get('results', []) if json_match else []
+    wanted = {index for index, _ in chunk}
+    parsed = {}
+    for result in results:
+        # Only well-formed results for indexes we sent; anything else is retried on its own
+        if isinstance(result, dict) and result.get('i') in wanted and 'primary_emotion' in result:
+            index = result.pop('i')
+            parsed[index] = result
+    return parsed
+
+def analyze_chunk(chunk, bedrock_calls):
+    """
+    {index: (emotion_data, None) or (None, error)} for a chunk. A failed call
+    is split in half and retried, and results missing from a reply are
+    analyzed individually, so one bad message never fails its neighbours.
+    """
+    try:
+        bedrock_calls.append(len(chunk))
+        parsed = analyze_batch_with_bedrock(chunk)
+    except Exception as e:
+        if len(chunk) == 1:
+            return {chunk[0][0]: (None, str(e))}
+        print(f"⚠️ Batch of {len(chunk)} failed ({e}), splitting")
+        middle = len(chunk) // 2
+        return {**analyze_chunk(chunk[:middle], bedrock_calls), **analyze_chunk(chunk[middle:], bedrock_calls)}
+    
+    outcomes = {index: (emotion_data, None) for index, emotion_data in parsed.items()}
+    for index, text in chunk:
+        if index in outcomes:
+            continue
+        try:
+            bedrock_calls.append(1)
+            emotion_data, ok = analyze_with_bedrock(text)
+            outcomes[index] = (emotion_data, None) if ok else (None, emotion_data['explanation'])
+        except Exception as e:
+            outcomes[index] = (None, str(e))
+    return outcomes
+
+def analyze_messages(messages):
+    """
+    Batch mode. Each message is classified locally or served from the cache
+    when possible, and the rest share Bedrock calls. Returns (results in
+    input order, number of Bedrock calls). Each result is an analysis or
+    {'error'}, tagged with its index and the caller's id when one was given.
+    Bedrock results are cached like single messages before returning.
+    """
+    results = [None] * len(messages)
+    pending = []
+    keys = {}
+    for index, entry in enumerate(messages):
+        text = entry.get('message', '') if isinstance(entry, dict) else entry
+        tag = {'index': index}
+        if isinstance(entry, dict) and 'id' in entry:
+            tag['id'] = entry['id']
+        results[index] = tag
+        
+        if not isinstance(text, str) or not text.strip():
+            tag['error'] = 'message is required'
+            continue
+        
+        start = time.monotonic()
+        normalized = normalize_message(text)
+        emotion_data, source = classify_locally(text, normalized), 'local'
+        if emotion_data is None and 0 < len(normalized) <= CACHE_MAX_CHARS:
+            key = cache_key(normalized)
+            emotion_data, tier = cache_get(key)
+            source = f'cache-{tier}'
+            # A truncated message was not analyzed as written, so its result is not cached
+            if len(text) <= BATCH_MESSAGE_CHARS:
+                keys[index] = key
+        if emotion_data is not None:
+            emit_analysis_metric(source, int((time.monotonic() - start) * 1000))
+            tag.update(build_analysis(emotion_data, source))
+        else:
+            pending.append((index, text[:BATCH_MESSAGE_CHARS]))
+    
+    bedrock_calls = []
+    writers = []
+    if pending:
+        start = time.monotonic()
+        chunks = pack_batches(pending)
+        with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(chunks))) as pool:
+            for outcomes in pool.map(lambda chunk: analyze_chunk(chunk, bedrock_calls), chunks):
+                for index, (emotion_data, error) in outcomes.items():
+                    if error:
+                        results[index]['error'] = error
+                        continue
+                    # Errors and fallbacks are not cached, as for single messages
+                    if index in keys:
+                        writers.append(cache_put_async(keys[index], emotion_data))
+                    results[index].update(build_analysis(emotion_data, 'bedrock'))
+                    emit_analysis_metric('bedrock', int((time.monotonic() - start) * 1000))
+        print(f"📦 Batch: {len(messages)} messages, {len(pending)} sent to Bedrock in {len(bedrock_calls)} calls")
+    for writer in writers:
+        writer.join()
+    return results, len(bedrock_calls)
+
+def build_analysis(emotion_data, source):
+    """Insights, risk score and confidence for the frontend from one message's emotion data"""
+    # Enhanced ML Analysis format for frontend
+    insights = []
+    risk_score = 20  # Base risk
+    
+    # Enhanced emotion mapping with more nuanced analysis
+    emotion_emoji = {
+        'sad': '😢', 'anxious': '😰', 'hopeless': '😞', 'angry': '😠',
+        'happy': '😊', 'neutral': '😐', 'worried': '😟', 'stressed': '😤',
+        'depressed': '😔', 'lonely': '😞', 'overwhelmed': '😵', 'frustrated': '😤',
+        'scared': '😨', 'confused': '😕', 'excited': '🤩', 'grateful': '🙏',
+        'tired': '😴', 'numb': '😶', 'empty': '😶‍🌫️'
+    }
+    
+    primary_emotion = emotion_data.get('primary_emotion', 'neutral')
+    emoji = emotion_emoji.get(primary_emotion, '🧠')
+    
+    # More sophisticated emotion analysis
+    if primary_emotion in ['hopeless', 'depressed', 'empty', 'numb']:
+        insights.append(f"{emoji} Severe emotional distress: {primary_emotion}")
+        risk_score += 35
+    elif primary_emotion in ['sad', 'lonely', 'overwhelmed']:
+        insights.append(f"{emoji} Concerning emotional state: {primary_emotion}")
+        risk_score += 25
+    elif primary_emotion in ['anxious', 'worried', 'stressed', 'scared']:
+        insights.append(f"{emoji} Elevated anxiety/stress: {primary_emotion}")
+        risk_score += 20
+    elif primary_emotion in ['angry', 'frustrated']:
+        insights.append(f"{emoji} Emotional dysregulation: {primary_emotion}")
+        risk_score += 15
+    elif primary_emotion in ['happy', 'excited', 'grateful']:
+        insights.append(f"{emoji} Positive emotional state: {primary_emotion}")
+        risk_score = max(5, risk_score - 20)
+    else:
+        insights.append(f"{emoji} Emotional state: {primary_emotion}")
+    
+    # Enhanced sentiment analysis with context
+    sentiment = emotion_data.get('sentiment', 'neutral')
+    if sentiment == 'negative':
+        insights.append(f"📉 Negative sentiment pattern (AI confidence: {emotion_data.get('confidence', 85)}%)")
+        risk_score += 25
+    elif sentiment == 'positive':
+        insights.append(f"📈 Positive sentiment pattern (AI confidence: {emotion_data.get('confidence', 85)}%)")
+        risk_score = max(10, risk_score - 15)
+    else:
+        insights.append(f"😐 Neutral sentiment baseline")
+    
+    # Enhanced risk indicator processing
+    risk_indicators = emotion_data.get('risk_indicators', [])
+    critical_indicators = ['crisis_language', 'suicidal_ideation', 'self_harm']
+    high_risk_indicators = ['hopelessness', 'severe_depression', 'panic']
+    moderate_risk_indicators = ['isolation', 'low_mood', 'anxiety', 'distress']
+    
+    for indicator in risk_indicators:
+        if indicator in critical_indicators:
+            insights.append(f"🚨 CRITICAL: {indicator.replace('_', ' ').title()} detected")
+            risk_score += 50
+        elif indicator in high_risk_indicators:
+            insights.append(f"⚠️ HIGH RISK: {indicator.replace('_', ' ').title()} indicators")
+            risk_score += 30
+        elif indicator in moderate_risk_indicators:
+            insights.append(f"📊 {indicator.replace('_', ' ').title()} patterns detected")
+            risk_score += 15
+        else:
+            # Generic risk indicator
+            insights.append(f"🔍 {indicator.replace('_', ' ').title()} noted")
+            risk_score += 10
+    
+    # Add contextual explanation with length limit
+    explanation = emotion_data.get('explanation', '')
+    if explanation and len(explanation) < 120:
+        # Clean up explanation
+        clean_explanation = explanation.replace('User expresses', 'Detected:').replace('user', 'individual')
+        insights.append(f"💭 {clean_explanation}")
+    
+    # Enhanced confidence calculation
+    base_confidence = emotion_data.get('confidence', 85)
+    # Adjust confidence based on analysis complexity
+    if len(risk_indicators) > 2:
+        confidence = min(95, base_confidence + 5)  # More indicators = higher confidence
+    elif len(risk_indicators) == 0 and primary_emotion == 'neutral':
+        confidence = max(60, base_confidence - 10)  # Less clear signals = lower confidence
+    else:
+        confidence = base_confidence
+    
+    # Cap risk score appropriately
+    risk_score = min(95, max(5, risk_score))
+    
+    # Add ML method indicator
+    if len(insights) < 4:  # Ensure we have enough insights
+        method = "Local classifier" if source == 'local' else "Bedrock AI + Pattern Recognition"
+        insights.append(f"🤖 Analysis method: {method}")
+    
+    return {
+        'insights': insights,
+        'riskScore': risk_score,
+        'confidence': confidence,
+        'emotionData': emotion_data,
+        'source': source
+    }
+
+def handle_batch(body, user_id):
+    """{"messages": ["text" or {"id", "message"}, ...]} -> per-message results in input order"""
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': '*',
+        'Access-Control-Allow-Methods': 'OPTIONS,POST'
+    }
+    messages = body.get('messages')
+    if not isinstance(messages, list) or not messages or len(messages) > BATCH_MAX_MESSAGES:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': f'messages must be a list of 1-{BATCH_MAX_MESSAGES} messages'})
+        }
+    
+    results, bedrock_calls = analyze_messages(messages)
+    failed = sum(1 for result in results if 'error' in result)
+    print(f"✅ Batch emotion analysis complete for user {user_id}: {len(results) - failed} ok, {failed} failed")
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps({
+            'results': results,
+            'count': len(results),
+            'failed': failed,
+            'bedrockCalls': bedrock_calls,
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        })
+    }
 
 def lambda_handler(event, context):
     """
@@ -11,7 +628,8 @@ def lambda_handler(event, context):
     """
     # CRITICAL: Handle OPTIONS first before any other processing
     request_method = event.get('httpMethod') or event.get('requestContext', {}).get('http', {}).get('method')
-    if request_method == 'OPTIONS' or not event.get('body'):
+    # Direct invocations (backfills) may pass {"messages": [...]} as the event itself
+    if request_method == 'OPTIONS' or not (event.get('body') or 'messages' in event):
         return {
             'statusCode': 200,
             'headers': {
@@ -31,6 +649,9 @@ def lambda_handler(event, context):
         user_message = body.get('message', '')
         user_id = body.get('userId', 'anonymous')
         
+        if 'messages' in body:
+            return handle_batch(body, user_id)
+        
         if not user_message:
             return {
                 'statusCode': 400,
@@ -43,169 +664,13 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'message is required'})
             }
         
-        # Bedrock prompt for emotion analysis
-        system_prompt = """You are an expert mental health AI that analyzes text for emotional indicators and mental health signals.
-
-Analyze the user's message and return a JSON response with:
-1. Primary emotion (sad, anxious, hopeless, angry, neutral, happy, etc.)
-2. Sentiment (negative, neutral, positive) 
-3. Risk indicators (crisis_language, isolation, hopelessness, etc.)
-4. Confidence score (0-100)
-5. Brief explanation
-
-CRITICAL: Pay attention to context. "not feeling good" is NEGATIVE, not positive.
-
-Example response format:
-{
-  "primary_emotion": "sad",
-  "sentiment": "negative", 
-  "risk_indicators": ["low_mood", "distress"],
-  "confidence": 85,
-  "explanation": "User expresses negative feelings and low mood"
-}
-
-Be accurate and contextually aware. Focus on mental health indicators."""
-
-        # Call Bedrock Claude
-        bedrock_body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 300,
-            "system": system_prompt,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": f"Analyze this message for emotions and mental health indicators: '{user_message}'"
-                }
-            ],
-            "temperature": 0.3  # Lower temperature for more consistent analysis
-        }
-        
-        response = bedrock.invoke_model(
-            modelId='anthropic.claude-3-haiku-20240307-v1:0',
-            body=json.dumps(bedrock_body)
-        )
-        
-        response_body = json.loads(response['body'].read())
-        ai_response = response_body['content'][0]['text']
-        
-        # Parse JSON response from Claude
-        try:
-            # Extract JSON from response (Claude sometimes adds extra text)
-            import re
-            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-            if json_match:
-                emotion_data = json.loads(json_match.group())
-            else:
-                # Fallback if JSON parsing fails
-                emotion_data = {
-                    "primary_emotion": "unknown",
-                    "sentiment": "neutral",
-                    "risk_indicators": [],
-                    "confidence": 50,
-                    "explanation": "Could not parse emotion analysis"
-                }
-        except:
-            # Fallback parsing
-            emotion_data = {
-                "primary_emotion": "unknown", 
-                "sentiment": "neutral",
-                "risk_indicators": [],
-                "confidence": 50,
-                "explanation": "Error parsing emotion analysis"
-            }
-        
-        # Enhanced ML Analysis format for frontend
-        insights = []
-        risk_score = 20  # Base risk
-        
-        # Enhanced emotion mapping with more nuanced analysis
-        emotion_emoji = {
-            'sad': '😢', 'anxious': '😰', 'hopeless': '😞', 'angry': '😠',
-            'happy': '😊', 'neutral': '😐', 'worried': '😟', 'stressed': '😤',
-            'depressed': '😔', 'lonely': '😞', 'overwhelmed': '😵', 'frustrated': '😤',
-            'scared': '😨', 'confused': '😕', 'excited': '🤩', 'grateful': '🙏',
-            'tired': '😴', 'numb': '😶', 'empty': '😶‍🌫️'
-        }
-        
-        primary_emotion = emotion_data.get('primary_emotion', 'neutral')
-        emoji = emotion_emoji.get(primary_emotion, '🧠')
+        emotion_data, source, cache_writer = get_emotion_data(user_message)
         
-        # More sophisticated emotion analysis
-        if primary_emotion in ['hopeless', 'depressed', 'empty', 'numb']:
-            insights.append(f"{emoji} Severe emotional distress: {primary_emotion}")
-            risk_score += 35
-        elif primary_emotion in ['sad', 'lonely', 'overwhelmed']:
-            insights.append(f"{emoji} Concerning emotional state: {primary_emotion}")
-            risk_score += 25
-        elif primary_emotion in ['anxious', 'worried', 'stressed', 'scared']:
-            insights.append(f"{emoji} Elevated anxiety/stress: {primary_emotion}")
-            risk_score += 20
-        elif primary_emotion in ['angry', 'frustrated']:
-            insights.append(f"{emoji} Emotional dysregulation: {primary_emotion}")
-            risk_score += 15
-        elif primary_emotion in ['happy', 'excited', 'grateful']:
-            insights.append(f"{emoji} Positive emotional state: {primary_emotion}")
-            risk_score = max(5, risk_score - 20)
-        else:
-            insights.append(f"{emoji} Emotional state: {primary_emotion}")
-        
-        # Enhanced sentiment analysis with context
-        sentiment = emotion_data.get('sentiment', 'neutral')
-        if sentiment == 'negative':
-            insights.append(f"📉 Negative sentiment pattern (AI confidence: {emotion_data.get('confidence', 85)}%)")
-            risk_score += 25
-        elif sentiment == 'positive':
-            insights.append(f"📈 Positive sentiment pattern (AI confidence: {emotion_data.get('confidence', 85)}%)")
-            risk_score = max(10, risk_score - 15)
-        else:
-            insights.append(f"😐 Neutral sentiment baseline")
+        analysis = build_analysis(emotion_data, source)
         
-        # Enhanced risk indicator processing
-        risk_indicators = emotion_data.get('risk_indicators', [])
-        critical_indicators = ['crisis_language', 'suicidal_ideation', 'self_harm']
-        high_risk_indicators = ['hopelessness', 'severe_depression', 'panic']
-        moderate_risk_indicators = ['isolation', 'low_mood', 'anxiety', 'distress']
-        
-        for indicator in risk_indicators:
-            if indicator in critical_indicators:
-                insights.append(f"🚨 CRITICAL: {indicator.replace('_', ' ').title()} detected")
-                risk_score += 50
-            elif indicator in high_risk_indicators:
-                insights.append(f"⚠️ HIGH RISK: {indicator.replace('_', ' ').title()} indicators")
-                risk_score += 30
-            elif indicator in moderate_risk_indicators:
-                insights.append(f"📊 {indicator.replace('_', ' ').title()} patterns detected")
-                risk_score += 15
-            else:
-                # Generic risk indicator
-                insights.append(f"🔍 {indicator.replace('_', ' ').title()} noted")
-                risk_score += 10
-        
-        # Add contextual explanation with length limit
-        explanation = emotion_data.get('explanation', '')
-        if explanation and len(explanation) < 120:
-            # Clean up explanation
-            clean_explanation = explanation.replace('User expresses', 'Detected:').replace('user', 'individual')
-            insights.append(f"💭 {clean_explanation}")
-        
-        # Enhanced confidence calculation
-        base_confidence = emotion_data.get('confidence', 85)
-        # Adjust confidence based on analysis complexity
-        if len(risk_indicators) > 2:
-            confidence = min(95, base_confidence + 5)  # More indicators = higher confidence
-        elif len(risk_indicators) == 0 and primary_emotion == 'neutral':
-            confidence = max(60, base_confidence - 10)  # Less clear signals = lower confidence
-        else:
-            confidence = base_confidence
-        
-        # Cap risk score appropriately
-        risk_score = min(95, max(5, risk_score))
-        
-        # Add ML method indicator
-        if len(insights) < 4:  # Ensure we have enough insights
-            insights.append(f"🤖 Analysis method: Bedrock AI + Pattern Recognition")
-        
-        print(f"✅ Emotion analysis complete for user {user_id}: {emotion_data.get('primary_emotion')} ({sentiment})")
+        print(f"✅ Emotion analysis complete for user {user_id}: {emotion_data.get('primary_emotion')} ({emotion_data.get('sentiment')}, {source})")
+        if cache_writer:
+            cache_writer.join()
         
         return {
             'statusCode': 200,
@@ -215,13 +680,7 @@ Be accurate and contextually aware. Focus on mental health indicators."""
                 'Access-Control-Allow-Headers': '*',
                 'Access-Control-Allow-Methods': 'OPTIONS,POST'
             },
-            'body': json.dumps({
-                'insights': insights,
-                'riskScore': risk_score,
-                'confidence': confidence,
-                'emotionData': emotion_data,
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            })
+            'body': json.dumps(dict(analysis, timestamp=datetime.utcnow().isoformat() + 'Z'))
         }
         
     except Exception as e:
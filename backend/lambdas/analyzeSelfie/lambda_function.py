@@ -1,11 +1,10 @@
 import json, os, base64, uuid, datetime
-import boto3
+import aws_clients
 
-s3 = boto3.client('s3')
-rek = boto3.client('rekognition')
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+s3 = aws_clients.client('s3')
+rek = aws_clients.client('rekognition')
+bedrock = aws_clients.client('bedrock-runtime', region_name='us-east-1')
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
 BUCKET = os.environ.get('BUCKET', 'mindmate-uploads')
 
 def _resp(status, body):
@@ -1,19 +1,19 @@
 import json
 import os
-import boto3
-import joblib
-import numpy as np
+import aws_clients
 from datetime import datetime, timedelta
 from decimal import Decimal
+from risk_screen import screen_message, trigger_intervention
+from chat_archive import load_chat_turns
 
 # AWS Clients
-lambda_client = boto3.client('lambda')
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-risk_table = dynamodb.Table(os.environ.get('RISK_ASSESSMENTS_TABLE', 'MindMate-RiskAssessments'))
-chat_table = dynamodb.Table(os.environ.get('CHAT_HISTORY_TABLE', 'EmoCompanion'))
+s3_client = aws_clients.client('s3')
+risk_table = aws_clients.table(os.environ.get('RISK_ASSESSMENTS_TABLE', 'MindMate-RiskAssessments'))
+chat_table = aws_clients.table(os.environ.get('CHAT_HISTORY_TABLE', 'EmoCompanion'))
 
 # Model cache for SageMaker-trained models
+# joblib and numpy are imported by the ML paths that use them: rule-based and
+# realtime requests never pay for loading them
 _models_cache = {}
 
 def get_stored_ml_assessment(user_id):
@@ -65,6 +65,7 @@ def load_ml_models():
         return _models_cache['rf_model'], _models_cache['gb_model']
     
     try:
+        import joblib
         bucket = os.environ.get('MODEL_BUCKET', 'mindmate-ml-models')
         
         # Download SageMaker-trained models from S3
@@ -91,6 +92,64 @@ def load_ml_models():
         print("🔄 Falling back to rule-based analysis...")
         return None, None
 
+def load_serving_manifest():
+    """Load the serving manifest written by the training job (default model, feature order, medians)"""
+    if 'serving' in _models_cache:
+        return _models_cache['serving']
+    
+    bucket = os.environ.get('MODEL_BUCKET', 'mindmate-ml-models')
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key='models/serving.json')
+        manifest = json.loads(response['Body'].read())
+        print(f"✅ Serving manifest loaded: default model is {manifest.get('default_model')}")
+    except Exception as e:
+        print(f"⚠️ No serving manifest ({e}), using ensemble")
+        manifest = None
+    
+    _models_cache['serving'] = manifest
+    return manifest
+
+def load_student_model():
+    """Load the distilled student model, if the serving manifest selects it"""
+    if 'student_model' in _models_cache:
+        return _models_cache['student_model']
+    
+    manifest = load_serving_manifest()
+    student_model = None
+    if manifest and manifest.get('default_model') == 'student':
+        try:
+            import joblib
+            bucket = os.environ.get('MODEL_BUCKET', 'mindmate-ml-models')
+            student_path = '/tmp/student_model.pkl'
+            s3_client.download_file(bucket, 'models/' + manifest['models']['student']['artifact'], student_path)
+            student_model = joblib.load(student_path)
+            print("✅ Distilled student model loaded successfully")
+        except Exception as e:
+            print(f"❌ Error loading student model: {e}")
+    
+    _models_cache['student_model'] = student_model
+    return student_model
+
+def prepare_feature_vector(features, manifest=None, impute=True):
+    """Build a single-row feature matrix in the training column order.
+    
+    Missing features are NaN; with impute=True they are replaced by the
+    training medians so models trained on imputed data see the same values.
+    """
+    import numpy as np
+    manifest = manifest or {}
+    feature_names = manifest.get('feature_names') or sorted(features)
+    vector = np.array([[float(features.get(name, np.nan)) for name in feature_names]], dtype=np.float32)
+    
+    medians = manifest.get('imputation_medians')
+    if impute:
+        missing = np.isnan(vector[0])
+        if medians:
+            vector[0, missing] = np.asarray(medians, dtype=np.float32)[missing]
+        else:
+            vector[0, missing] = 0.0
+    return vector
+
 def decimal_to_float(obj):
     """Convert DynamoDB Decimal to float"""
     if isinstance(obj, Decimal):
@@ -123,17 +182,9 @@ def extract_basic_features(user_id):
         start_date = end_date - timedelta(days=30)
         
         try:
-            chat_response = chat_table.query(
-                KeyConditionExpression='PK = :pk AND SK BETWEEN :start AND :end',
-                ExpressionAttributeValues={
-                    ':pk': f'USER#{user_id}',
-                    ':start': f'CHAT#{start_date.isoformat()}',
-                    ':end': f'CHAT#{end_date.isoformat()}Z'
-                },
-                Limit=50
-            )
-            
-            messages = chat_response.get('Items', [])
+            # The oldest 50 turns of the window; reading stops once they are in
+            messages = load_chat_turns(
+                chat_table, user_id, f'CHAT#{start_date.isoformat()}', f'CHAT#{end_date.isoformat()}Z', limit=50)
             total_messages = len(messages)
             
             # Analyze message content for sentiment
@@ -467,63 +518,11 @@ def analyze_realtime_message(user_id, message):
     try:
         print(f"🔍 Real-time analysis for message: {message[:50]}...")
         
-        # Quick sentiment analysis
-        risk_score = 0.2  # Base risk
-        risk_factors = []
-        
-        message_lower = message.lower()
-        
-        # Crisis keywords (immediate high risk)
-        crisis_words = ['suicide', 'kill myself', 'end my life', 'want to die', 'better off dead']
-        for word in crisis_words:
-            if word in message_lower:
-                risk_score = 0.9
-                risk_factors.append(f"CRITICAL: Crisis language detected - '{word}'")
-                break
-        
-        # Despair indicators
-        despair_words = ['hopeless', 'pointless', 'give up', 'can\'t go on', 'worthless', 'no point']
-        for word in despair_words:
-            if word in message_lower:
-                risk_score = max(risk_score, 0.7)
-                risk_factors.append(f"High concern: Despair language - '{word}'")
-                break
-        
-        # Isolation indicators
-        isolation_words = ['alone', 'lonely', 'no one understands', 'nobody cares', 'isolated']
-        for word in isolation_words:
-            if word in message_lower:
-                risk_score = max(risk_score, 0.5)
-                risk_factors.append(f"Social isolation indicator - '{word}'")
-                break
-        
-        # Positive indicators
-        positive_words = ['better', 'improving', 'hopeful', 'grateful', 'good day', 'feeling good']
-        for word in positive_words:
-            if word in message_lower:
-                risk_score = max(0.1, risk_score - 0.2)
-                risk_factors.append(f"Positive indicator - '{word}'")
-                break
-        
-        if not risk_factors:
-            risk_factors.append("No significant risk indicators in current message")
-        
-        # Determine risk level
-        if risk_score >= 0.8:
-            risk_level = 'critical'
-        elif risk_score >= 0.6:
-            risk_level = 'high'
-        elif risk_score >= 0.4:
-            risk_level = 'moderate'
-        elif risk_score >= 0.2:
-            risk_level = 'low'
-        else:
-            risk_level = 'minimal'
-        
+        screening = screen_message(message)
         return {
-            'riskScore': risk_score,
-            'riskLevel': risk_level,
-            'riskFactors': risk_factors,
+            'riskScore': screening['riskScore'],
+            'riskLevel': screening['riskLevel'],
+            'riskFactors': screening['riskFactors'],
             'confidence': 75,
             'method': 'realtime_analysis',
             'features': {'realtime_message_length': len(message)}
@@ -545,16 +544,28 @@ def calculate_risk_from_features(user_id, features):
     try:
         print(f"📊 Calculating risk from {len(features)} provided features")
         
-        # Use the existing ML model approach
-        rf_model, gb_model = load_ml_models()
+        manifest = load_serving_manifest()
+        student_model = load_student_model()
+        rf_model, gb_model = (None, None) if student_model is not None else load_ml_models()
         
-        if rf_model is not None and gb_model is not None:
+        if student_model is not None:
+            # Distilled student: one shallow model on raw features (NaN handled natively)
+            prob = student_model.predict_proba(prepare_feature_vector(features, manifest, impute=False))[0][1]
+            risk_score = float(prob)
+            method = 'ml_student_provided'
+            
+            # Confidence from the prediction margin, on the same 70-95 scale as the ensemble
+            confidence = int(70 + abs(2 * prob - 1) * 25)
+            
+        elif rf_model is not None and gb_model is not None:
             # Use ML models for prediction
-            feature_vector = prepare_feature_vector(features)
+            feature_vector = prepare_feature_vector(features, manifest)
+            gb_input = ((manifest or {}).get('models', {}).get('ensemble', {}).get('gb_input', 'imputed'))
+            gb_vector = feature_vector if gb_input == 'imputed' else prepare_feature_vector(features, manifest, impute=False)
             
             # Get predictions from both models
             rf_prob = rf_model.predict_proba(feature_vector)[0][1]
-            gb_prob = gb_model.predict_proba(feature_vector)[0][1]
+            gb_prob = gb_model.predict_proba(gb_vector)[0][1]
             
             # Ensemble prediction (average)
             risk_score = float((rf_prob + gb_prob) / 2)
@@ -608,16 +619,6 @@ def calculate_risk_from_features(user_id, features):
 def lambda_handler(event, context):
     """Calculate risk score for a user with enhanced ML capabilities"""
     try:
-
-        
-        # First, check for pre-stored ML assessment (for demo users)
-        stored_assessment = get_stored_ml_assessment(user_id)
-        if stored_assessment:
-            print(f"✅ Using pre-stored ML assessment for {user_id}")
-            return {
-                'statusCode': 200,
-                'body': json.dumps(stored_assessment)
-            }
         # Handle CORS preflight
         if event.get('httpMethod') == 'OPTIONS':
             return _resp(200, {})
@@ -631,6 +632,15 @@ def lambda_handler(event, context):
         if not user_id:
             return _resp(400, {'error': 'userId is required'})
         
+        # Check for pre-stored ML assessment (for demo users)
+        stored_assessment = get_stored_ml_assessment(user_id)
+        if stored_assessment:
+            print(f"✅ Using pre-stored ML assessment for {user_id}")
+            return {
+                'statusCode': 200,
+                'body': json.dumps(stored_assessment)
+            }
+        
         print(f"🧠 Calculating ML-enhanced risk for user: {user_id}")
         
         # Handle real-time message analysis
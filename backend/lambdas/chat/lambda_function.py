@@ -1,41 +1,323 @@
 import json
 import os
-import boto3
-from datetime import datetime
+import threading
+import time
+import aws_clients
+from datetime import datetime, timedelta
+from decimal import Decimal
+from chat_archive import decode_archive, iter_archives, turn_day
+from interactive import get_management_client, get_request_id, hand_off, put_once, store_event
+from risk_screen import screen_message, trigger_intervention
 
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+bedrock = aws_clients.client('bedrock-runtime', region_name='us-east-1')
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
 
-def lambda_handler(event, context):
+MODEL_ID = 'anthropic.claude-3-haiku-20240307-v1:0'
+
+# WebSocket streaming: deltas arriving within this window are sent as one frame
+STREAM_FLUSH_SECONDS = int(os.environ.get('STREAM_FLUSH_MS', '50')) / 1000
+
+# Conversation memory: recent turns verbatim, older turns folded into a rolling summary
+RECENT_TURNS = int(os.environ.get('MEMORY_RECENT_TURNS', '6'))
+SUMMARY_EVERY = int(os.environ.get('MEMORY_SUMMARY_EVERY', '4'))
+# How far back memory looks for a session's turns, live or archived
+MEMORY_LOOKBACK_DAYS = int(os.environ.get('MEMORY_LOOKBACK_DAYS', '7'))
+# Live CHAT# pages read per message; other sessions' turns in the range count against them
+MEMORY_MAX_PAGES = int(os.environ.get('MEMORY_MAX_PAGES', '2'))
+# Same setting as compactChatHistory: days this recent are never archived
+COMPACT_AFTER_DAYS = int(os.environ.get('COMPACT_AFTER_DAYS', '2'))
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '2000'))
+MESSAGE_TOKEN_LIMIT = 600
+TURN_TOKEN_LIMIT = 200
+SUMMARY_TOKEN_LIMIT = 300
+
+# Rolling summaries by (userId, sessionId), so warm containers skip the summary read
+_summaries = {}
+
+# Inline crisis screening: per-user rolling concern, halved every RISK_HALF_LIFE_MINUTES
+RISK_HALF_LIFE_SECONDS = float(os.environ.get('RISK_HALF_LIFE_MINUTES', '60')) * 60
+RISK_ESCALATION_THRESHOLD = float(os.environ.get('RISK_ESCALATION_THRESHOLD', '1.5'))
+RISK_PERSIST_SECONDS = int(os.environ.get('RISK_PERSIST_SECONDS', '300'))
+ESCALATION_COOLDOWN_SECONDS = int(os.environ.get('ESCALATION_COOLDOWN_MINUTES', '30')) * 60
+ESCALATION_LEVELS = {'high': 1, 'critical': 2}
+
+# Rolling risk state by userId; loaded on first sight in this container
+_risk_states = {}
+_risk_lock = threading.Lock()
+
+def estimate_tokens(text):
+    """Rough Claude token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+def truncate_tokens(text, limit):
+    """Cut text to about `limit` tokens at a word boundary"""
+    if estimate_tokens(text) <= limit:
+        return text
+    return text[:limit * 4].rsplit(' ', 1)[0] + ' …'
+
+def get_session_id(body):
+    user_id = body.get('userId', 'demo-user')
+    return body.get('sessionId') or f"{user_id}-{datetime.utcnow().strftime('%Y%m%d')}"
+
+def load_summary(user_id, session_id):
     """
-    Conversational AI chat using AWS Bedrock Claude
-    Provides empathetic, context-aware responses
+    Rolling summary for the session: {'summary', 'coveredThrough' (SK of the
+    newest folded turn), 'startedAt' (SK bound below the session's first turn)}.
+    A session with neither is new, and is looked up again on its next turn.
     """
+    key = (user_id, session_id)
+    if key in _summaries:
+        return _summaries[key]
+    response = table.get_item(Key={'PK': f'USER#{user_id}', 'SK': f'CHAT_SUMMARY#{session_id}'})
+    item = response.get('Item', {})
+    summary = {
+        'summary': item.get('summary', ''),
+        'coveredThrough': item.get('coveredThrough', ''),
+        'startedAt': item.get('startedAt', '')
+    }
+    if summary['coveredThrough'] or summary['startedAt']:
+        _summaries[key] = summary
+    return summary
+
+def start_session(user_id, session_id, started_at):
+    """Record the session's start on its CHAT_SUMMARY# item; the earliest start wins"""
     try:
-        # Parse request
-        body = json.loads(event.get('body', '{}')) if isinstance(event.get('body'), str) else event
-        
-        user_id = body.get('userId', 'demo-user')
-        message = body.get('message', '')
-        image_data = body.get('image')
-        history = body.get('history', [])
-        user_context = body.get('context', {})
+        table.update_item(
+            Key={'PK': f'USER#{user_id}', 'SK': f'CHAT_SUMMARY#{session_id}'},
+            UpdateExpression='SET #type = :type, sessionId = :session, startedAt = :start',
+            ConditionExpression='attribute_not_exists(startedAt) OR startedAt > :start',
+            ExpressionAttributeNames={'#type': 'type'},
+            ExpressionAttributeValues={':type': 'CHAT_SUMMARY', ':session': session_id, ':start': started_at}
+        )
+    except Exception as e:
+        # Usually another turn of the session recorded an earlier start
+        print(f"Session start not recorded: {e}")
+
+def is_session_turn(item, session_id):
+    """A completed chat-Lambda exchange of this session (agentChat transcripts carry a source)"""
+    return (item.get('sessionId') == session_id and not item.get('source')
+            and item.get('userMessage') and item.get('aiResponse'))
+
+def session_turns(user_id, session_id, start, wanted):
+    """
+    Up to `wanted` of the session's turns with SK > start, newest first.
+    The live CHAT# tail is read first, at most MEMORY_MAX_PAGES pages. Archived
+    days (CHATDAY#) are read only when the live tail is exhausted short of
+    `wanted` and the range reaches days old enough to have been archived.
+    """
+    turns = []
+    query = {
+        'KeyConditionExpression': 'PK = :pk AND SK BETWEEN :start AND :end',
+        'FilterExpression': 'sessionId = :session AND attribute_not_exists(#source)',
+        'ExpressionAttributeNames': {'#source': 'source'},
+        'ExpressionAttributeValues': {
+            ':pk': f'USER#{user_id}',
+            ':start': start + '\x00',
+            ':end': 'CHAT#\uffff',
+            ':session': session_id
+        },
+        'ProjectionExpression': 'SK, sessionId, userMessage, aiResponse, requestId',
+        'ScanIndexForward': False
+    }
+    # No Limit: DynamoDB applies it before the filter, so it would only add round trips
+    exhausted = False
+    for _ in range(MEMORY_MAX_PAGES):
+        response = table.query(**query)
+        turns.extend(item for item in response.get('Items', []) if is_session_turn(item, session_id))
+        if 'LastEvaluatedKey' not in response:
+            exhausted = True
+            break
+        if len(turns) >= wanted:
+            break
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    if len(turns) >= wanted or not exhausted:
+        return turns[:wanted]
+    
+    # The live tail is exhausted, so archived turns are all older than its oldest turn
+    oldest_live = turns[-1]['SK'] if turns else 'CHAT#\uffff'
+    newest_archived = (datetime.utcnow() - timedelta(days=COMPACT_AFTER_DAYS)).strftime('%Y-%m-%d')
+    last_day = min(turn_day(oldest_live) if turns else newest_archived, newest_archived)
+    if turn_day(start) > last_day:
+        # The session began after the newest day compaction can have archived
+        return turns
+    for archive in iter_archives(table, user_id, turn_day(start), last_day, newest_first=True, page_size=1):
+        turns.extend(turn for turn in reversed(decode_archive(archive, user_id))
+                     if start < turn['SK'] < oldest_live and is_session_turn(turn, session_id))
+        if len(turns) >= wanted:
+            break
+    return turns[:wanted]
+
+def load_memory(user_id, session_id):
+    """
+    Server-side conversation memory built from the session's chat turns.
+    
+    Returns the rolling summary, the last RECENT_TURNS turns (oldest first) and
+    the older turns not yet folded into the summary. A new session reads no
+    turns; 'newSession' asks the caller to record its start after the reply.
+    """
+    summary = load_summary(user_id, session_id)
+    new_session = not (summary['coveredThrough'] or summary['startedAt'])
+    
+    if new_session:
+        items = []
+        started_at = f'CHAT#{datetime.utcnow().isoformat()}'
+    else:
+        # Newest first, stopping at the summary or the session start; older unsummarized
+        # turns past the limit are not revisited
+        first_day = (datetime.utcnow() - timedelta(days=MEMORY_LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        started_at = summary['startedAt']
+        items = session_turns(user_id, session_id,
+                              max(summary['coveredThrough'], started_at, f'CHAT#{first_day}'),
+                              RECENT_TURNS + SUMMARY_EVERY * 2)
+    turns = [
+        {'sk': item['SK'], 'user': item['userMessage'], 'assistant': item['aiResponse'],
+         'requestId': item.get('requestId')}
+        for item in reversed(items)
+    ]
+    
+    split = max(len(turns) - RECENT_TURNS, 0)
+    return {
+        'summary': summary['summary'],
+        'coveredThrough': summary['coveredThrough'],
+        'startedAt': started_at,
+        'newSession': new_session,
+        'unsummarized': turns[:split],
+        'recent': turns[split:]
+    }
+
+def history_messages(memory, budget):
+    """Recent turns as alternating messages, newest kept first, within `budget` tokens"""
+    messages = []
+    used = 0
+    for turn in reversed(memory['recent']):
+        pair = [
+            {'role': 'user', 'content': truncate_tokens(turn['user'], TURN_TOKEN_LIMIT)},
+            {'role': 'assistant', 'content': truncate_tokens(turn['assistant'], TURN_TOKEN_LIMIT)}
+        ]
+        cost = sum(estimate_tokens(m['content']) for m in pair)
+        if used + cost > budget:
+            break
+        messages[:0] = pair
+        used += cost
+    return messages, used
+
+def client_history_memory(history):
+    """Memory from the client-sent history, used when the server-side read fails"""
+    turns = []
+    pending_user = None
+    for msg in history:
+        if msg.get('role') == 'user':
+            pending_user = msg.get('content', '')
+        elif msg.get('role') == 'assistant' and pending_user:
+            turns.append({'user': pending_user, 'assistant': msg.get('content', '')})
+            pending_user = None
+    return {'summary': '', 'unsummarized': [], 'recent': turns[-RECENT_TURNS:]}
+
+def update_summary(user_id, session_id, memory):
+    """
+    Fold older turns into the session summary once SUMMARY_EVERY have
+    accumulated. Runs after the reply is delivered (inline for WebSocket turns,
+    in an async invocation for HTTP ones); a conditional write keeps two
+    containers from folding the same turns twice.
+    """
+    turns = memory['unsummarized']
+    if len(turns) < SUMMARY_EVERY:
+        return
+    
+    exchanges = '\n'.join(f"User: {truncate_tokens(t['user'], TURN_TOKEN_LIMIT)}\n"
+                          f"Companion: {truncate_tokens(t['assistant'], TURN_TOKEN_LIMIT)}" for t in turns)
+    prompt = f"""Summary of the conversation so far:
+{memory['summary'] or '(none yet)'}
+
+Newer exchanges:
+{exchanges}
+
+Write an updated summary of the whole conversation in under 150 words. Keep what the user shared about their feelings, events, people and goals, and any advice they found helpful. Plain text only."""
+    
+    try:
+        response = bedrock.invoke_model(
+            modelId=MODEL_ID,
+            body=json.dumps({
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 250,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": 0.2
+            })
+        )
+        summary = json.loads(response['body'].read())['content'][0]['text'].strip()
+        covered = turns[-1]['sk']
         
-        if not message and not image_data:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json'
-                },
-                'body': json.dumps({'error': 'message or image is required'})
+        # An update, so the session's startedAt is kept
+        table.update_item(
+            Key={'PK': f'USER#{user_id}', 'SK': f'CHAT_SUMMARY#{session_id}'},
+            UpdateExpression='SET #type = :type, sessionId = :session, summary = :summary, '
+                             'coveredThrough = :covered, updatedAt = :updated',
+            ConditionExpression='attribute_not_exists(coveredThrough) OR coveredThrough = :previous',
+            ExpressionAttributeNames={'#type': 'type'},
+            ExpressionAttributeValues={
+                ':type': 'CHAT_SUMMARY',
+                ':session': session_id,
+                ':summary': summary,
+                ':covered': covered,
+                ':updated': datetime.utcnow().isoformat() + 'Z',
+                ':previous': memory['coveredThrough']
             }
-        
-        # Build system prompt with wellness context
-        wellness_score = user_context.get('wellnessScore', 7.5)
-        risk_level = user_context.get('riskLevel', 'LOW')
-        
-        system_prompt = f"""You are "Your Gentle Guardian", a compassionate AI mental health companion.
+        )
+        _summaries[(user_id, session_id)] = {
+            'summary': summary, 'coveredThrough': covered, 'startedAt': memory.get('startedAt', '')
+        }
+        print(f"🧠 Summary updated with {len(turns)} turns ({estimate_tokens(summary)} tokens)")
+    except Exception as e:
+        # Another container moved the summary on (or the call failed); reload next time
+        _summaries.pop((user_id, session_id), None)
+        print(f"Summary update skipped: {e}")
+
+def follow_ups(body, memory):
+    """
+    Event keys for the async follow-up of an HTTP turn: {'startSession': ...}
+    for a new session's first turn, {'summarize': ...} when older turns are
+    due to be folded. None when there is neither.
+    """
+    if not memory:
+        return None
+    target = {'userId': body.get('userId', 'demo-user'), 'sessionId': get_session_id(body)}
+    events = {}
+    if memory.get('newSession'):
+        events['startSession'] = dict(target, startedAt=memory['startedAt'])
+    if len(memory['unsummarized']) >= SUMMARY_EVERY:
+        events['summarize'] = target
+    return events or None
+
+def get_memory(body):
+    """Server-side memory for the request, or None to fall back to the client-sent history"""
+    try:
+        return load_memory(body.get('userId', 'demo-user'), get_session_id(body))
+    except Exception as e:
+        print(f"⚠️ Conversation memory unavailable ({e}), using client history")
+        return None
+
+def build_bedrock_body(body, memory=None):
+    """
+    Build the Bedrock request for a chat message within PROMPT_TOKEN_BUDGET;
+    returns None when there is nothing to send. Without server-side memory the
+    client-sent history is used.
+    """
+    message = body.get('message', '')
+    image_data = body.get('image')
+    user_context = body.get('context', {})
+    
+    if not message and not image_data:
+        return None
+    
+    if memory is None:
+        memory = client_history_memory(body.get('history', []))
+    message = truncate_tokens(message, MESSAGE_TOKEN_LIMIT)
+    
+    # Build system prompt with wellness context
+    wellness_score = user_context.get('wellnessScore', 7.5)
+    risk_level = user_context.get('riskLevel', 'LOW')
+    
+    system_prompt = f"""You are "Your Gentle Guardian", a compassionate AI mental health companion.
 
 CRITICAL RULES:
 - NEVER use asterisks (*) or stage directions in your responses
@@ -61,87 +343,357 @@ Read the conversation history carefully and respond naturally to continue the di
 
 REMEMBER: No asterisks or stage directions - just speak directly to the user."""
 
-        # Build conversation messages
-        messages = []
-        
-        # Add conversation history (last 10 messages)
-        for msg in history[-10:]:
-            messages.append({
-                'role': msg.get('role', 'user'),
-                'content': msg.get('content', '')
+    if memory['summary']:
+        system_prompt += "\n\nEarlier in this conversation (summary):\n" + truncate_tokens(memory['summary'], SUMMARY_TOKEN_LIMIT)
+    
+    # Build conversation messages: as many recent turns as the remaining budget allows
+    remaining = PROMPT_TOKEN_BUDGET - estimate_tokens(system_prompt) - estimate_tokens(message)
+    messages, history_tokens = history_messages(memory, remaining)
+    print(f"🧾 Prompt ~{PROMPT_TOKEN_BUDGET - remaining + history_tokens} tokens "
+          f"({len(messages) // 2} of {len(memory['recent'])} recent turns, summary: {bool(memory['summary'])})")
+    
+    # Add current message (with image support)
+    if image_data:
+        # Handle image message
+        content = []
+        if message:
+            content.append({
+                "type": "text",
+                "text": message
             })
+        content.append({
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": image_data.get('type', 'image/jpeg'),
+                "data": image_data['data']
+            }
+        })
+        messages.append({
+            'role': 'user',
+            'content': content
+        })
+    else:
+        # Text-only message
+        messages.append({
+            'role': 'user',
+            'content': message
+        })
+    
+    return {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 300,
+        "system": system_prompt,
+        "messages": messages,
+        "temperature": 0.7
+    }
+
+def stream_completion(bedrock_body, on_delta=None):
+    """
+    Call Claude with the response-stream API, passing each text delta to
+    on_delta as it arrives. Returns (full_text, timing).
+    """
+    start = time.monotonic()
+    response = bedrock.invoke_model_with_response_stream(
+        modelId=MODEL_ID,
+        body=json.dumps(bedrock_body)
+    )
+    
+    parts = []
+    first_token_ms = None
+    for stream_event in response['body']:
+        if 'chunk' not in stream_event:
+            # Modelled stream errors (throttling, validation, ...) arrive as their own event types
+            error_type = next(iter(stream_event), 'unknown')
+            raise RuntimeError(f"Bedrock stream error {error_type}: {stream_event[error_type]}")
         
-        # Add current message (with image support)
-        if image_data:
-            # Handle image message
-            content = []
-            if message:
-                content.append({
-                    "type": "text",
-                    "text": message
+        chunk = json.loads(stream_event['chunk']['bytes'])
+        if chunk.get('type') == 'content_block_delta':
+            text = chunk.get('delta', {}).get('text', '')
+            if not text:
+                continue
+            if first_token_ms is None:
+                first_token_ms = int((time.monotonic() - start) * 1000)
+            parts.append(text)
+            if on_delta:
+                on_delta(text)
+    
+    timing = {
+        'timeToFirstTokenMs': first_token_ms,
+        'totalMs': int((time.monotonic() - start) * 1000)
+    }
+    print(f"⏱️ Bedrock stream: first token {first_token_ms}ms, complete {timing['totalMs']}ms")
+    return ''.join(parts), timing
+
+def find_stored_turn(memory, request_id):
+    """The already-stored turn for a retried request, if it is in the recent window"""
+    if not request_id:
+        return None
+    for turn in (memory or {}).get('recent', []):
+        if turn.get('requestId') == request_id:
+            return turn
+    return None
+
+def chat_item(body, ai_response, request_id):
+    """DynamoDB item for the completed exchange"""
+    user_id = body.get('userId', 'demo-user')
+    user_context = body.get('context', {})
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    item = {
+        'PK': f'USER#{user_id}',
+        'SK': f'CHAT#{timestamp}',
+        'type': 'CHAT',
+        'userId': user_id,
+        'userMessage': body.get('message', ''),
+        'aiResponse': ai_response,
+        'wellnessScore': Decimal(str(user_context.get('wellnessScore', 7.5))),
+        'riskLevel': user_context.get('riskLevel', 'LOW'),
+        'sessionId': get_session_id(body),
+        'timestamp': timestamp,
+        'ts': timestamp
+    }
+    if request_id:
+        item['requestId'] = request_id
+    return item
+
+def load_risk_state(user_id):
+    """
+    Rolling risk state from memory, else from its RISK_STATE#CHAT item, else
+    empty. The item is read without holding _risk_lock; if two threads load
+    the same user at once, the first to finish wins.
+    """
+    state = _risk_states.get(user_id)
+    if state is None:
+        state = {'concern': 0.0, 'crises': 0.0, 'messages': 0, 'updatedAt': time.time(),
+                 'persistedAt': 0, 'escalatedAt': 0, 'escalatedLevel': None, 'dirty': False}
+        try:
+            item = table.get_item(Key={'PK': f'USER#{user_id}', 'SK': 'RISK_STATE#CHAT'}).get('Item')
+            if item:
+                state.update({
+                    'concern': float(item.get('concern', 0)),
+                    'crises': float(item.get('crises', 0)),
+                    'messages': int(item.get('messages', 0)),
+                    'updatedAt': int(item.get('updatedAt', time.time())),
+                    'persistedAt': int(item.get('updatedAt', 0)),
+                    'escalatedAt': int(item.get('escalatedAt', 0)),
+                    'escalatedLevel': item.get('escalatedLevel')
                 })
-            content.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": image_data.get('type', 'image/jpeg'),
-                    "data": image_data['data']
-                }
-            })
-            messages.append({
-                'role': 'user',
-                'content': content
-            })
-        else:
-            # Text-only message
-            messages.append({
-                'role': 'user',
-                'content': message
-            })
+        except Exception as e:
+            print(f"⚠️ Risk state unavailable ({e}), starting fresh")
+        with _risk_lock:
+            state = _risk_states.setdefault(user_id, state)
+    return state
+
+def screen_turn(user_id, message):
+    """
+    Screen one chat message and fold it into the user's rolling risk state.
+    Crisis language escalates at once; otherwise moderate-or-worse messages
+    add to a decayed concern counter that escalates past the threshold.
+    Only escalations reach the intervention Lambda, at most one per level per
+    cooldown. The state is persisted every RISK_PERSIST_SECONDS and on escalation.
+    """
+    screening = screen_message(message)
+    state = load_risk_state(user_id)
+    now = time.time()
+    
+    with _risk_lock:
+        decay = 0.5 ** (max(now - state['updatedAt'], 0) / RISK_HALF_LIFE_SECONDS)
+        state['concern'] *= decay
+        state['crises'] *= decay
+        state['updatedAt'] = now
+        state['messages'] += 1
+        if screening['riskScore'] >= 0.4:
+            state['concern'] += screening['riskScore']
+            state['dirty'] = True
+        if screening['crisis']:
+            state['crises'] += 1
         
-        # Ensure first message is from user (Claude requirement)
-        if messages and messages[0].get('role') != 'user':
-            # Remove leading assistant messages
-            while messages and messages[0].get('role') == 'assistant':
-                messages.pop(0)
+        level = None
+        if screening['crisis']:
+            level = 'critical'
+        elif state['concern'] >= RISK_ESCALATION_THRESHOLD:
+            level = 'high'
+        if level and (now - state['escalatedAt'] < ESCALATION_COOLDOWN_SECONDS
+                      and ESCALATION_LEVELS[level] <= ESCALATION_LEVELS.get(state['escalatedLevel'], 0)):
+            level = None  # already escalated at this level recently
+        if level:
+            state['escalatedAt'], state['escalatedLevel'] = now, level
         
-        # Call Bedrock Claude
-        bedrock_body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 300,
-            "system": system_prompt,
-            "messages": messages,
-            "temperature": 0.7
-        }
+        persist = state['dirty'] and (level or now - state['persistedAt'] >= RISK_PERSIST_SECONDS)
+        if persist:
+            state['persistedAt'], state['dirty'] = now, False
+            item = {
+                'PK': f'USER#{user_id}',
+                'SK': 'RISK_STATE#CHAT',
+                'type': 'RISK_STATE',
+                'concern': Decimal(str(round(state['concern'], 4))),
+                'crises': Decimal(str(round(state['crises'], 4))),
+                'messages': state['messages'],
+                'updatedAt': int(now),
+                'escalatedAt': int(state['escalatedAt']),
+                'escalatedLevel': state['escalatedLevel']
+            }
+        concern = state['concern']
+    
+    if level:
+        risk_score = max(screening['riskScore'], 0.7)
+        risk_factors = screening['riskFactors'] + [f"Rolling chat concern {concern:.1f} (threshold {RISK_ESCALATION_THRESHOLD})"]
+        if trigger_intervention(user_id, level, risk_score, risk_factors, source='chat_screening'):
+            print(f"🚨 Chat screening escalated {user_id} ({level}, concern {concern:.2f})")
+    
+    if persist:
+        try:
+            table.put_item(Item=item)
+        except Exception as e:
+            print(f"⚠️ Risk state not persisted: {e}")
+
+def start_screening(body):
+    """Screen the message on a background thread while the reply is generated; join it before returning"""
+    message = body.get('message', '')
+    if not message:
+        return None
+    thread = threading.Thread(target=screen_turn, args=(body.get('userId', 'demo-user'), message), daemon=True)
+    thread.start()
+    return thread
+
+def handle_websocket(event):
+    """
+    WebSocket route: {"action": "chat", ...same fields as the HTTP body}.
+    Sends {"type": "delta", "text"} frames as Claude generates, then one
+    {"type": "done"} frame; the exchange is stored after it is sent.
+    """
+    request_context = event['requestContext']
+    route = request_context.get('routeKey')
+    if route in ('$connect', '$disconnect'):
+        return {'statusCode': 200}
+    
+    connection_id = request_context['connectionId']
+    client = get_management_client(request_context)
+    state = {'connected': True, 'pending': [], 'last_flush': 0.0}
+    
+    def send(frame):
+        if not state['connected']:
+            return
+        try:
+            client.post_to_connection(ConnectionId=connection_id, Data=json.dumps(frame).encode('utf-8'))
+        except client.exceptions.GoneException:
+            # Client went away; keep generating so the exchange is still stored
+            print(f"⚠️ WebSocket {connection_id} closed mid-stream")
+            state['connected'] = False
+    
+    def flush():
+        if state['pending']:
+            send({'type': 'delta', 'text': ''.join(state['pending'])})
+            state['pending'] = []
+        state['last_flush'] = time.monotonic()
+    
+    def on_delta(text):
+        # The first delta goes out immediately; later ones are coalesced per flush window
+        state['pending'].append(text)
+        if time.monotonic() - state['last_flush'] >= STREAM_FLUSH_SECONDS:
+            flush()
+    
+    try:
+        body = json.loads(event.get('body') or '{}')
+        request_id = get_request_id(body)
+        memory = get_memory(body)
         
-        response = bedrock.invoke_model(
-            modelId='anthropic.claude-3-haiku-20240307-v1:0',
-            body=json.dumps(bedrock_body)
-        )
+        stored = find_stored_turn(memory, request_id)
+        if stored:
+            # Retried request whose turn already landed: replay it instead of generating again
+            send({'type': 'done', 'response': stored['assistant'], 'timestamp': stored['sk'][len('CHAT#'):]})
+            return {'statusCode': 200}
         
-        response_body = json.loads(response['body'].read())
-        ai_response = response_body['content'][0]['text']
+        bedrock_body = build_bedrock_body(body, memory)
+        if bedrock_body is None:
+            send({'type': 'error', 'error': 'message or image is required'})
+            return {'statusCode': 400}
         
-        # Store conversation in DynamoDB
-        timestamp = datetime.utcnow().isoformat() + 'Z'
-        try:
-            from decimal import Decimal
-            table.put_item(Item={
-                'PK': f'USER#{user_id}',
-                'SK': f'CHAT#{timestamp}',
-                'type': 'CHAT',
-                'userId': user_id,
-                'userMessage': message,
-                'aiResponse': ai_response,
-                'wellnessScore': Decimal(str(wellness_score)),
-                'riskLevel': risk_level,
-                'timestamp': timestamp,
-                'ts': timestamp
-            })
-        except Exception as db_error:
-            print(f"DynamoDB error (non-critical): {db_error}")
+        screener = start_screening(body)
+        ai_response, timing = stream_completion(bedrock_body, on_delta)
+        flush()
         
-        return {
+        # Store only after the stream completes, so history never holds a partial response;
+        # the client already has the reply, so the write happens after done
+        item = chat_item(body, ai_response, request_id)
+        send({'type': 'done', 'response': ai_response, 'timestamp': item['timestamp'], **timing})
+        put_once(table, item, request_id)
+        if screener:
+            screener.join()
+        
+        # The client already has the reply, so record the session start and fold older turns inline
+        if memory:
+            if memory['newSession']:
+                start_session(body.get('userId', 'demo-user'), get_session_id(body), memory['startedAt'])
+            update_summary(body.get('userId', 'demo-user'), get_session_id(body), memory)
+        return {'statusCode': 200}
+        
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        send({'type': 'error', 'error': str(e)})
+        return {'statusCode': 500}
+
+def lambda_handler(event, context):
+    """
+    Conversational AI chat using AWS Bedrock Claude
+    Provides empathetic, context-aware responses
+    
+    HTTP requests get the whole reply in one response; requests on the
+    WebSocket API get it streamed as it is generated.
+    """
+    if event.get('requestContext', {}).get('connectionId'):
+        return handle_websocket(event)
+    
+    if 'persist' in event or 'summarize' in event:
+        # Async follow-up of an HTTP turn: store the exchange, record a new session's
+        # start, then fold older turns
+        if 'persist' in event:
+            store_event(event, table)
+        if 'startSession' in event:
+            target = event['startSession']
+            start_session(target['userId'], target['sessionId'], target['startedAt'])
+        if 'summarize' in event:
+            target = event['summarize']
+            update_summary(target['userId'], target['sessionId'], load_memory(target['userId'], target['sessionId']))
+        return {'statusCode': 200}
+    
+    try:
+        # Parse request
+        body = json.loads(event.get('body', '{}')) if isinstance(event.get('body'), str) else event
+        request_id = get_request_id(body)
+        
+        memory = get_memory(body)
+        stored = find_stored_turn(memory, request_id)
+        screener = None
+        
+        if stored:
+            # Retried request whose turn already landed: replay it instead of generating again
+            ai_response, timestamp = stored['assistant'], stored['sk'][len('CHAT#'):]
+        else:
+            bedrock_body = build_bedrock_body(body, memory)
+            if bedrock_body is None:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json'
+                    },
+                    'body': json.dumps({'error': 'message or image is required'})
+                }
+            
+            # Screen for crisis language while Claude replies
+            screener = start_screening(body)
+            
+            # Call Bedrock Claude
+            ai_response, _ = stream_completion(bedrock_body)
+            
+            # Store the exchange (and fold older turns) in an async invocation, off the reply path
+            item = chat_item(body, ai_response, request_id)
+            timestamp = item['timestamp']
+            hand_off(context, table, item, request_id, follow_ups(body, memory))
+        
+        response = {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
@@ -154,6 +706,9 @@ REMEMBER: No asterisks or stage directions - just speak directly to the user."""
                 'timestamp': timestamp
             })
         }
+        if screener:
+            screener.join()
+        return response
         
     except Exception as e:
         print(f"Error: {e}")
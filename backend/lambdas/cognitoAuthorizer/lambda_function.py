@@ -1,18 +1,65 @@
+import hashlib
 import json
+import time
+from collections import OrderedDict
 import jwt
-import requests
 from jwt.algorithms import RSAAlgorithm
 
 REGION = 'us-east-1'
 USER_POOL_ID = 'us-east-1_0xN9Gguz1'
 JWKS_URL = f'https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json'
 
-# Cache JWKS keys
-jwks_keys = None
+# Parsed public keys by kid, from the last JWKS fetch
+public_keys = {}
+jwks_fetched_at = None
+# An unknown kid (key rotation) refetches JWKS at most this often
+JWKS_REFETCH_SECONDS = 60
+
+# Tokens already verified: sha256 of the token -> (exp, userId, email), least recently used first
+verified_tokens = OrderedDict()
+VERIFIED_CACHE_SIZE = 1024
+
+def fetch_jwks():
+    """Signing keys of the user pool. Fetched once per container, so urllib is imported only here"""
+    from urllib.request import urlopen
+    with urlopen(JWKS_URL, timeout=5) as response:
+        return json.loads(response.read())['keys']
+
+def get_public_key(kid):
+    """Parsed public key for a kid; an unknown kid refetches JWKS, at most once per JWKS_REFETCH_SECONDS"""
+    global public_keys, jwks_fetched_at
+    if kid not in public_keys:
+        now = time.monotonic()
+        if public_keys and now - jwks_fetched_at < JWKS_REFETCH_SECONDS:
+            return None
+        print('Fetching JWKS keys...')
+        jwks_fetched_at = now
+        public_keys = {k['kid']: RSAAlgorithm.from_jwk(json.dumps(k)) for k in fetch_jwks()}
+    return public_keys.get(kid)
+
+def cached_identity(digest):
+    """(userId, email) of a token verified earlier and not yet expired"""
+    entry = verified_tokens.get(digest)
+    if not entry:
+        return None
+    exp, user_id, email = entry
+    if time.time() >= exp:
+        del verified_tokens[digest]
+        return None
+    verified_tokens.move_to_end(digest)
+    return user_id, email
+
+def remember_identity(digest, payload):
+    verified_tokens[digest] = (payload['exp'], payload['sub'], payload.get('email', ''))
+    if len(verified_tokens) > VERIFIED_CACHE_SIZE:
+        verified_tokens.popitem(last=False)
 
 def lambda_handler(event, context):
     """
     Lambda authorizer to verify Cognito JWT tokens
+
+    A token verified once is trusted from memory until its exp, so repeat
+    calls skip the RS256 check.
     """
     try:
         # Extract token from Authorization header
@@ -22,26 +69,25 @@ def lambda_handler(event, context):
             print('No token provided')
             return generate_policy('user', 'Deny', event['methodArn'])
         
-        # Get JWKS keys (cached)
-        global jwks_keys
-        if not jwks_keys:
-            print('Fetching JWKS keys...')
-            response = requests.get(JWKS_URL, timeout=5)
-            jwks_keys = response.json()['keys']
+        digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        identity = cached_identity(digest)
+        if identity:
+            user_id, email = identity
+            return generate_policy(user_id, 'Allow', event['methodArn'], {
+                'userId': user_id,
+                'email': email
+            })
         
         # Decode token header to get kid
         headers = jwt.get_unverified_header(token)
         kid = headers['kid']
         
-        # Find matching key
-        key = next((k for k in jwks_keys if k['kid'] == kid), None)
-        if not key:
+        # Find matching key (parsed once per JWKS fetch)
+        public_key = get_public_key(kid)
+        if not public_key:
             print(f'Key with kid {kid} not found')
             return generate_policy('user', 'Deny', event['methodArn'])
         
-        # Convert JWK to public key
-        public_key = RSAAlgorithm.from_jwk(json.dumps(key))
-        
         # Verify and decode token
         payload = jwt.decode(
             token,
@@ -49,6 +95,8 @@ def lambda_handler(event, context):
             algorithms=['RS256'],
             options={'verify_aud': False}  # Cognito doesn't always include aud
         )
+        if 'exp' in payload:
+            remember_identity(digest, payload)
         
         # Extract user ID from token
         user_id = payload['sub']
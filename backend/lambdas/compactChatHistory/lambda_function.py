@@ -0,0 +1,154 @@
+import json
+import os
+import aws_clients
+from botocore.exceptions import ClientError
+from datetime import datetime, timedelta
+from chat_archive import archive_sk, decode_archive, encode_turns, daily_aggregates, merge_turns, turn_day, ARCHIVE_FORMAT
+
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+
+# Days newer than this stay as live CHAT# items (today is never complete, and
+# late retries of yesterday's turns may still land)
+COMPACT_AFTER_DAYS = int(os.environ.get('COMPACT_AFTER_DAYS', '2'))
+# DynamoDB items are capped at 400 KB; a day that does not fit stays live
+MAX_ARCHIVE_BYTES = 350 * 1024
+
+def get_user_ids():
+    """All users with a profile"""
+    scan = {
+        'FilterExpression': '#type = :profile',
+        'ExpressionAttributeNames': {'#type': 'type'},
+        'ExpressionAttributeValues': {':profile': 'PROFILE'},
+        'ProjectionExpression': 'PK'
+    }
+    user_ids = []
+    while True:
+        response = table.scan(**scan)
+        user_ids.extend(item['PK'][len('USER#'):] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return user_ids
+        scan['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def live_turns_by_day(user_id, before_day):
+    """Live CHAT# items older than before_day, grouped by day"""
+    query = {
+        'KeyConditionExpression': 'PK = :pk AND SK BETWEEN :start AND :end',
+        'ExpressionAttributeValues': {
+            ':pk': f'USER#{user_id}',
+            ':start': 'CHAT#',
+            ':end': f'CHAT#{before_day}'
+        }
+    }
+    days = {}
+    while True:
+        response = table.query(**query)
+        for item in response.get('Items', []):
+            days.setdefault(turn_day(item['SK']), []).append(item)
+        if 'LastEvaluatedKey' not in response:
+            return days
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def compact_day(user_id, day, live):
+    """
+    Fold one day's live turns into its archive item, then delete them.
+    Returns (turns archived, raw bytes, compressed bytes); (0, 0, 0) if the day was left live.
+    """
+    key = {'PK': f'USER#{user_id}', 'SK': archive_sk(day)}
+    existing = table.get_item(Key=key).get('Item')
+    archived = decode_archive(existing, user_id) if existing else []
+    turns = merge_turns(archived, live)
+
+    payload = encode_turns(turns)
+    if len(payload) > MAX_ARCHIVE_BYTES:
+        print(f"⚠️ {user_id} {day}: {len(payload)} bytes compressed, leaving {len(live)} turns live")
+        return 0, 0, 0
+
+    item = dict(key, **{
+        'type': 'CHATDAY',
+        'userId': user_id,
+        'day': day,
+        'format': ARCHIVE_FORMAT,
+        'turns': payload,
+        'turnCount': len(turns),
+        'aggregates': daily_aggregates(turns),
+        'compactedAt': datetime.utcnow().isoformat() + 'Z'
+    })
+    try:
+        # Another run folding the same day in between would lose its turns on overwrite
+        table.put_item(
+            Item=item,
+            ConditionExpression='attribute_not_exists(SK) OR turnCount = :previous',
+            ExpressionAttributeValues={':previous': existing['turnCount'] if existing else 0}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"⚠️ {user_id} {day}: archive changed concurrently, skipped")
+            return 0, 0, 0
+        raise
+
+    # Only after the archive is stored; readers drop the duplicates meanwhile
+    with table.batch_writer() as batch:
+        for turn in live:
+            batch.delete_item(Key={'PK': turn['PK'], 'SK': turn['SK']})
+
+    raw = sum(len(json.dumps(turn, default=str)) for turn in live)
+    return len(live), raw, len(payload)
+
+def compact_user(user_id, before_day):
+    stats = {'days': 0, 'turns': 0, 'rawBytes': 0, 'archiveBytes': 0}
+    for day, live in sorted(live_turns_by_day(user_id, before_day).items()):
+        turns, raw, compressed = compact_day(user_id, day, live)
+        if turns:
+            stats['days'] += 1
+            stats['turns'] += turns
+            stats['rawBytes'] += raw
+            stats['archiveBytes'] += compressed
+    return stats
+
+def lambda_handler(event, context):
+    """
+    Roll completed days of chat turns into compressed CHATDAY#YYYY-MM-DD items
+
+    Event: {"userId": ...} or {"userIds": [...]} for specific users, {} for
+    every user with a profile (the nightly schedule). "olderThanDays"
+    overrides COMPACT_AFTER_DAYS (minimum 1, so today is never compacted).
+    """
+    try:
+        older_than = max(int(event.get('olderThanDays', COMPACT_AFTER_DAYS)), 1)
+        before_day = (datetime.utcnow() - timedelta(days=older_than - 1)).strftime('%Y-%m-%d')
+
+        if event.get('userId'):
+            user_ids = [event['userId']]
+        else:
+            user_ids = event.get('userIds') or get_user_ids()
+
+        print(f"🗜️ Compacting chat history before {before_day} for {len(user_ids)} users")
+
+        totals = {'users': 0, 'days': 0, 'turns': 0, 'rawBytes': 0, 'archiveBytes': 0, 'errors': 0}
+        for user_id in user_ids:
+            try:
+                stats = compact_user(user_id, before_day)
+            except Exception as e:
+                print(f"Error compacting {user_id}: {e}")
+                totals['errors'] += 1
+                continue
+            if stats['days']:
+                totals['users'] += 1
+                for name, value in stats.items():
+                    totals[name] += value
+
+        print(f"✅ Archived {totals['turns']} turns into {totals['days']} day items "
+              f"for {totals['users']} users, {totals['errors']} errors")
+        return {
+            'statusCode': 200,
+            'body': json.dumps(dict(totals, beforeDay=before_day))
+        }
+
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
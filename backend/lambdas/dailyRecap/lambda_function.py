@@ -1,11 +1,10 @@
 import os, json, datetime
-import boto3
+import aws_clients
 from boto3.dynamodb.conditions import Key
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
-ses = boto3.client('ses')
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+ses = aws_clients.client('ses')
+bedrock = aws_clients.client('bedrock-runtime', region_name='us-east-1')
 
 SENDER = os.environ.get('SENDER_EMAIL', 'noreply@example.com')
 RECIPIENT = os.environ.get('RECIPIENT_EMAIL', 'user@example.com')
@@ -1,14 +1,13 @@
 import json
 import os
-import boto3
+import aws_clients
 from datetime import datetime, timedelta
 from decimal import Decimal
 
 # AWS Clients
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-bedrock_agent = boto3.client('bedrock-agent-runtime', region_name='us-east-1')
-dynamodb = boto3.resource('dynamodb')
-sns = boto3.client('sns')
+bedrock = aws_clients.client('bedrock-runtime', region_name='us-east-1')
+bedrock_agent = aws_clients.client('bedrock-agent-runtime', region_name='us-east-1')
+sns = aws_clients.client('sns')
 
 # Environment variables
 INTERVENTIONS_TABLE = os.environ.get('INTERVENTIONS_TABLE', 'MindMate-Interventions')
@@ -20,10 +19,10 @@ BEDROCK_AGENT_ALIAS_ID = os.environ.get('BEDROCK_AGENT_ALIAS_ID', 'TSTALIASID')
 ALERT_SNS_TOPIC = os.environ.get('ML_ALERTS_SNS_TOPIC', '')
 
 # DynamoDB tables
-interventions_table = dynamodb.Table(INTERVENTIONS_TABLE)
-chat_table = dynamodb.Table(CHAT_HISTORY_TABLE)
-users_table = dynamodb.Table(USERS_TABLE)
-mood_table = dynamodb.Table(MOOD_LOGS_TABLE)
+interventions_table = aws_clients.table(INTERVENTIONS_TABLE)
+chat_table = aws_clients.table(CHAT_HISTORY_TABLE)
+users_table = aws_clients.table(USERS_TABLE)
+mood_table = aws_clients.table(MOOD_LOGS_TABLE)
 
 
 def get_user_profile(user_id):
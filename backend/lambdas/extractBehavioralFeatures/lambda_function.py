@@ -2,10 +2,10 @@ import json
 import os
 from datetime import datetime, timedelta
 from decimal import Decimal
-import boto3
+import aws_clients
+from chat_archive import load_chat_turns
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
 
 def decimal_to_float(obj):
     """Convert DynamoDB Decimal to float"""
@@ -14,7 +14,7 @@ def decimal_to_float(obj):
     return obj
 
 def get_user_interactions(user_id, days=30):
-    """Query DynamoDB for user's mood logs and selfies as interactions"""
+    """Query DynamoDB for user's mood logs, selfies and chat messages as interactions"""
     try:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
@@ -80,35 +80,18 @@ def get_user_interactions(user_id, days=30):
                         'emotions': item.get('emotions', {})
                     })
         
-        # Query chat messages for behavioral analysis
-        chat_response = table.query(
-            KeyConditionExpression='PK = :pk AND begins_with(SK, :chat_prefix)',
-            ExpressionAttributeValues={
-                ':pk': f'USER#{user_id}',
-                ':chat_prefix': 'CHAT#'
-            }
-        )
+        # Chat messages for behavioral analysis, archived days included
+        chat_items = load_chat_turns(
+            table, user_id, f'CHAT#{start_date.isoformat()}', f'CHAT#{end_date.isoformat()}Z')
         
-        for item in chat_response.get('Items', []):
+        for item in chat_items:
             if item.get('type') == 'CHAT' and item.get('userMessage'):
-                item_timestamp = item.get('timestamp', item.get('ts', ''))
-                try:
-                    item_date = datetime.fromisoformat(item_timestamp.replace('Z', '+00:00'))
-                    if item_date >= start_date:
-                        interactions.append({
-                            'type': 'chat_message',
-                            'timestamp': item_timestamp,
-                            'message': item.get('userMessage', ''),
-                            'length': len(item.get('userMessage', ''))
-                        })
-                except Exception as e:
-                    print(f"Error parsing chat timestamp {item_timestamp}: {e}")
-                    interactions.append({
-                        'type': 'chat_message',
-                        'timestamp': item_timestamp,
-                        'message': item.get('userMessage', ''),
-                        'length': len(item.get('userMessage', ''))
-                    })
+                interactions.append({
+                    'type': 'chat_message',
+                    'timestamp': item.get('timestamp', item.get('ts', '')),
+                    'message': item.get('userMessage', ''),
+                    'length': len(item.get('userMessage', ''))
+                })
         
         # Sort by timestamp
         interactions.sort(key=lambda x: x['timestamp'])
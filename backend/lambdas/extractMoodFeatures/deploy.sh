@@ -31,8 +31,8 @@ if [ -f "requirements.txt" ]; then
     echo "📥 Installing dependencies..."
     pip3 install -r requirements.txt -t package/ --quiet 2>/dev/null || pip install -r requirements.txt -t package/ --quiet
     
-    # Copy lambda function to package
-    cp lambda_function.py package/
+    # Copy lambda function and the modules shared between Lambdas to package
+    cp lambda_function.py ../shared/*.py package/
     
     # Create zip
     cd package
@@ -42,8 +42,9 @@ if [ -f "requirements.txt" ]; then
     # Clean up
     rm -rf package
 else
-    # Just zip the lambda function
+    # Just zip the lambda function and the modules shared between Lambdas
     zip function.zip lambda_function.py -q
+    zip -j function.zip ../shared/*.py -q
 fi
 
 cd ../../..
@@ -2,10 +2,9 @@ import json
 import os
 from datetime import datetime, timedelta
 from decimal import Decimal
-import boto3
+import aws_clients
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
 
 def decimal_to_float(obj):
     """Convert DynamoDB Decimal to float"""
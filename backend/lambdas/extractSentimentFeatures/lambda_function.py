@@ -2,11 +2,11 @@ import json
 import os
 from datetime import datetime, timedelta
 from decimal import Decimal
-import boto3
+import aws_clients
+from chat_archive import load_chat_turns
 
-dynamodb = boto3.resource('dynamodb')
-comprehend = boto3.client('comprehend', region_name='us-east-1')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+comprehend = aws_clients.client('comprehend', region_name='us-east-1')
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
 
 def decimal_to_float(obj):
     """Convert DynamoDB Decimal to float"""
@@ -40,35 +40,17 @@ def get_user_messages(user_id, days=30):
                     'mood': decimal_to_float(item.get('mood', 5))
                 })
         
-        # Query chat messages (user messages only, not AI responses)
-        chat_response = table.query(
-            KeyConditionExpression='PK = :pk AND begins_with(SK, :chat_prefix)',
-            ExpressionAttributeValues={
-                ':pk': f'USER#{user_id}',
-                ':chat_prefix': 'CHAT#'
-            }
-        )
+        # Chat messages (user messages only, not AI responses), archived days included
+        chat_items = load_chat_turns(
+            table, user_id, f'CHAT#{start_date.isoformat()}', f'CHAT#{end_date.isoformat()}Z')
         
-        for item in chat_response.get('Items', []):
+        for item in chat_items:
             if item.get('type') == 'CHAT' and item.get('userMessage'):
-                # Filter by date after retrieval
-                item_timestamp = item.get('timestamp', item.get('ts', ''))
-                try:
-                    item_date = datetime.fromisoformat(item_timestamp.replace('Z', '+00:00'))
-                    if item_date >= start_date:
-                        messages.append({
-                            'text': item.get('userMessage', ''),
-                            'timestamp': item_timestamp,
-                            'mood': decimal_to_float(item.get('wellnessScore', 5))  # Use wellness score as mood proxy
-                        })
-                except Exception as e:
-                    print(f"Error parsing timestamp {item_timestamp}: {e}")
-                    # Include anyway if timestamp parsing fails
-                    messages.append({
-                        'text': item.get('userMessage', ''),
-                        'timestamp': item_timestamp,
-                        'mood': 5
-                    })
+                messages.append({
+                    'text': item.get('userMessage', ''),
+                    'timestamp': item.get('timestamp', item.get('ts', '')),
+                    'mood': decimal_to_float(item.get('wellnessScore', 5))  # Use wellness score as mood proxy
+                })
         
         # Sort by timestamp
         messages.sort(key=lambda x: x['timestamp'])
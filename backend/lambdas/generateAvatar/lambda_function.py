@@ -1,11 +1,11 @@
 import json
-import boto3
+import aws_clients
 import base64
 import os
 from datetime import datetime
 
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-s3 = boto3.client('s3')
+bedrock = aws_clients.client('bedrock-runtime', region_name='us-east-1')
+s3 = aws_clients.client('s3')
 
 BUCKET_NAME = 'mindmate-avatars-403745271636'
 
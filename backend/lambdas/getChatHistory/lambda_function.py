@@ -1,26 +1,107 @@
+import base64
+import hashlib
 import json
 import os
-import boto3
+import aws_clients
 from datetime import datetime, timedelta
-from decimal import Decimal
+from chat_archive import decode_archive, iter_archives, archive_sk, turn_day, ARCHIVE_PREFIX
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
 
-def decimal_to_float(obj):
-    """Convert Decimal to float for JSON serialization"""
-    if isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: decimal_to_float(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [decimal_to_float(i) for i in obj]
-    return obj
+HISTORY_DAYS = 30
+PAGE_LIMIT = 100  # turns per page
+ARCHIVE_PAGE_SIZE = 3  # CHATDAY# items read per query while filling a page
+
+def encode_token(last_key):
+    """Opaque nextToken for the key of the oldest turn returned"""
+    return base64.urlsafe_b64encode(json.dumps(last_key, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+def decode_token(token, user_id):
+    """Turn key a nextToken continues below; raises ValueError unless it belongs to this user"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError('invalid nextToken')
+    if not isinstance(key, dict) or key.get('PK') != f'USER#{user_id}' or not str(key.get('SK', '')).startswith('CHAT#'):
+        raise ValueError('invalid nextToken')
+    return {'PK': key['PK'], 'SK': key['SK']}
+
+def make_etag(user_id, newest_sk, start_date, limit):
+    """Validator for the first page: changes when a turn is added or the window moves on a day"""
+    digest = hashlib.sha256(f"{user_id}|{newest_sk}|{start_date.date()}|{limit}".encode('utf-8')).hexdigest()[:32]
+    return f'"{digest}"'
+
+def newest_turn_sk(user_id, start_sk, end_sk):
+    """SK of the newest turn in range, live or archived, from two one-key reads"""
+    live = table.query(
+        KeyConditionExpression='PK = :pk AND SK BETWEEN :start AND :end',
+        ExpressionAttributeValues={':pk': f'USER#{user_id}', ':start': start_sk, ':end': end_sk},
+        ProjectionExpression='SK',
+        ScanIndexForward=False,
+        Limit=1
+    ).get('Items', [])
+    archived = table.query(
+        KeyConditionExpression='PK = :pk AND SK BETWEEN :start AND :end',
+        ExpressionAttributeValues={
+            ':pk': f'USER#{user_id}',
+            ':start': archive_sk(turn_day(start_sk)),
+            ':end': archive_sk(turn_day(end_sk))
+        },
+        ProjectionExpression='aggregates',
+        ScanIndexForward=False,
+        Limit=1
+    ).get('Items', [])
+    candidates = [item['SK'] for item in live]
+    if archived and archived[0].get('aggregates', {}).get('lastAt'):
+        candidates.append(f"CHAT#{archived[0]['aggregates']['lastAt']}")
+    return max(candidates, default='')
+
+def load_page(user_id, start_sk, end_sk, limit, before=None):
+    """
+    Up to `limit` turns with start_sk <= SK <= end_sk (and SK < before),
+    newest first, merged from the live CHAT# tail and CHATDAY# archives.
+    Returns (turns, more) where more is True if older turns may remain.
+    """
+    if before:
+        end_sk = min(end_sk, before)
+    response = table.query(
+        KeyConditionExpression='PK = :pk AND SK BETWEEN :start AND :end',
+        ExpressionAttributeValues={':pk': f'USER#{user_id}', ':start': start_sk, ':end': end_sk},
+        ProjectionExpression='SK, #type, userMessage, aiResponse, #timestamp, ts',
+        ExpressionAttributeNames={'#type': 'type', '#timestamp': 'timestamp'},
+        ScanIndexForward=False,  # Newest first; each page is older than the last
+        Limit=limit + 1  # the `before` turn itself is in range when it is still live
+    )
+    turns = {item['SK']: item for item in response.get('Items', []) if item['SK'] != before}
+    more = 'LastEvaluatedKey' in response
+
+    # Archived days newest first, until they can no longer reach into the page:
+    # older than a full page of live turns, or `limit` archived turns collected
+    live_floor = sorted(turns, reverse=True)[limit - 1] if len(turns) >= limit else None
+    archived = 0
+    for item in iter_archives(table, user_id, turn_day(start_sk), turn_day(end_sk),
+                              newest_first=True, page_size=ARCHIVE_PAGE_SIZE):
+        if (live_floor and item['SK'][len(ARCHIVE_PREFIX):] < turn_day(live_floor)) or archived >= limit:
+            more = True
+            break
+        for turn in decode_archive(item, user_id):
+            if start_sk <= turn['SK'] <= end_sk and turn['SK'] != before:
+                turns[turn['SK']] = turn
+                archived += 1
+
+    newest = sorted(turns, reverse=True)
+    return [turns[sk] for sk in newest[:limit]], more or len(newest) > limit
 
 def lambda_handler(event, context):
     """
     Retrieve chat history for a user from DynamoDB
-    Returns last 30 days of conversations
+    Returns last 30 days of conversations, newest page first. Days rolled
+    into CHATDAY# archives by compactChatHistory are merged with live turns.
+    
+    Query parameters: userId, limit (turns per page, max 100), nextToken
+    (from the previous page, for older turns), since (timestamp; only turns
+    after it). First pages carry an ETag, and If-None-Match gets a 304 when
+    no turn has been added since.
     """
     
     # Headers (CORS handled by Lambda URL)
@@ -35,6 +116,7 @@ def lambda_handler(event, context):
         
         # Get userId from query params or body
         user_id = None
+        body = {}
         if event.get('queryStringParameters'):
             user_id = event['queryStringParameters'].get('userId')
         elif event.get('body'):
@@ -48,24 +130,43 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'userId is required'})
             }
         
-        # Query last 30 days of chat messages
+        params = event.get('queryStringParameters') or body
+        request_headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+        
+        try:
+            limit = min(max(int(params.get('limit', PAGE_LIMIT)), 1), PAGE_LIMIT)
+            start_key = decode_token(params['nextToken'], user_id) if params.get('nextToken') else None
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': str(e)})
+            }
+        
+        # Last 30 days of chat turns, or only those after `since`
         end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
+        start_date = end_date - timedelta(days=HISTORY_DAYS)
+        start_sk = f'CHAT#{start_date.isoformat()}'
+        end_sk = f'CHAT#{end_date.isoformat()}Z'
+        since = params.get('since')
+        if since:
+            start_sk = max(start_sk, f'CHAT#{since}\x00')
         
-        response = table.query(
-            KeyConditionExpression='PK = :pk AND SK BETWEEN :start AND :end',
-            ExpressionAttributeValues={
-                ':pk': f'USER#{user_id}',
-                ':start': f'CHAT#{start_date.isoformat()}',
-                ':end': f'CHAT#{end_date.isoformat()}Z'
-            },
-            ScanIndexForward=True,  # Oldest first
-            Limit=100  # Last 100 messages
-        )
+        # Revalidation: one-key reads decide whether the client's first page is still current
+        etag = None
+        if not start_key and not since:
+            if request_headers.get('if-none-match'):
+                etag = make_etag(user_id, newest_turn_sk(user_id, start_sk, end_sk), start_date, limit)
+                if etag in request_headers['if-none-match']:
+                    return {'statusCode': 304, 'headers': dict(headers, ETag=etag), 'body': ''}
+        
+        items, more = load_page(user_id, start_sk, end_sk, limit, start_key['SK'] if start_key else None)
+        if not start_key and not since:
+            etag = make_etag(user_id, items[0]['SK'] if items else '', start_date, limit)
         
         # Format messages for frontend
         messages = []
-        for item in response.get('Items', []):
+        for item in reversed(items):  # oldest first within the page
             if item.get('type') == 'CHAT':
                 # Add user message
                 if item.get('userMessage'):
@@ -83,16 +184,18 @@ def lambda_handler(event, context):
                         'timestamp': item.get('timestamp', item.get('ts'))
                     })
         
-        # Convert Decimals to floats
-        messages = decimal_to_float(messages)
+        last_key = {'PK': f'USER#{user_id}', 'SK': items[-1]['SK']} if more and items else None
+        # no-cache: browsers keep the page but revalidate it with If-None-Match
+        response_headers = dict(headers, ETag=etag, **{'Cache-Control': 'private, no-cache'}) if etag else headers
         
         return {
             'statusCode': 200,
-            'headers': headers,
+            'headers': response_headers,
             'body': json.dumps({
                 'messages': messages,
                 'count': len(messages),
-                'userId': user_id
+                'userId': user_id,
+                'nextToken': encode_token(last_key) if last_key else None
             })
         }
         
@@ -1,9 +1,9 @@
 import json, os, datetime
-import boto3
+import aws_clients
+from interactive import get_request_id, hand_off, store_event
 
-dynamodb = boto3.resource('dynamodb')
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+bedrock = aws_clients.client('bedrock-runtime', region_name='us-east-1')
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
 
 def _resp(status, body):
     return {
@@ -79,6 +79,10 @@ Keep suggestions practical, specific, and encouraging."""
             ]
 
 def lambda_handler(event, context):
+    if "persist" in event:
+        # Mood entry queued by an earlier request
+        store_event(event, table)
+        return {"statusCode": 200}
     try:
         body = json.loads(event.get("body", "{}")) if isinstance(event.get("body"), str) else (event.get("body") or {})
         user_id = body.get("userId", "demo-user")
@@ -110,8 +114,9 @@ def lambda_handler(event, context):
             "suggestions": suggestions,
             "ts": ts
         }
-        table.put_item(Item=item)
-        
+        # Stored by an async invocation, off the reply path; a retried request is stored once
+        if not hand_off(context, table, item, get_request_id(body)):
+            return _resp(500, {"error": "DynamoDB error: mood entry not stored"})
         return _resp(200, {
             "ok": True,
             "ts": ts,
@@ -2,18 +2,36 @@ import json
 import os
 from datetime import datetime, timedelta
 from decimal import Decimal
-import boto3
+import aws_clients
 import csv
-from io import StringIO
+import gzip
+import hashlib
+import math
+import struct
+import random
+from array import array
+from io import BytesIO, StringIO
 
-dynamodb = boto3.resource('dynamodb')
-lambda_client = boto3.client('lambda')
-s3 = boto3.client('s3')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
-training_jobs_table = dynamodb.Table(os.environ.get('TRAINING_JOBS_TABLE', 'MindMate-TrainingJobs'))
+dynamodb = aws_clients.resource('dynamodb')
+lambda_client = aws_clients.client('lambda', 'invoke')  # runs the extractors synchronously
+s3 = aws_clients.client('s3')
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+training_jobs_table = aws_clients.table(os.environ.get('TRAINING_JOBS_TABLE', 'MindMate-TrainingJobs'))
 
 ML_MODELS_BUCKET = os.environ.get('ML_MODELS_BUCKET')
 
+# Columnar dataset layout (read by sagemaker/train.py with np.load(mmap_mode='r'))
+DATASET_SCHEMA_VERSION = 1
+NON_FEATURE_COLUMNS = ('label', 'sample_id', 'userId', 'userKey', 'group_id', 'sample_weight')
+ROW_GROUP_SIZE = 1000
+MULTIPART_PART_SIZE = 8 * 1024 * 1024  # S3 requires >= 5 MB for every part but the last
+
+# Incremental builds: per-user snapshot partition in S3 plus watermarks in the training jobs table
+SNAPSHOT_PREFIX = 'training/snapshots'
+SNAPSHOT_MANIFEST_JOB_ID = 'data-prep-snapshots#latest'
+WATERMARK_JOB_ID_PREFIX = 'data-prep-watermark#'
+ACTIVITY_PREFIXES = ('MOOD#', 'CHAT#')
+
 def decimal_to_float(obj):
     """Convert DynamoDB Decimal to float"""
     if isinstance(obj, Decimal):
@@ -187,63 +205,225 @@ def prepare_dataset(users, days=30):
     
     return dataset
 
-def anonymize_dataset(dataset):
-    """Remove PII from dataset"""
-    anonymized = []
+def user_key(user_id):
+    """Stable pseudonymous key for a user, used in snapshots and watermarks instead of the userId"""
+    return hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:32]
+
+def get_latest_activity(user_id):
+    """Get the newest sort key for each activity prefix (MOOD#, CHAT#) of a user"""
+    activity = {}
+    for prefix in ACTIVITY_PREFIXES:
+        response = table.query(
+            KeyConditionExpression='PK = :pk AND begins_with(SK, :prefix)',
+            ExpressionAttributeValues={
+                ':pk': f'USER#{user_id}',
+                ':prefix': prefix
+            },
+            ProjectionExpression='SK',
+            ScanIndexForward=False,
+            Limit=1
+        )
+        items = response.get('Items', [])
+        activity[prefix] = items[0]['SK'] if items else ''
+    return activity
+
+def get_watermarks(users):
+    """Batch-read per-user watermarks (latest activity seen by the last build)"""
+    watermarks = {}
+    keys = [{'jobId': f"{WATERMARK_JOB_ID_PREFIX}{user_key(u['userId'])}"} for u in users]
+    
+    for start in range(0, len(keys), 100):
+        request = {training_jobs_table.name: {'Keys': keys[start:start + 100]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(training_jobs_table.name, []):
+                watermarks[item['userKey']] = item.get('activity', {})
+            request = response.get('UnprocessedKeys') or None
+    
+    return watermarks
+
+def save_watermarks(watermarks, timestamp):
+    """Record the activity each recomputed user's snapshot was built from"""
+    with training_jobs_table.batch_writer() as batch:
+        for key, activity in watermarks.items():
+            batch.put_item(Item={
+                'jobId': f'{WATERMARK_JOB_ID_PREFIX}{key}',
+                'userKey': key,
+                'activity': activity,
+                'builtAt': timestamp
+            })
+    print(f"Updated {len(watermarks)} user watermarks")
+
+def has_new_activity(activity, watermark):
+    """Check whether any MOOD#/CHAT# item is newer than the watermark"""
+    return watermark is None or any(activity.get(p, '') > watermark.get(p, '') for p in ACTIVITY_PREFIXES)
+
+def load_snapshot_partition():
+    """Load the previous per-user snapshot partition from S3 as {userKey: row}"""
+    try:
+        manifest = training_jobs_table.get_item(Key={'jobId': SNAPSHOT_MANIFEST_JOB_ID}).get('Item')
+        if not manifest:
+            print("No previous snapshot partition, building from scratch")
+            return {}
+        
+        body = s3.get_object(Bucket=ML_MODELS_BUCKET, Key=manifest['snapshotKey'])['Body']
+        snapshots = {}
+        with gzip.GzipFile(fileobj=body) as lines:
+            for line in lines:
+                row = json.loads(line)
+                snapshots[row['userKey']] = row
+        
+        print(f"Loaded {len(snapshots)} snapshots from s3://{ML_MODELS_BUCKET}/{manifest['snapshotKey']}")
+        return snapshots
+        
+    except Exception as e:
+        print(f"Error loading previous snapshot partition, building from scratch: {e}")
+        return {}
+
+def save_snapshot_partition(dataset, timestamp):
+    """Write the merged per-user snapshots as gzipped JSON lines and point the manifest at them"""
+    s3_key = f'{SNAPSHOT_PREFIX}/snapshots_{timestamp}.jsonl.gz'
     
+    buffer = BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as out:
+        for row in dataset:
+            snapshot = {k: v for k, v in row.items() if k != 'userId'}
+            out.write(json.dumps(snapshot).encode('utf-8') + b'\n')
+    
+    s3.put_object(
+        Bucket=ML_MODELS_BUCKET,
+        Key=s3_key,
+        Body=buffer.getvalue(),
+        ContentType='application/x-ndjson',
+        ContentEncoding='gzip'
+    )
+    training_jobs_table.put_item(Item={
+        'jobId': SNAPSHOT_MANIFEST_JOB_ID,
+        'snapshotKey': s3_key,
+        'timestamp': timestamp,
+        'users': len(dataset)
+    })
+    
+    print(f"Saved {len(dataset)} snapshots to s3://{ML_MODELS_BUCKET}/{s3_key}")
+    return f's3://{ML_MODELS_BUCKET}/{s3_key}'
+
+def prepare_incremental_dataset(users, days=30, full_rebuild=False):
+    """Prepare the dataset, recomputing snapshots only for users with new activity.
+
+    Users whose latest MOOD#/CHAT# items are not newer than their watermark
+    reuse their row from the previous snapshot partition. Returns the merged
+    dataset and the watermarks to save once that partition is persisted.
+    """
+    previous = {} if full_rebuild else load_snapshot_partition()
+    watermarks = get_watermarks(users) if previous else {}
+    
+    changed_users = []
+    dataset = []
+    activity_by_key = {}
+    for user in users:
+        key = user_key(user['userId'])
+        activity = get_latest_activity(user['userId'])
+        if key in previous and not has_new_activity(activity, watermarks.get(key)):
+            dataset.append({**previous[key], 'userId': user['userId']})
+        else:
+            changed_users.append(user)
+            activity_by_key[key] = activity
+    
+    print(f"Incremental build: {len(changed_users)} users with new activity, {len(dataset)} reused")
+    
+    fresh = prepare_dataset(changed_users, days=days)
+    for row in fresh:
+        row['userKey'] = user_key(row['userId'])
+    
+    new_watermarks = {row['userKey']: activity_by_key[row['userKey']] for row in fresh}
+    return dataset + fresh, new_watermarks, len(fresh)
+
+def anonymize_dataset(dataset):
+    """Remove PII from dataset (in place, so row indices stay valid)
+
+    Rows of the same user share an ordinal group_id so the trainer can
+    build user-grouped cross-validation folds without knowing who they are.
+    """
+    groups = {}
     for i, row in enumerate(dataset):
-        # Remove userId, replace with anonymous ID
-        anon_row = {k: v for k, v in row.items() if k != 'userId'}
-        anon_row['sample_id'] = f'sample_{i:06d}'
-        anonymized.append(anon_row)
+        # Remove userId and snapshot key, replace with anonymous IDs
+        user_id = row.pop('userId', None)
+        row.pop('userKey', None)
+        row['sample_id'] = f'sample_{i:06d}'
+        row['group_id'] = groups.setdefault(user_id, len(groups))
     
-    return anonymized
+    return dataset
 
-def split_train_validation(dataset, validation_split=0.2):
-    """Split dataset into train and validation sets"""
-    import random
+def split_by_user(dataset, validation_split=0.2, seed=None):
+    """Split row indices into train and validation sets by user.
+
+    All rows of a user land on the same side, so oversampled or repeated
+    snapshots can never leak into validation. Users are stratified by
+    whether they have any positive label.
+    """
+    rng = random.Random(seed)
     
-    # Shuffle dataset
-    random.shuffle(dataset)
+    user_rows = {}
+    for i, row in enumerate(dataset):
+        user_rows.setdefault(row.get('userId'), []).append(i)
     
-    # Calculate split point
-    split_idx = int(len(dataset) * (1 - validation_split))
+    positive_users = {u for u, rows in user_rows.items() if any(dataset[i].get('label') == 1 for i in rows)}
+    negative_users = sorted(u for u in user_rows if u not in positive_users)
+    positive_users = sorted(positive_users)
     
-    train_data = dataset[:split_idx]
-    val_data = dataset[split_idx:]
+    train_idx = array('I')
+    val_idx = array('I')
+    for users in (positive_users, negative_users):
+        rng.shuffle(users)
+        n_val = int(round(len(users) * validation_split))
+        for j, user_id in enumerate(users):
+            (val_idx if j < n_val else train_idx).extend(user_rows[user_id])
     
-    return train_data, val_data
+    print(f"User split: {len(positive_users)} positive / {len(negative_users)} negative users, "
+          f"{len(train_idx)} train rows, {len(val_idx)} validation rows")
+    return train_idx, val_idx
 
-def balance_classes(dataset):
-    """Balance classes using oversampling of minority class"""
-    positive_samples = [d for d in dataset if d.get('label') == 1]
-    negative_samples = [d for d in dataset if d.get('label') == 0]
+def balance_indices(dataset, indices, strategy='oversample', seed=None):
+    """Balance classes over an index array without copying rows.
+
+    'oversample' returns a shuffled index array where minority rows are drawn
+    again by index; 'weights' keeps the indices and returns per-row sample
+    weights instead (n / (2 * class_count)).
+    Returns (indices, weights) where weights is None for 'oversample'.
+    """
+    rng = random.Random(seed)
+    
+    positive = array('I', (i for i in indices if dataset[i].get('label') == 1))
+    negative = array('I', (i for i in indices if dataset[i].get('label') != 1))
+    
+    print(f"Class distribution: Positive={len(positive)}, Negative={len(negative)}")
     
-    print(f"Class distribution: Positive={len(positive_samples)}, Negative={len(negative_samples)}")
+    if not positive or not negative:
+        print("Only one class present, skipping balancing")
+        return indices, None
     
-    # Oversample minority class
-    if len(positive_samples) < len(negative_samples):
-        # Oversample positive class
-        import random
-        while len(positive_samples) < len(negative_samples):
-            positive_samples.append(random.choice(positive_samples))
-    elif len(negative_samples) < len(positive_samples):
-        # Oversample negative class
-        import random
-        while len(negative_samples) < len(positive_samples):
-            negative_samples.append(random.choice(negative_samples))
+    if strategy == 'weights':
+        weight = {1: len(indices) / (2 * len(positive)), 0: len(indices) / (2 * len(negative))}
+        weights = array('f', (weight[1 if dataset[i].get('label') == 1 else 0] for i in indices))
+        print(f"Sample weights: positive={weight[1]:.3f}, negative={weight[0]:.3f}")
+        return indices, weights
     
-    balanced = positive_samples + negative_samples
-    import random
-    random.shuffle(balanced)
+    # Oversample minority class by index
+    minority, majority = (positive, negative) if len(positive) < len(negative) else (negative, positive)
+    extra = array('I', (minority[rng.randrange(len(minority))] for _ in range(len(majority) - len(minority))))
+    
+    balanced = positive + negative + extra
+    rng.shuffle(balanced)
     
     print(f"Balanced dataset: {len(balanced)} samples")
-    return balanced
+    return balanced, None
 
-def save_to_s3(dataset, filename):
-    """Save dataset to S3 as CSV"""
+def save_to_s3(dataset, filename, indices=None, weights=None):
+    """Save the rows selected by indices (default: all) to S3 as CSV"""
     try:
-        if not dataset:
+        if indices is None:
+            indices = range(len(dataset))
+        if not indices:
             print("No data to save")
             return None
         
@@ -251,11 +431,15 @@ def save_to_s3(dataset, filename):
         output = StringIO()
         
         # Get all field names
-        fieldnames = list(dataset[0].keys())
+        fieldnames = list(dataset[indices[0]].keys())
+        if weights is not None:
+            fieldnames.append('sample_weight')
         
         writer = csv.DictWriter(output, fieldnames=fieldnames)
         writer.writeheader()
-        writer.writerows(dataset)
+        for n, i in enumerate(indices):
+            row = dataset[i] if weights is None else {**dataset[i], 'sample_weight': weights[n]}
+            writer.writerow(row)
         
         # Upload to S3
         csv_content = output.getvalue()
@@ -269,7 +453,7 @@ def save_to_s3(dataset, filename):
         )
         
         s3_path = f's3://{ML_MODELS_BUCKET}/{s3_key}'
-        print(f"Saved {len(dataset)} samples to {s3_path}")
+        print(f"Saved {len(indices)} samples to {s3_path}")
         
         return s3_path
         
@@ -277,6 +461,195 @@ def save_to_s3(dataset, filename):
         print(f"Error saving to S3: {e}")
         return None
 
+class NpyStreamWriter:
+    """Stream a 2-D .npy array to S3 row group by row group via multipart upload.
+
+    The .npy header holds the final shape, so the first part is kept in memory
+    until close() and uploaded last; every other part is flushed as soon as it
+    reaches MULTIPART_PART_SIZE. Memory stays bounded at roughly two parts.
+    """
+
+    def __init__(self, bucket, key, dtype, row_width, metadata=None):
+        self.bucket = bucket
+        self.key = key
+        self.dtype = dtype
+        self.row_width = row_width
+        self.metadata = metadata or {}
+        self.rows = 0
+        self.head = bytearray()
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+
+    def write_rows(self, packed, row_count):
+        """Append already packed little-endian row bytes"""
+        self.rows += row_count
+        if self.upload_id is None and len(self.head) < MULTIPART_PART_SIZE:
+            self.head.extend(packed)
+            return
+        self.buffer.extend(packed)
+        if len(self.buffer) >= MULTIPART_PART_SIZE:
+            self._upload_part(bytes(self.buffer))
+            self.buffer = bytearray()
+
+    def _upload_part(self, body, part_number=None):
+        if self.upload_id is None:
+            response = s3.create_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                ContentType='application/octet-stream',
+                Metadata=self.metadata
+            )
+            self.upload_id = response['UploadId']
+        if part_number is None:
+            part_number = len(self.parts) + 2  # part 1 is reserved for header + head
+        response = s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        self.parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+
+    def _header(self):
+        """Build a version 1.0 .npy header for the final shape"""
+        shape = f'({self.rows},)' if self.row_width is None else f'({self.rows}, {self.row_width})'
+        header = f"{{'descr': '{self.dtype}', 'fortran_order': False, 'shape': {shape}, }}"
+        # Magic (6) + version (2) + length (2) + header + newline, padded to 64 bytes
+        padding = 64 - (10 + len(header) + 1) % 64
+        header = header + ' ' * padding + '\n'
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+    def close(self):
+        """Upload the header part and complete the object"""
+        first_part = self._header() + bytes(self.head)
+        if self.upload_id is None:
+            # Small dataset: no part was flushed, so everything fits in one request
+            s3.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=first_part + bytes(self.buffer),
+                ContentType='application/octet-stream',
+                Metadata=self.metadata
+            )
+            return
+        if self.buffer:
+            self._upload_part(bytes(self.buffer))
+            self.buffer = bytearray()
+        self._upload_part(first_part, part_number=1)
+        s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': sorted(self.parts, key=lambda p: p['PartNumber'])}
+        )
+
+    def abort(self):
+        if self.upload_id is not None:
+            try:
+                s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            except Exception as e:
+                print(f"Error aborting multipart upload for {self.key}: {e}")
+
+def to_float32(value):
+    """Coerce a feature value to float, using NaN for missing or non-numeric values"""
+    if value is None or value == '':
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def save_columnar_to_s3(dataset, name, indices=None, weights=None):
+    """Save the rows selected by indices (default: all) to S3 as typed columnar arrays.
+
+    Writes float32 features, int8 labels, int32 user group ids, optional
+    float32 sample weights and a schema.json manifest under training/{name}/ so SageMaker can use the
+    prefix directly as a channel.
+    """
+    writers = []
+    try:
+        if indices is None:
+            indices = range(len(dataset))
+        if not indices:
+            print("No data to save")
+            return None
+
+        feature_names = [k for k in dataset[indices[0]].keys() if k not in NON_FEATURE_COLUMNS]
+        prefix = f'training/{name}'
+        metadata = {'schema-version': str(DATASET_SCHEMA_VERSION)}
+
+        features_writer = NpyStreamWriter(
+            ML_MODELS_BUCKET, f'{prefix}/features.npy', '<f4', len(feature_names), metadata
+        )
+        labels_writer = NpyStreamWriter(
+            ML_MODELS_BUCKET, f'{prefix}/labels.npy', '|i1', None, metadata
+        )
+        groups_writer = NpyStreamWriter(
+            ML_MODELS_BUCKET, f'{prefix}/groups.npy', '<i4', None, metadata
+        )
+        writers = [features_writer, labels_writer, groups_writer]
+        files = {'features': 'features.npy', 'labels': 'labels.npy', 'groups': 'groups.npy'}
+        if weights is not None:
+            weights_writer = NpyStreamWriter(
+                ML_MODELS_BUCKET, f'{prefix}/weights.npy', '<f4', None, metadata
+            )
+            writers.append(weights_writer)
+            files['weights'] = 'weights.npy'
+
+        row_format = struct.Struct(f'<{len(feature_names)}f')
+        for start in range(0, len(indices), ROW_GROUP_SIZE):
+            group = [dataset[i] for i in indices[start:start + ROW_GROUP_SIZE]]
+            features_writer.write_rows(
+                b''.join(row_format.pack(*[to_float32(row.get(f)) for f in feature_names]) for row in group),
+                len(group)
+            )
+            labels_writer.write_rows(
+                struct.pack(f'<{len(group)}b', *[int(row.get('label', 0)) for row in group]),
+                len(group)
+            )
+            groups_writer.write_rows(
+                struct.pack(f'<{len(group)}i', *[int(row.get('group_id', -1)) for row in group]),
+                len(group)
+            )
+            if weights is not None:
+                weights_writer.write_rows(
+                    struct.pack(f'<{len(group)}f', *weights[start:start + ROW_GROUP_SIZE]),
+                    len(group)
+                )
+
+        for writer in writers:
+            writer.close()
+
+        schema = {
+            'schemaVersion': DATASET_SCHEMA_VERSION,
+            'format': 'npy',
+            'rows': len(indices),
+            'featureNames': feature_names,
+            'featureDtype': 'float32',
+            'labelDtype': 'int8',
+            'files': files
+        }
+        s3.put_object(
+            Bucket=ML_MODELS_BUCKET,
+            Key=f'{prefix}/schema.json',
+            Body=json.dumps(schema, indent=2).encode('utf-8'),
+            ContentType='application/json',
+            Metadata=metadata
+        )
+
+        s3_path = f's3://{ML_MODELS_BUCKET}/{prefix}/'
+        print(f"Saved {len(indices)} samples ({len(feature_names)} features) to {s3_path}")
+
+        return s3_path
+
+    except Exception as e:
+        print(f"Error saving columnar dataset to S3: {e}")
+        for writer in writers:
+            writer.abort()
+        return None
+
 def lambda_handler(event, context):
     """Lambda handler for training data preparation"""
     try:
@@ -285,6 +658,10 @@ def lambda_handler(event, context):
         # Get configuration
         min_days = event.get('minDays', 60)
         validation_split = event.get('validationSplit', 0.2)
+        full_rebuild = bool(event.get('fullRebuild', False))
+        output_format = event.get('outputFormat', 'npy')  # 'npy' (columnar) or 'csv' (compatibility)
+        balance_strategy = event.get('balanceStrategy', 'oversample')  # 'oversample' or 'weights'
+        seed = int(event.get('seed', random.randrange(2**31)))
         
         # Get users with sufficient history
         users = get_active_users(min_days=min_days)
@@ -299,9 +676,10 @@ def lambda_handler(event, context):
                 })
             }
         
-        # Prepare dataset
-        print(f"Preparing dataset from {len(users)} users...")
-        dataset = prepare_dataset(users, days=30)
+        # Prepare dataset (only users with new activity are re-extracted)
+        print(f"Preparing dataset from {len(users)} users (fullRebuild={full_rebuild})...")
+        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        dataset, watermarks, users_recomputed = prepare_incremental_dataset(users, days=30, full_rebuild=full_rebuild)
         
         if len(dataset) < 10:
             return {
@@ -313,22 +691,41 @@ def lambda_handler(event, context):
                 })
             }
         
+        # Persist merged snapshots, then advance watermarks for the users that were recomputed
+        snapshot_path = save_snapshot_partition(dataset, timestamp)
+        save_watermarks(watermarks, timestamp)
+        
+        # Split train/validation by user (before anonymization removes userId)
+        print(f"Splitting dataset by user (validation={validation_split}, seed={seed})...")
+        train_idx, val_idx = split_by_user(dataset, validation_split, seed=seed)
+        
+        # Recomputed users are appended after the reused ones; their training rows are the
+        # new data for warm-start retraining (empty after a full rebuild)
+        first_new = len(dataset) - users_recomputed
+        new_idx = array('I', (i for i in train_idx if i >= first_new)) if first_new > 0 else array('I')
+        
         # Anonymize data
         print("Anonymizing dataset...")
         dataset = anonymize_dataset(dataset)
         
-        # Balance classes
-        print("Balancing classes...")
-        dataset = balance_classes(dataset)
-        
-        # Split train/validation
-        print(f"Splitting dataset (validation={validation_split})...")
-        train_data, val_data = split_train_validation(dataset, validation_split)
+        # Balance classes (training rows only; validation keeps the real distribution)
+        print(f"Balancing classes ({balance_strategy})...")
+        train_idx, train_weights = balance_indices(dataset, train_idx, strategy=balance_strategy, seed=seed)
+        if new_idx:
+            new_idx, new_weights = balance_indices(dataset, new_idx, strategy=balance_strategy, seed=seed)
         
         # Save to S3
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        train_path = save_to_s3(train_data, f'train_{timestamp}.csv')
-        val_path = save_to_s3(val_data, f'validation_{timestamp}.csv')
+        new_data_path = None
+        if output_format == 'csv':
+            train_path = save_to_s3(dataset, f'train_{timestamp}.csv', train_idx, train_weights)
+            val_path = save_to_s3(dataset, f'validation_{timestamp}.csv', val_idx)
+            if new_idx:
+                new_data_path = save_to_s3(dataset, f'new_{timestamp}.csv', new_idx, new_weights)
+        else:
+            train_path = save_columnar_to_s3(dataset, f'train_{timestamp}', train_idx, train_weights)
+            val_path = save_columnar_to_s3(dataset, f'validation_{timestamp}', val_idx)
+            if new_idx:
+                new_data_path = save_columnar_to_s3(dataset, f'new_{timestamp}', new_idx, new_weights)
         
         if not train_path or not val_path:
             return {
@@ -337,8 +734,8 @@ def lambda_handler(event, context):
             }
         
         # Calculate class distribution
-        train_positive = len([d for d in train_data if d.get('label') == 1])
-        val_positive = len([d for d in val_data if d.get('label') == 1])
+        train_positive = sum(1 for i in train_idx if dataset[i].get('label') == 1)
+        val_positive = sum(1 for i in val_idx if dataset[i].get('label') == 1)
         
         result = {
             'statusCode': 200,
@@ -346,13 +743,20 @@ def lambda_handler(event, context):
                 'success': True,
                 'trainPath': train_path,
                 'validationPath': val_path,
+                'newDataPath': new_data_path,
+                'outputFormat': output_format,
+                'balanceStrategy': balance_strategy,
+                'seed': seed,
+                'snapshotPath': snapshot_path,
+                'usersRecomputed': users_recomputed,
+                'usersReused': len(dataset) - users_recomputed,
                 'totalSamples': len(dataset),
-                'trainSamples': len(train_data),
-                'validationSamples': len(val_data),
+                'trainSamples': len(train_idx),
+                'validationSamples': len(val_idx),
                 'trainPositiveClass': train_positive,
-                'trainNegativeClass': len(train_data) - train_positive,
+                'trainNegativeClass': len(train_idx) - train_positive,
                 'valPositiveClass': val_positive,
-                'valNegativeClass': len(val_data) - val_positive,
+                'valNegativeClass': len(val_idx) - val_positive,
                 'timestamp': timestamp
             })
         }
@@ -365,9 +769,17 @@ def lambda_handler(event, context):
                 'timestamp': datetime.utcnow().isoformat(),
                 'trainPath': train_path,
                 'validationPath': val_path,
+                'newDataPath': new_data_path,
+                'outputFormat': output_format,
+                'schemaVersion': DATASET_SCHEMA_VERSION if output_format != 'csv' else None,
+                'balanceStrategy': balance_strategy,
+                'seed': seed,
+                'snapshotPath': snapshot_path,
+                'usersRecomputed': users_recomputed,
+                'usersReused': len(dataset) - users_recomputed,
                 'totalSamples': len(dataset),
-                'trainSamples': len(train_data),
-                'validationSamples': len(val_data)
+                'trainSamples': len(train_idx),
+                'validationSamples': len(val_idx)
             })
         except Exception as e:
             print(f"Error logging to training jobs table: {e}")
@@ -1,10 +1,9 @@
 import json
-import boto3
+import aws_clients
 import os
 
-cognito = boto3.client('cognito-idp')
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
+cognito = aws_clients.client('cognito-idp')
+table = aws_clients.table(os.environ.get('TABLE_NAME', 'EmoCompanion'))
 
 USER_POOL_ID = os.environ.get('USER_POOL_ID', 'us-east-1_0xN9Gguz1')
 
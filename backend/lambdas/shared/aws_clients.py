@@ -0,0 +1,109 @@
+"""
+Lazily built, pooled AWS clients shared by the Lambdas.
+
+client() and table() return stand-ins that build the boto3 client or Table on
+first use, so an invocation only pays for the services it calls. Built
+objects are cached for the life of the execution environment: warm
+invocations reuse their connections, and every Table handle for the same
+table name is one object.
+
+Each client gets the botocore Config of a call-type profile: pool size,
+TCP keep-alive, adaptive retries and connect/read timeouts sized for the
+call. Deploy scripts copy this file next to lambda_function.py in the package.
+"""
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+# Sized for handlers that overlap calls on a few threads (write-behind, screening, batches)
+POOL_SIZE = int(os.environ.get('AWS_POOL_SIZE', '25'))
+
+# Call-type profiles: (connect timeout s, read timeout s, attempts including the first)
+PROFILES = {
+    'default': (2, 10, 3),
+    # DynamoDB reads and writes: fail fast and retry; throttles back off adaptively
+    'data': (1, 5, 5),
+    # Bedrock model and agent calls: long generations, few retries (each is slow and billed)
+    'model': (2, 60, 2),
+    # Fire-and-forget Lambda invokes, SNS, WebSocket frames: never hold up the reply
+    'async': (1, 3, 3),
+    # Synchronous Lambda invokes that run another function to completion
+    'invoke': (2, 130, 1)
+}
+
+# Profile used when the caller does not name one
+SERVICE_PROFILES = {
+    'dynamodb': 'data',
+    'bedrock-runtime': 'model',
+    'bedrock-agent-runtime': 'model',
+    'lambda': 'async',
+    'sns': 'async',
+    'apigatewaymanagementapi': 'async'
+}
+
+_clients = {}
+_tables = {}
+_lock = threading.RLock()
+
+def config_for(profile):
+    connect_timeout, read_timeout, max_attempts = PROFILES[profile]
+    return Config(
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries={'mode': 'adaptive', 'total_max_attempts': max_attempts},
+        max_pool_connections=POOL_SIZE,
+        tcp_keepalive=True
+    )
+
+class _Lazy:
+    """Builds its target on first attribute access and forwards to it"""
+
+    def __init__(self, build):
+        self._build = build
+        self._target = None
+
+    def __getattr__(self, name):
+        if self._target is None:
+            self._target = self._build()
+        return getattr(self._target, name)
+
+def get_client(service, profile=None, region_name=None, endpoint_url=None):
+    """The cached boto3 client for a service and call-type profile, built now"""
+    profile = profile or SERVICE_PROFILES.get(service, 'default')
+    key = (service, profile, region_name, endpoint_url)
+    if key not in _clients:
+        with _lock:
+            if key not in _clients:
+                _clients[key] = boto3.client(
+                    service, region_name=region_name, endpoint_url=endpoint_url, config=config_for(profile))
+    return _clients[key]
+
+def get_resource(service='dynamodb'):
+    """The cached boto3 service resource, built now"""
+    key = ('resource', service)
+    if key not in _clients:
+        with _lock:
+            if key not in _clients:
+                _clients[key] = boto3.resource(service, config=config_for(SERVICE_PROFILES.get(service, 'default')))
+    return _clients[key]
+
+def get_table(name):
+    """The cached DynamoDB Table for a table name, built now"""
+    if name not in _tables:
+        with _lock:
+            if name not in _tables:
+                _tables[name] = get_resource('dynamodb').Table(name)
+    return _tables[name]
+
+def client(service, profile=None, region_name=None, endpoint_url=None):
+    """boto3 client for `service`, built on first use (see PROFILES for `profile`)"""
+    return _Lazy(lambda: get_client(service, profile, region_name, endpoint_url))
+
+def table(name):
+    """DynamoDB Table, built on first use"""
+    return _Lazy(lambda: get_table(name))
+
+def resource(service='dynamodb'):
+    """DynamoDB service resource (for batch_get_item and friends), built on first use"""
+    return _Lazy(lambda: get_resource(service))
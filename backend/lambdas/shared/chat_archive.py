@@ -0,0 +1,148 @@
+"""
+Daily chat archives: completed days of CHAT# turns rolled into one
+CHATDAY#YYYY-MM-DD item, shared by compactChatHistory and the chat readers.
+
+An archive item holds:
+- turns: zlib-compressed JSON list of the day's turns, oldest first, each
+  with its SK and every attribute except PK/type/userId
+- aggregates: precomputed daily figures (turn count, characters, wellness,
+  risk levels, sessions)
+- turnCount, format, compactedAt
+
+Compaction writes the archive before deleting the day's CHAT# items, so a
+reader can briefly see a turn in both places; merge_turns keeps one copy.
+Deploy scripts copy this file next to lambda_function.py in the package.
+"""
+import json
+import zlib
+from decimal import Decimal
+
+ARCHIVE_PREFIX = 'CHATDAY#'
+ARCHIVE_FORMAT = 'zlib-json-v1'
+
+# Attributes the archive item already implies
+KEY_ATTRIBUTES = ('PK', 'type', 'userId')
+
+# Archive days per page when a limited read may stop early
+LIMITED_PAGE_DAYS = 7
+
+def archive_sk(day):
+    """CHATDAY# key for a 'YYYY-MM-DD' day"""
+    return f'{ARCHIVE_PREFIX}{day}'
+
+def turn_day(sk):
+    """'YYYY-MM-DD' of a CHAT#<isoformat> key"""
+    return sk[len('CHAT#'):len('CHAT#') + 10]
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def encode_turns(turns):
+    """Compressed archive payload for a day's CHAT# items"""
+    stripped = [{k: v for k, v in turn.items() if k not in KEY_ATTRIBUTES} for turn in turns]
+    raw = json.dumps(stripped, separators=(',', ':'), default=_json_default).encode('utf-8')
+    return zlib.compress(raw, 6)
+
+def decode_archive(item, user_id):
+    """
+    The turns of an archive item as CHAT# items (oldest first). Numbers come
+    back as int/float rather than Decimal.
+    """
+    if item.get('format', ARCHIVE_FORMAT) != ARCHIVE_FORMAT:
+        raise ValueError(f"unknown chat archive format: {item.get('format')}")
+    payload = item['turns']
+    payload = getattr(payload, 'value', payload)  # boto3 wraps Binary attributes
+    turns = json.loads(zlib.decompress(bytes(payload)))
+    for turn in turns:
+        turn['PK'] = f'USER#{user_id}'
+        turn['type'] = 'CHAT'
+        turn['userId'] = user_id
+    return turns
+
+def daily_aggregates(turns):
+    """Precomputed figures for one day of turns, in DynamoDB types"""
+    wellness = [float(t['wellnessScore']) for t in turns if t.get('wellnessScore') is not None]
+    risk_levels = {}
+    for turn in turns:
+        level = turn.get('riskLevel')
+        if level:
+            risk_levels[level] = risk_levels.get(level, 0) + 1
+    sessions = {t['sessionId'] for t in turns if t.get('sessionId')}
+
+    aggregates = {
+        'turns': len(turns),
+        'userChars': sum(len(t.get('userMessage') or '') for t in turns),
+        'aiChars': sum(len(t.get('aiResponse') or '') for t in turns),
+        'sessions': len(sessions),
+        'riskLevels': risk_levels,
+        'firstAt': turns[0]['SK'][len('CHAT#'):] if turns else None,
+        'lastAt': turns[-1]['SK'][len('CHAT#'):] if turns else None
+    }
+    if wellness:
+        aggregates['avgWellness'] = Decimal(str(round(sum(wellness) / len(wellness), 3)))
+        aggregates['minWellness'] = Decimal(str(min(wellness)))
+    return aggregates
+
+def merge_turns(archived, live):
+    """Archived and live turns as one list sorted by SK, one copy per SK"""
+    merged = {turn['SK']: turn for turn in live}
+    merged.update((turn['SK'], turn) for turn in archived)
+    return [merged[sk] for sk in sorted(merged)]
+
+def iter_archives(table, user_id, first_day, last_day, newest_first=False, page_size=None):
+    """
+    Archive items for days first_day..last_day ('YYYY-MM-DD', inclusive),
+    read page by page as the caller consumes them
+    """
+    query = {
+        'KeyConditionExpression': 'PK = :pk AND SK BETWEEN :start AND :end',
+        'ExpressionAttributeValues': {
+            ':pk': f'USER#{user_id}',
+            ':start': archive_sk(first_day),
+            ':end': archive_sk(last_day)
+        },
+        'ScanIndexForward': not newest_first
+    }
+    if page_size:
+        query['Limit'] = page_size
+    while True:
+        response = table.query(**query)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def load_chat_turns(table, user_id, start_sk, end_sk, limit=None):
+    """
+    Every chat turn with start_sk <= SK <= end_sk (CHAT#<isoformat> bounds),
+    oldest first: archived days merged with the live CHAT# tail. With a
+    limit, only the oldest `limit` turns, and reading stops once they are in.
+    """
+    archived = []
+    for item in iter_archives(table, user_id, turn_day(start_sk), turn_day(end_sk),
+                              page_size=limit and min(limit, LIMITED_PAGE_DAYS)):
+        archived.extend(t for t in decode_archive(item, user_id) if start_sk <= t['SK'] <= end_sk)
+        if limit and len(archived) >= limit:
+            # Live turns past the newest archived turn kept can no longer make the cut
+            end_sk = min(end_sk, archived[limit - 1]['SK'])
+            break
+
+    query = {
+        'KeyConditionExpression': 'PK = :pk AND SK BETWEEN :start AND :end',
+        'ExpressionAttributeValues': {':pk': f'USER#{user_id}', ':start': start_sk, ':end': end_sk}
+    }
+    if limit:
+        query['Limit'] = limit
+    live = []
+    while not limit or len(live) < limit:
+        response = table.query(**query)
+        live.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return merge_turns(archived, live)[:limit]
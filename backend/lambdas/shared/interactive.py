@@ -0,0 +1,124 @@
+"""
+Helpers shared by the interactive Lambdas (chat, agentChat, logMood):
+request ids, write-behind persistence and the WebSocket management client.
+
+Writes leave the reply path through hand_off(): the finished item is queued
+as an async invocation of the calling function ({"persist": ...} event,
+InvocationType='Event'). Lambda keeps the event durably and retries it, and
+the handler stores it with store_event(). If the invoke itself fails, the
+item is written inline instead.
+
+put_once() keys idempotency on the client's requestId. The item is written
+in one transaction with a REQ#<requestId> marker that must not exist yet, so
+neither a client retry (a new invocation, with a new timestamp in the SK)
+nor a redelivered event stores the same request twice. Markers expire
+through the table's ttl attribute after REQUEST_MARKER_TTL_HOURS.
+
+Deploy scripts copy this file next to lambda_function.py in the package.
+"""
+import json
+import os
+import random
+import time
+import aws_clients
+from botocore.exceptions import BotoCoreError, ClientError
+from decimal import Decimal
+
+lambda_client = aws_clients.client('lambda')
+
+# Failures left after boto3's own retries get a few more, with jittered backoff
+WRITE_ATTEMPTS = int(os.environ.get('WRITE_ATTEMPTS', '3'))
+RETRYABLE_WRITE_ERRORS = {
+    'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded',
+    'InternalServerError', 'ServiceUnavailable', 'TransactionInProgressException'
+}
+# Transaction cancellation reasons worth another attempt
+RETRYABLE_CANCEL_REASONS = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded'}
+MARKER_TTL_SECONDS = int(os.environ.get('REQUEST_MARKER_TTL_HOURS', '72')) * 3600
+
+def get_request_id(body):
+    """The client's idempotency key for the request, or None when it sent none"""
+    request_id = body.get('requestId')
+    return str(request_id) if request_id else None
+
+def request_marker(item, request_id):
+    """REQ#<requestId> item recording which item a request stored"""
+    return {
+        'PK': item['PK'],
+        'SK': f'REQ#{request_id}',
+        'type': 'REQUEST',
+        'itemSK': item['SK'],
+        'ttl': int(time.time()) + MARKER_TTL_SECONDS
+    }
+
+def put_once(table, item, request_id=None):
+    """
+    Store an item, at most once per request_id when one is given. Returns
+    True once the item is stored (or was already stored for this request).
+    """
+    error = None
+    for attempt in range(WRITE_ATTEMPTS):
+        try:
+            if request_id:
+                table.meta.client.transact_write_items(TransactItems=[
+                    {'Put': {'TableName': table.name, 'Item': request_marker(item, request_id),
+                             'ConditionExpression': 'attribute_not_exists(SK)'}},
+                    {'Put': {'TableName': table.name, 'Item': item}}
+                ])
+            else:
+                table.put_item(Item=item)
+            return True
+        except ClientError as e:
+            error = e.response['Error']['Code']
+            reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            if reasons[:1] == ['ConditionalCheckFailed']:
+                print(f"↩️ Request {request_id} already stored, skipping {item['SK']}")
+                return True
+            if error not in RETRYABLE_WRITE_ERRORS and not RETRYABLE_CANCEL_REASONS.intersection(reasons):
+                break
+        except BotoCoreError as e:
+            # Connection resets and read timeouts
+            error = e
+        if attempt + 1 < WRITE_ATTEMPTS:
+            time.sleep(random.uniform(0.5, 1.0) * 0.05 * 2 ** attempt)
+    print(f"DynamoDB error: {item['SK']} (request {request_id}) not stored: {error}")
+    return False
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def hand_off(context, table, item, request_id=None, extra=None):
+    """
+    Queue `item` for storage by an async invocation of this function, with
+    any `extra` event keys alongside {"persist": ...}. Stores it inline when
+    the invoke fails. Returns False only when the item could not be queued
+    or stored.
+    """
+    payload = dict(extra or {}, persist={'item': item, 'requestId': request_id})
+    try:
+        lambda_client.invoke(
+            FunctionName=context.function_name if context else os.environ.get('AWS_LAMBDA_FUNCTION_NAME', ''),
+            InvocationType='Event',
+            Payload=json.dumps(payload, default=_json_default)
+        )
+        return True
+    except Exception as e:
+        print(f"⚠️ Write hand-off failed ({e}), storing inline")
+        return put_once(table, item, request_id)
+
+def store_event(event, table):
+    """
+    Store the item of a {"persist": ...} event queued by hand_off. Raises when
+    the write fails, so Lambda retries the event.
+    """
+    # The runtime parses numbers as float; DynamoDB wants Decimal
+    persist = json.loads(json.dumps(event['persist']), parse_float=Decimal)
+    if not put_once(table, persist['item'], persist.get('requestId')):
+        raise RuntimeError(f"{persist['item']['SK']} not stored")
+
+def get_management_client(request_context):
+    """API Gateway management client for the WebSocket endpoint that invoked us"""
+    endpoint = f"https://{request_context['domainName']}/{request_context['stage']}"
+    return aws_clients.get_client('apigatewaymanagementapi', endpoint_url=endpoint)
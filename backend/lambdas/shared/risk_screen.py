@@ -0,0 +1,140 @@
+"""
+Real-time crisis screening of a single message, and the escalation to the
+intervention Lambda, shared by the chat and calculateRiskScore Lambdas.
+
+Each term list is compiled once by compile_terms(), which matches terms as
+substrings of lowercased text ('overdose' also finds 'overdosed'). The
+analyzeEmotions pre-classifier uses the same matcher, so both agree on what
+counts as crisis language.
+Deploy scripts copy this file next to lambda_function.py in the package.
+"""
+import json
+import os
+import re
+import aws_clients
+
+lambda_client = aws_clients.client('lambda')
+
+# Crisis keywords (immediate high risk). Matched as substrings, so a phrase
+# must not occur inside everyday text ('to end things', not 'end things',
+# which is also in 'send things')
+CRISIS_WORDS = [
+    'suicide', 'suicidal', 'kill myself', 'killing myself', 'end my life', 'ending my life',
+    'take my life', 'to end it all', 'want to die', 'wanna die', 'better off dead',
+    'no reason to live', "don't want to live", 'dont want to live',
+    "don't want to be here", 'dont want to be here',
+    'self harm', 'hurt myself', 'cut myself', 'overdose', 'to kms',
+    # Farewells and stated intent
+    'to end things', 'ending things tonight', 'goodbye letter', 'goodbye note', 'final goodbye',
+    'this is my last message', 'my last day alive', "won't be around much longer",
+    'wont be around much longer', 'have a plan to die', 'going to jump off'
+]
+# Despair indicators
+DESPAIR_WORDS = ['hopeless', 'pointless', 'give up', 'can\'t go on', 'worthless', 'no point']
+# Isolation indicators
+ISOLATION_WORDS = ['alone', 'lonely', 'no one understands', 'nobody cares', 'isolated']
+# Positive indicators
+POSITIVE_WORDS = ['better', 'improving', 'hopeful', 'grateful', 'good day', 'feeling good']
+
+def _trie_pattern(node):
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    ends = '' in node
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 and not ends else '(?:' + '|'.join(branches) + ')'
+    return body + '?' if ends else body
+
+def compile_terms(terms):
+    """
+    One pattern over all phrases, matched as substrings of lowercased text;
+    the longest phrase wins where several start at the same place. Phrases
+    are merged on shared prefixes, so most positions fail on one character.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+    return re.compile(_trie_pattern(trie))
+
+CRISIS_PATTERN = compile_terms(CRISIS_WORDS)
+
+# Categories in scoring order: (matcher, risk score floor or None for positive, factor label, is crisis)
+CATEGORIES = (
+    (CRISIS_PATTERN, 0.9, "CRITICAL: Crisis language detected", True),
+    (compile_terms(DESPAIR_WORDS), 0.7, "High concern: Despair language", False),
+    (compile_terms(ISOLATION_WORDS), 0.5, "Social isolation indicator", False),
+    (compile_terms(POSITIVE_WORDS), None, "Positive indicator", False),
+)
+
+def risk_level_for(risk_score):
+    if risk_score >= 0.8:
+        return 'critical'
+    elif risk_score >= 0.6:
+        return 'high'
+    elif risk_score >= 0.4:
+        return 'moderate'
+    elif risk_score >= 0.2:
+        return 'low'
+    return 'minimal'
+
+def screen_message(message):
+    """
+    Score one message: {'riskScore', 'riskLevel', 'riskFactors', 'crisis',
+    'flagged'}. 'crisis' is True when crisis language was found, 'flagged'
+    when any crisis, despair or isolation term was. Positive words lower the
+    score of other matches but never take crisis language below critical.
+    """
+    risk_score = 0.2  # Base risk
+    risk_factors = []
+    crisis = False
+    flagged = False
+    message_lower = message.lower()
+
+    for pattern, floor, label, is_crisis in CATEGORIES:
+        # The first term found in the message
+        match = pattern.search(message_lower)
+        if not match:
+            continue
+        if floor is None:
+            if not crisis:
+                risk_score = max(0.1, risk_score - 0.2)
+        else:
+            risk_score = max(risk_score, floor)
+            flagged = True
+        crisis = crisis or is_crisis
+        risk_factors.append(f"{label} - '{match.group()}'")
+
+    if not risk_factors:
+        risk_factors.append("No significant risk indicators in current message")
+
+    return {
+        'riskScore': risk_score,
+        'riskLevel': risk_level_for(risk_score),
+        'riskFactors': risk_factors,
+        'crisis': crisis,
+        'flagged': flagged
+    }
+
+def trigger_intervention(user_id, risk_level, risk_score, risk_factors, source=None):
+    """Invoke the executeIntervention Lambda asynchronously; returns True once the event is queued"""
+    payload = {
+        'userId': user_id,
+        'riskLevel': risk_level,
+        'riskScore': risk_score,
+        'riskFactors': risk_factors
+    }
+    if source:
+        payload['source'] = source
+    try:
+        lambda_client.invoke(
+            FunctionName=os.environ.get('INTERVENTION_FUNCTION', 'mindmate-executeIntervention'),
+            InvocationType='Event',
+            Payload=json.dumps(payload)
+        )
+        print(f"🚨 Intervention triggered for {user_id} ({risk_level})")
+        return True
+    except Exception as e:
+        print(f"❌ Error triggering intervention: {e}")
+        return False
@@ -0,0 +1,98 @@
+#!/bin/bash
+
+# Create the WebSocket API that streams chat replies as they are generated
+# Messages are routed on their "action" field: {"action": "chat" | "agentChat", "userId": ..., "message": ...}
+set -e
+
+echo "🔧 Setting up streaming chat WebSocket API..."
+
+REGION="us-east-1"
+API_NAME="MindMateChatStream"
+STAGE="prod"
+ROLE_NAME="MindMateLambdaRole"
+
+# Reuse the API if it already exists
+API_ID=$(aws apigatewayv2 get-apis --region "$REGION" \
+    --query "Items[?Name=='$API_NAME'].ApiId" --output text)
+
+if [ -z "$API_ID" ] || [ "$API_ID" == "None" ]; then
+    API_ID=$(aws apigatewayv2 create-api \
+        --name "$API_NAME" \
+        --protocol-type WEBSOCKET \
+        --route-selection-expression '$request.body.action' \
+        --region "$REGION" \
+        --query 'ApiId' \
+        --output text)
+    echo "✅ Created WebSocket API: $API_ID"
+else
+    echo "📍 Using existing WebSocket API: $API_ID"
+fi
+
+# Function to route a WebSocket route key to a Lambda
+create_ws_route() {
+    local ROUTE_KEY=$1
+    local LAMBDA_NAME=$2
+
+    echo ""
+    echo "Creating $ROUTE_KEY route..."
+
+    LAMBDA_ARN=$(aws lambda get-function --function-name "$LAMBDA_NAME" --region "$REGION" --query 'Configuration.FunctionArn' --output text)
+
+    INTEGRATION_ID=$(aws apigatewayv2 create-integration \
+        --api-id "$API_ID" \
+        --integration-type AWS_PROXY \
+        --integration-uri "arn:aws:apigateway:${REGION}:lambda:path/2015-03-31/functions/${LAMBDA_ARN}/invocations" \
+        --region "$REGION" \
+        --query 'IntegrationId' \
+        --output text)
+
+    aws apigatewayv2 create-route \
+        --api-id "$API_ID" \
+        --route-key "$ROUTE_KEY" \
+        --target "integrations/$INTEGRATION_ID" \
+        --region "$REGION" > /dev/null 2>&1 || echo "  (Route already exists)"
+
+    aws lambda add-permission \
+        --function-name "$LAMBDA_NAME" \
+        --statement-id "apigateway-ws-$(echo $ROUTE_KEY | tr -d '$')" \
+        --action lambda:InvokeFunction \
+        --principal apigateway.amazonaws.com \
+        --source-arn "arn:aws:execute-api:${REGION}:*:${API_ID}/*/*" \
+        --region "$REGION" 2>/dev/null || echo "  (Permission already exists)"
+
+    echo "  ✅ $ROUTE_KEY -> $LAMBDA_NAME"
+}
+
+create_ws_route '$connect' "mindmate-chat"
+create_ws_route '$disconnect' "mindmate-chat"
+create_ws_route "chat" "mindmate-chat"
+create_ws_route "agentChat" "mindmate-agentChat"
+
+# Stage with auto-deploy
+aws apigatewayv2 create-stage \
+    --api-id "$API_ID" \
+    --stage-name "$STAGE" \
+    --auto-deploy \
+    --region "$REGION" > /dev/null 2>&1 || echo "📍 Stage $STAGE already exists"
+
+# Lambdas post frames back to the connection through the management API
+echo ""
+echo "🔐 Allowing $ROLE_NAME to post to WebSocket connections..."
+ACCOUNT_ID=$(aws sts get-caller-identity --query Account --output text)
+aws iam put-role-policy \
+    --role-name "$ROLE_NAME" \
+    --policy-name MindMateWebSocketManageConnections \
+    --policy-document "{
+        \"Version\": \"2012-10-17\",
+        \"Statement\": [{
+            \"Effect\": \"Allow\",
+            \"Action\": \"execute-api:ManageConnections\",
+            \"Resource\": \"arn:aws:execute-api:${REGION}:${ACCOUNT_ID}:${API_ID}/${STAGE}/POST/@connections/*\"
+        }]
+    }"
+
+echo ""
+echo "✅ Streaming chat ready!"
+echo "🌐 WebSocket URL: wss://${API_ID}.execute-api.${REGION}.amazonaws.com/${STAGE}"
+echo ""
+echo "Set CHAT_STREAM_URL in frontend/mind-mate-hackathon.html to the URL above."
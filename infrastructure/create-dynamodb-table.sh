@@ -31,6 +31,12 @@ aws dynamodb create-table \
 echo "⏳ Waiting for table to be active..."
 aws dynamodb wait table-exists --table-name "$TABLE_NAME"
 
+# REQ#<requestId> idempotency markers (and any other item with a ttl attribute) expire on their own
+aws dynamodb update-time-to-live \
+    --table-name "$TABLE_NAME" \
+    --time-to-live-specification "Enabled=true, AttributeName=ttl" \
+    --no-cli-pager > /dev/null
+
 echo "✅ Table $TABLE_NAME created successfully!"
 echo ""
 echo "Table structure:"
@@ -43,5 +49,6 @@ echo "- User profiles: PK=USER#userId, SK=PROFILE"
 echo "- Chat messages: PK=USER#userId, SK=CHAT#timestamp"
 echo "- Mood logs: PK=USER#userId, SK=MOOD#timestamp"
 echo "- Daily recaps: PK=USER#userId, SK=RECAP#date"
+echo "- Request markers: PK=USER#userId, SK=REQ#requestId (expire via ttl)"
 echo ""
 echo "Note: GSI can be added later if needed for additional query patterns"
\ No newline at end of file
@@ -3,9 +3,40 @@
 # Deploy Emotion Analysis Lambda
 echo "🧠 Deploying Emotion Analysis Lambda..."
 
+# Result cache: items keyed on a hash of the normalized message, expired by the ttl attribute
+CACHE_TABLE="MindMate-EmotionCache"
+if ! aws dynamodb describe-table --table-name "$CACHE_TABLE" --region us-east-1 > /dev/null 2>&1; then
+    echo "🗄️  Creating cache table: $CACHE_TABLE"
+    aws dynamodb create-table \
+        --table-name "$CACHE_TABLE" \
+        --attribute-definitions AttributeName=cacheKey,AttributeType=S \
+        --key-schema AttributeName=cacheKey,KeyType=HASH \
+        --billing-mode PAY_PER_REQUEST \
+        --region us-east-1 > /dev/null
+    aws dynamodb wait table-exists --table-name "$CACHE_TABLE" --region us-east-1
+    aws dynamodb update-time-to-live \
+        --table-name "$CACHE_TABLE" \
+        --time-to-live-specification "Enabled=true, AttributeName=ttl" \
+        --region us-east-1 > /dev/null
+fi
+
+aws iam put-role-policy \
+    --role-name MindMateLambdaRole \
+    --policy-name MindMateEmotionCacheAccess \
+    --policy-document '{
+        "Version": "2012-10-17",
+        "Statement": [{
+            "Effect": "Allow",
+            "Action": ["dynamodb:GetItem", "dynamodb:PutItem"],
+            "Resource": "arn:aws:dynamodb:us-east-1:403745271636:table/MindMate-EmotionCache"
+        }]
+    }'
+
 # Create deployment package
 cd backend/lambdas/analyzeEmotions
 zip -r ../../../emotion-analysis-lambda.zip .
+# Modules shared between Lambdas (backend/lambdas/shared) go next to lambda_function.py
+zip -j ../../../emotion-analysis-lambda.zip ../shared/*.py
 cd ../../../
 
 # Deploy Lambda function
@@ -28,6 +59,7 @@ aws lambda update-function-configuration \
     --function-name mindmate-analyzeEmotions \
     --timeout 30 \
     --memory-size 256 \
+    --environment "Variables={EMOTION_CACHE_TABLE=$CACHE_TABLE}" \
     --region us-east-1
 
 # Add API Gateway permissions
@@ -50,6 +50,8 @@ echo "📦 Packaging Lambda function..."
 # Create deployment package
 cd $LAMBDA_DIR
 zip -q -r /tmp/executeIntervention.zip lambda_function.py
+# Modules shared between Lambdas (backend/lambdas/shared) go next to lambda_function.py
+zip -q -j /tmp/executeIntervention.zip ../shared/*.py
 cd - > /dev/null
 
 echo "✅ Package created"
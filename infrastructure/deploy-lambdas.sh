@@ -33,6 +33,8 @@ deploy_lambda() {
     
     # Create deployment package
     zip -q -r function.zip .
+    # Modules shared between Lambdas (backend/lambdas/shared) go next to lambda_function.py
+    zip -q -j function.zip ../shared/*.py
     
     # Check if function exists
     if aws lambda get-function --function-name "$FUNCTION_NAME" 2>/dev/null; then
@@ -70,6 +72,30 @@ deploy_lambda() {
     cd - > /dev/null
 }
 
+# logMood, chat and agentChat store their writes in an async invocation of
+# themselves ({"persist": ...} events), so the role may invoke those functions.
+# Without it every write falls back to an inline put on the reply path.
+echo "🔐 Allowing $ROLE_NAME to invoke the write-behind functions..."
+REGION="us-east-1"
+ACCOUNT_ID=$(aws sts get-caller-identity --query Account --output text)
+SELF_INVOKE_RESOURCES=""
+for WRITE_BEHIND_FUNCTION in logMood mindmate-chat mindmate-agentChat; do
+    FUNCTION_ARN="arn:aws:lambda:${REGION}:${ACCOUNT_ID}:function:${WRITE_BEHIND_FUNCTION}"
+    SELF_INVOKE_RESOURCES="${SELF_INVOKE_RESOURCES:+$SELF_INVOKE_RESOURCES, }\"${FUNCTION_ARN}\", \"${FUNCTION_ARN}:*\""
+done
+aws iam put-role-policy \
+    --role-name "$ROLE_NAME" \
+    --policy-name MindMateWriteBehindSelfInvoke \
+    --policy-document "{
+        \"Version\": \"2012-10-17\",
+        \"Statement\": [{
+            \"Effect\": \"Allow\",
+            \"Action\": \"lambda:InvokeFunction\",
+            \"Resource\": [${SELF_INVOKE_RESOURCES}]
+        }]
+    }"
+echo ""
+
 # Deploy all functions
 deploy_lambda "logMood"
 deploy_lambda "analyzeSelfie"
@@ -36,6 +36,8 @@ deploy_lambda() {
     
     # Create zip
     zip -r "../${FUNCTION_NAME}.zip" . -x "*.pyc" -x "__pycache__/*" -x "*.md" > /dev/null
+    # Modules shared between Lambdas (backend/lambdas/shared) go next to lambda_function.py
+    zip -j "../${FUNCTION_NAME}.zip" ../shared/*.py > /dev/null
     
     cd ../../..
     
@@ -74,6 +76,40 @@ deploy_lambda() {
 # Deploy new ML integration Lambdas
 deploy_lambda "calculateRiskScore"
 deploy_lambda "executeIntervention"
+deploy_lambda "compactChatHistory"
+
+# EventBridge rule for nightly chat compaction (rule, target and invoke
+# permission, like MonthlyRetrainingRule in ml-prediction-stack.yaml)
+echo "⏰ Scheduling compactChatHistory..."
+COMPACTION_RULE_ARN=$(aws events put-rule \
+    --name MindMate-NightlyChatCompaction \
+    --description "Roll completed days of chat turns into CHATDAY# archives at 3 AM UTC" \
+    --schedule-expression "cron(0 3 * * ? *)" \
+    --state ENABLED \
+    --region "$REGION" \
+    --query 'RuleArn' \
+    --output text)
+
+COMPACTION_FUNCTION_ARN=$(aws lambda get-function \
+    --function-name compactChatHistory \
+    --region "$REGION" \
+    --query 'Configuration.FunctionArn' \
+    --output text)
+
+aws lambda add-permission \
+    --function-name compactChatHistory \
+    --statement-id NightlyChatCompactionLambdaPermission \
+    --action lambda:InvokeFunction \
+    --principal events.amazonaws.com \
+    --source-arn "$COMPACTION_RULE_ARN" \
+    --region "$REGION" > /dev/null 2>&1 || echo "  (Permission already exists)"
+
+aws events put-targets \
+    --rule MindMate-NightlyChatCompaction \
+    --targets "Id=CompactionTarget,Arn=$COMPACTION_FUNCTION_ARN" \
+    --region "$REGION" > /dev/null
+
+echo "  ✅ MindMate-NightlyChatCompaction -> compactChatHistory"
 
 echo ""
 echo "✅ All ML Integration Lambdas deployed successfully!"
@@ -7,19 +7,84 @@ Trains ensemble of Random Forest and Gradient Boosting models
 import argparse
 import os
 import json
+import math
+import pickle
+import resource
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
 import pandas as pd
 import numpy as np
 import joblib
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from scipy.stats import loguniform, randint
+from sklearn.ensemble import (
+    RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
+)
+from sklearn.inspection import permutation_importance
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import (
+    GroupKFold, StratifiedKFold, RandomizedSearchCV, HalvingRandomSearchCV
+)
 from sklearn.metrics import (
     roc_auc_score, precision_score, recall_score, f1_score,
     confusion_matrix, classification_report, roc_curve
 )
+from sklearn.utils.class_weight import compute_class_weight
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Columnar datasets written by the prepareTrainingData Lambda
+SCHEMA_FILE = 'schema.json'
+SUPPORTED_SCHEMA_VERSIONS = (1,)
+NON_FEATURE_COLUMNS = ['label', 'sample_id', 'userId', 'group_id', 'sample_weight']
+
+# Batch sizes for the ensemble inference latency report in metrics.json
+LATENCY_BATCH_SIZES = (1, 100, 10000)
+
+# Out-of-core training: working memory per float32 row while fitting, as a multiple of its size
+OUT_OF_CORE_OVERHEAD = 4
+
+# Warm-start drift check: decile bins per feature, stored in serving.json for the next run
+DRIFT_BINS = 10
+DRIFT_SAMPLE_ROWS = 100000
+
+# Warm-start regression check: the fixed holdout, saved next to the model artifacts
+HOLDOUT_FILE = 'holdout.npz'
+HOLDOUT_MAX_ROWS = 50000
+
+# Hyperparameter search spaces (--search random|halving)
+SEARCH_SPACES = {
+    'random_forest': {
+        'n_estimators': randint(100, 501),
+        'max_depth': [5, 8, 10, 15, None],
+        'min_samples_split': randint(2, 21),
+        'min_samples_leaf': randint(1, 9),
+        'max_features': ['sqrt', 'log2', 0.5],
+    },
+    'gradient_boosting': {
+        'n_estimators': randint(100, 501),
+        'learning_rate': loguniform(0.01, 0.3),
+        'max_depth': randint(2, 9),
+        'min_samples_split': randint(2, 21),
+        'subsample': [0.6, 0.8, 1.0],
+    },
+    'hist_gradient_boosting': {
+        'max_iter': randint(100, 501),
+        'learning_rate': loguniform(0.01, 0.3),
+        'max_leaf_nodes': randint(15, 64),
+        'min_samples_leaf': randint(10, 51),
+        'l2_regularization': loguniform(1e-4, 1.0),
+    },
+}
+
+
+def str2bool(value):
+    """Parse boolean hyperparameters (SageMaker passes them as strings)"""
+    return str(value).lower() in ('1', 'true', 'yes')
+
 
 def load_data(train_path, val_path):
     """Load training and validation data from CSV"""
@@ -35,17 +100,71 @@ def load_data(train_path, val_path):
     return train_df, val_df
 
 
-def prepare_features(df):
+def is_columnar(path):
+    """Check whether a data channel holds a columnar dataset instead of CSV"""
+    return path is not None and os.path.exists(os.path.join(path, SCHEMA_FILE))
+
+
+def load_columnar(path):
+    """Load a columnar dataset; features are memory-mapped rather than parsed"""
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    
+    if schema.get('schemaVersion') not in SUPPORTED_SCHEMA_VERSIONS:
+        raise ValueError(f"Unsupported dataset schema version: {schema.get('schemaVersion')}")
+    
+    files = schema.get('files', {})
+    X = np.load(os.path.join(path, files.get('features', 'features.npy')), mmap_mode='r')
+    y = np.load(os.path.join(path, files.get('labels', 'labels.npy')), mmap_mode='r')
+    feature_names = schema['featureNames']
+    
+    if X.shape != (schema['rows'], len(feature_names)) or len(y) != schema['rows']:
+        raise ValueError(f"Dataset at {path} does not match its schema")
+    
+    logger.info(f"Loaded columnar dataset from {path}: {X.shape[0]} samples, {X.shape[1]} features ({X.dtype})")
+    labels, counts = np.unique(y, return_counts=True)
+    logger.info(f"Class distribution: {dict(zip(labels.tolist(), counts.tolist()))}")
+    
+    return X, y, feature_names
+
+
+def load_optional_array(path, name):
+    """Load an optional per-row array (e.g. 'weights', 'groups') from a columnar dataset"""
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        files = json.load(f).get('files', {})
+    
+    if name not in files:
+        return None
+    
+    logger.info(f"Using per-row {name} from dataset")
+    return np.load(os.path.join(path, files[name]), mmap_mode='r')
+
+
+def impute_missing(X):
+    """Fill NaNs with column medians, copying the array only when NaNs are present"""
+    if isinstance(X, pd.DataFrame):
+        return X.fillna(X.median()) if X.isna().any().any() else X
+    
+    missing = np.isnan(X)
+    if not missing.any():
+        return X
+    
+    medians = np.nan_to_num(np.nanmedian(X, axis=0))
+    logger.info(f"Imputing {int(missing.sum())} missing values with column medians")
+    return np.where(missing, medians, X).astype(np.float32, copy=False)
+
+
+def prepare_features(df, impute=True):
     """Prepare features and labels"""
     # Remove non-feature columns
-    exclude_cols = ['label', 'sample_id', 'userId']
-    feature_cols = [col for col in df.columns if col not in exclude_cols]
+    feature_cols = [col for col in df.columns if col not in NON_FEATURE_COLUMNS]
     
     X = df[feature_cols]
     y = df['label']
     
-    # Handle missing values
-    X = X.fillna(X.median())
+    # Handle missing values (the histogram booster handles NaN natively)
+    if impute:
+        X = impute_missing(X)
     
     logger.info(f"Features: {len(feature_cols)}")
     logger.info(f"Feature names: {feature_cols[:10]}...")  # Show first 10
@@ -54,7 +173,259 @@ def prepare_features(df):
     return X, y, feature_cols
 
 
-def train_random_forest(X_train, y_train, args):
+def rows_for_budget(n_features, budget_mb):
+    """Number of float32 rows that fit in the memory budget, leaving room for fit-time working memory"""
+    return max(1000, int(budget_mb * 1024 * 1024 // (n_features * 4 * OUT_OF_CORE_OVERHEAD)))
+
+
+def load_csv_chunked(path, filename, cache_dir, chunksize=50000):
+    """Convert a CSV into a memory-mapped float32 feature matrix, one chunk at a time.
+
+    Returns the memmap, int8 labels, feature names and any per-row
+    sample_weight/group_id columns; the full table is never held in memory.
+    """
+    csv_path = os.path.join(path, filename)
+    columns = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    feature_cols = [col for col in columns if col not in NON_FEATURE_COLUMNS]
+    extra_cols = {'sample_weight': np.float32, 'group_id': np.int32}
+    extra_cols = {col: dtype for col, dtype in extra_cols.items() if col in columns}
+    
+    # First pass counts rows so the memmap can be preallocated
+    n_rows = sum(len(chunk) for chunk in pd.read_csv(csv_path, usecols=['label'], chunksize=chunksize))
+    
+    features_path = os.path.join(cache_dir, f'{os.path.splitext(filename)[0]}_features.npy')
+    X = np.lib.format.open_memmap(features_path, mode='w+', dtype=np.float32, shape=(n_rows, len(feature_cols)))
+    y = np.empty(n_rows, dtype=np.int8)
+    extras = {col: np.empty(n_rows, dtype=dtype) for col, dtype in extra_cols.items()}
+    
+    offset = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        end = offset + len(chunk)
+        X[offset:end] = chunk[feature_cols].to_numpy(dtype=np.float32)
+        y[offset:end] = chunk['label'].to_numpy()
+        for col, values in extras.items():
+            values[offset:end] = chunk[col].to_numpy()
+        offset = end
+    X.flush()
+    del X
+    
+    logger.info(f"Converted {csv_path} to memory-mapped float32 ({n_rows} rows, {len(feature_cols)} features)")
+    return np.load(features_path, mmap_mode='r'), y, feature_cols, extras
+
+
+def sample_rows(n_rows, size, rng):
+    """Random row indices without replacement, sorted so memmap reads stay sequential"""
+    if size >= n_rows:
+        return np.arange(n_rows)
+    return np.sort(rng.choice(n_rows, size=size, replace=False))
+
+
+def column_medians(X, max_rows, rng):
+    """Column medians estimated from at most max_rows sampled rows"""
+    return np.nan_to_num(np.nanmedian(np.asarray(take_rows(X, sample_rows(len(X), max_rows, rng)), dtype=np.float64), axis=0))
+
+
+def fill_missing(X, medians):
+    """Impute NaNs in an in-memory batch in place"""
+    missing = np.isnan(X)
+    if missing.any():
+        X[missing] = np.take(medians, np.nonzero(missing)[1])
+    return X
+
+
+def predict_proba_batched(model, X, batch_rows, medians=None):
+    """Positive-class probabilities computed batch by batch from a (memory-mapped) matrix"""
+    probs = np.empty(len(X), dtype=np.float64)
+    for start in range(0, len(X), batch_rows):
+        batch = np.array(X[start:start + batch_rows], dtype=np.float32)
+        if medians is not None:
+            fill_missing(batch, medians)
+        probs[start:start + len(batch)] = model.predict_proba(batch)[:, 1]
+    return probs
+
+
+def load_dataset(path, filename):
+    """Load a whole channel (columnar or CSV) as in-memory float32 features.
+
+    Returns (X, y, feature_names, sample_weight, groups); used for the small
+    warm-start channels, which hold one month of samples or a fixed holdout.
+    """
+    if is_columnar(path):
+        X, y, feature_names = load_columnar(path)
+        weights = load_optional_array(path, 'weights')
+        groups = load_optional_array(path, 'groups')
+        return (np.array(X), np.asarray(y), feature_names,
+                None if weights is None else np.asarray(weights), None if groups is None else np.asarray(groups))
+    
+    df = pd.read_csv(os.path.join(path, filename))
+    X, y, feature_names = prepare_features(df, impute=False)
+    weights = df['sample_weight'].to_numpy() if 'sample_weight' in df else None
+    groups = df['group_id'].to_numpy() if 'group_id' in df else None
+    return X.to_numpy(dtype=np.float32), y.to_numpy(), feature_names, weights, groups
+
+
+def drift_reference(X, rng):
+    """Per-feature decile edges and bin fractions (plus a NaN bin) of a training sample"""
+    sample = np.asarray(take_rows(X, sample_rows(len(X), DRIFT_SAMPLE_ROWS, rng)), dtype=np.float64)
+    edges = np.nanquantile(sample, np.linspace(0, 1, DRIFT_BINS + 1)[1:-1], axis=0).T
+    edges = np.nan_to_num(edges)
+    return {
+        'bin_edges': edges.tolist(),
+        'fractions': bin_fractions(sample, edges).tolist()
+    }
+
+
+def bin_fractions(X, edges):
+    """Fraction of rows per bin for every feature; the last bin counts NaNs"""
+    fractions = np.zeros((X.shape[1], edges.shape[1] + 2))
+    for j in range(X.shape[1]):
+        column = X[:, j]
+        missing = np.isnan(column)
+        counts = np.bincount(np.searchsorted(edges[j], column[~missing], side='right'), minlength=edges.shape[1] + 1)
+        fractions[j, :-1] = counts
+        fractions[j, -1] = missing.sum()
+    return fractions / max(len(X), 1)
+
+
+def feature_drift(X, reference, feature_names, eps=1e-4):
+    """Population stability index of each feature against the previous training distribution"""
+    edges = np.asarray(reference['bin_edges'])
+    expected = np.clip(np.asarray(reference['fractions']), eps, None)
+    actual = np.clip(bin_fractions(np.asarray(X, dtype=np.float64), edges), eps, None)
+    psi = ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+    
+    top = np.argsort(psi)[::-1][:5]
+    return {
+        'max_psi': float(psi.max()),
+        'top_features': {feature_names[j]: round(float(psi[j]), 4) for j in top}
+    }
+
+
+def impute_with(X, medians):
+    """Copy of X with NaNs replaced by the given (training) medians"""
+    return fill_missing(np.array(X, dtype=np.float32), medians)
+
+
+def ensemble_auc(rf_model, gb_model, X, y, medians, gb_raw):
+    """ROC AUC of the averaged ensemble, with inputs prepared the way each model was trained"""
+    X_imputed = impute_with(X, medians)
+    gb_prob = gb_model.predict_proba(X if gb_raw else X_imputed)[:, 1]
+    return float(roc_auc_score(y, (rf_model.predict_proba(X_imputed)[:, 1] + gb_prob) / 2))
+
+
+def load_fixed_holdout(args):
+    """The fixed holdout for the warm-start regression check as (X, y, source), or None.
+
+    An explicit holdout channel wins; otherwise the holdout saved with the
+    previous model. The validation channel is never used: prepareTrainingData
+    regenerates it every month, so AUCs on it are not comparable.
+    """
+    if args.holdout:
+        X, y, _, _, _ = load_dataset(args.holdout, 'holdout.csv')
+        return X, y, 'channel'
+    path = os.path.join(args.warm_start_from or '', HOLDOUT_FILE)
+    if args.warm_start_from and os.path.exists(path):
+        with np.load(path) as saved:
+            return saved['X'], saved['y'], 'previous_model'
+    return None
+
+
+def warm_start_models(args, holdout):
+    """Extend the previous ensemble with trees/stages fitted on the new month's samples.
+
+    Returns (report, result). result is (rf_model, gb_model, dataset,
+    previous serving manifest) when the extended ensemble is accepted, or None when a full retrain is needed;
+    report['reason'] says why (missing inputs including a fixed holdout,
+    schema or booster change, feature drift above --max_feature_drift, or a
+    holdout AUC regression above --max_auc_regression).
+    """
+    report = {'mode': 'full', 'previous_model': args.warm_start_from}
+    
+    def full_retrain(reason):
+        report['reason'] = reason
+        logger.warning(f"Warm start rejected ({reason}); running a full retrain")
+        return report, None
+    
+    model_files = [os.path.join(args.warm_start_from, name) for name in ('rf_model.pkl', 'gb_model.pkl', 'serving.json')]
+    if not all(os.path.exists(path) for path in model_files):
+        return full_retrain('no_previous_model')
+    if not args.new_data:
+        return full_retrain('no_new_data')
+    if holdout is None:
+        logger.error(f"No fixed holdout: pass a holdout channel or a previous model with {HOLDOUT_FILE}")
+        return full_retrain('no_fixed_holdout')
+    
+    rf_model, gb_model = joblib.load(model_files[0]), joblib.load(model_files[1])
+    with open(model_files[2]) as f:
+        serving = json.load(f)
+    
+    X_new, y_new, feature_names, w_new, g_new = load_dataset(args.new_data, 'train.csv')
+    report['new_samples'] = len(X_new)
+    if list(feature_names) != serving['feature_names']:
+        return full_retrain('feature_schema_changed')
+    previous_booster = 'hist' if isinstance(gb_model, HistGradientBoostingClassifier) else 'gb'
+    if previous_booster != args.booster:
+        return full_retrain('booster_changed')
+    if len(np.unique(y_new)) < 2:
+        return full_retrain('single_class_new_data')
+    
+    if serving.get('drift_reference'):
+        report['feature_drift'] = feature_drift(X_new, serving['drift_reference'], feature_names)
+        logger.info(f"Feature drift (PSI): {report['feature_drift']}")
+        if report['feature_drift']['max_psi'] > args.max_feature_drift:
+            return full_retrain('feature_drift')
+    else:
+        logger.warning("Previous model has no drift reference; skipping drift check")
+    
+    # Score the previous ensemble on the fixed holdout before extending it in place
+    medians = np.asarray(serving['imputation_medians'], dtype=np.float32)
+    gb_raw = previous_booster == 'hist'
+    X_hold, y_hold, holdout_source = holdout
+    if X_hold.shape[1] != len(feature_names):
+        return full_retrain('holdout_schema_changed')
+    previous_auc = ensemble_auc(rf_model, gb_model, X_hold, y_hold, medians, gb_raw)
+    
+    X_new_imputed = impute_with(X_new, medians)
+    previous_trees = len(rf_model.estimators_)
+    start = time.perf_counter()
+    # 'balanced' would be recomputed on the new month alone; fix the weights like the out-of-core forest
+    class_weight = args.class_weight if w_new is None else None
+    if class_weight == 'balanced':
+        classes = np.unique(y_new)
+        class_weight = dict(zip(classes.tolist(), compute_class_weight('balanced', classes=classes, y=y_new)))
+    rf_model.set_params(warm_start=True, class_weight=class_weight, verbose=0,
+                        n_estimators=previous_trees + args.warm_start_trees)
+    rf_model.fit(X_new_imputed, y_new, sample_weight=w_new)
+    rf_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    if gb_raw:
+        previous_stages = gb_model.n_iter_
+        gb_model.set_params(warm_start=True, max_iter=previous_stages + args.warm_start_stages)
+    else:
+        previous_stages = gb_model.n_estimators_
+        gb_model.set_params(warm_start=True, n_estimators=previous_stages + args.warm_start_stages)
+    gb_model.fit(X_new if gb_raw else X_new_imputed, y_new, sample_weight=w_new)
+    gb_seconds = time.perf_counter() - start
+    
+    warm_auc = ensemble_auc(rf_model, gb_model, X_hold, y_hold, medians, gb_raw)
+    report.update({
+        'trees_added': len(rf_model.estimators_) - previous_trees,
+        'stages_added': (gb_model.n_iter_ if gb_raw else gb_model.n_estimators_) - previous_stages,
+        'fit_seconds': {'random_forest': round(rf_seconds, 3), 'gradient_boosting': round(gb_seconds, 3)},
+        'holdout': {'samples': len(X_hold), 'source': holdout_source,
+                    'previous_auc': previous_auc, 'warm_start_auc': warm_auc}
+    })
+    logger.info(f"Warm start holdout AUC: previous {previous_auc:.4f} -> extended {warm_auc:.4f}")
+    if warm_auc < previous_auc - args.max_auc_regression:
+        return full_retrain('holdout_regression')
+    
+    report['mode'] = 'warm'
+    report['reason'] = None
+    return report, (rf_model, gb_model, (X_new, y_new, feature_names, w_new, g_new), serving)
+
+
+def train_random_forest(X_train, y_train, args, sample_weight=None):
     """Train Random Forest classifier"""
     logger.info("Training Random Forest model...")
     
@@ -62,43 +433,271 @@ def train_random_forest(X_train, y_train, args):
         n_estimators=args.n_estimators,
         max_depth=args.max_depth,
         min_samples_split=args.min_samples_split,
-        class_weight=args.class_weight,
+        # Sample weights from data prep already balance the classes
+        class_weight=args.class_weight if sample_weight is None else None,
         random_state=42,
         n_jobs=-1,
         verbose=1
     )
     
-    rf_model.fit(X_train, y_train)
+    rf_model.fit(X_train, y_train, sample_weight=sample_weight)
     
     logger.info("Random Forest training complete")
     return rf_model
 
 
-def train_gradient_boosting(X_train, y_train, args):
-    """Train Gradient Boosting classifier"""
-    logger.info("Training Gradient Boosting model...")
+def train_random_forest_out_of_core(X_train, y_train, args, sample_weight, medians, budget_rows, rng):
+    """Grow the forest in batches of trees, each batch fit on a fresh subsample read from disk.
+
+    Every tree still bootstraps its batch's subsample, so only budget_rows
+    rows are materialized at a time regardless of the dataset size.
+    """
+    n_batches = max(1, math.ceil(args.n_estimators / args.trees_per_batch))
+    logger.info(f"Training Random Forest out-of-core: {n_batches} batches of up to "
+                f"{args.trees_per_batch} trees on {min(budget_rows, len(X_train))}-row subsamples...")
     
-    gb_model = GradientBoostingClassifier(
-        n_estimators=args.n_estimators,
+    # 'balanced' would be recomputed per subsample; fix the weights from the full label array instead
+    class_weight = args.class_weight if sample_weight is None else None
+    if class_weight == 'balanced':
+        classes = np.unique(y_train)
+        class_weight = dict(zip(classes.tolist(), compute_class_weight('balanced', classes=classes, y=y_train)))
+    
+    rf_model = RandomForestClassifier(
+        n_estimators=args.trees_per_batch,
         max_depth=args.max_depth,
-        learning_rate=0.1,
+        min_samples_split=args.min_samples_split,
+        class_weight=class_weight,
+        warm_start=True,
         random_state=42,
-        verbose=1
+        n_jobs=-1
+    )
+    
+    for batch in range(n_batches):
+        rf_model.n_estimators = min(args.n_estimators, (batch + 1) * args.trees_per_batch)
+        idx = sample_rows(len(X_train), budget_rows, rng)
+        X_batch = fill_missing(X_train[idx], medians)
+        weights = None if sample_weight is None else np.asarray(sample_weight[idx])
+        rf_model.fit(X_batch, np.asarray(y_train[idx]), sample_weight=weights)
+        del X_batch
+    
+    logger.info("Random Forest training complete")
+    return rf_model
+
+
+def build_booster(args, booster, **params):
+    """Create the boosting model: classic ('gb') or histogram-based ('hist').
+
+    The histogram booster bins features, trains multi-threaded and routes
+    NaNs natively, so it is fed unimputed features.
+    """
+    if booster == 'hist':
+        return HistGradientBoostingClassifier(
+            early_stopping=bool(args.early_stopping_rounds),
+            n_iter_no_change=args.early_stopping_rounds or 10,
+            random_state=42,
+            **params
+        )
+    return GradientBoostingClassifier(
+        n_iter_no_change=args.early_stopping_rounds or None,
+        random_state=42,
+        **params
     )
+
+
+def train_gradient_boosting(X_train, y_train, args, sample_weight=None, booster=None):
+    """Train Gradient Boosting classifier"""
+    booster = booster or args.booster
+    logger.info(f"Training Gradient Boosting model ({booster})...")
+    
+    if booster == 'hist':
+        params = dict(max_iter=args.n_estimators, max_depth=args.max_depth, learning_rate=args.learning_rate)
+    else:
+        params = dict(n_estimators=args.n_estimators, max_depth=args.max_depth, learning_rate=args.learning_rate)
+    gb_model = build_booster(args, booster, verbose=1, **params)
     
-    gb_model.fit(X_train, y_train)
+    start = time.time()
+    gb_model.fit(X_train, y_train, sample_weight=sample_weight)
     
-    logger.info("Gradient Boosting training complete")
+    logger.info(f"Gradient Boosting training complete ({time.time() - start:.1f}s)")
     return gb_model
 
 
-def evaluate_model(model, X, y, model_name):
-    """Evaluate model performance"""
+def search_hyperparameters(model_name, X_train, y_train, groups, sample_weight, args):
+    """Run randomized or successive-halving search with user-grouped CV folds.
+
+    Candidates and folds fan out over all cores through joblib's process
+    pool; the best configuration is refit on the full training set.
+    Returns the refit estimator and a report with the best config and timings.
+    """
+    logger.info(f"Searching hyperparameters for {model_name} ({args.search}, {args.cv_folds} folds)...")
+    
+    if model_name == 'random_forest':
+        # Parallelism comes from the search; keep each forest single-threaded
+        estimator = RandomForestClassifier(
+            class_weight=args.class_weight if sample_weight is None else None,
+            random_state=42,
+            n_jobs=1
+        )
+    else:
+        estimator = build_booster(args, args.booster)
+    space = SEARCH_SPACES['hist_gradient_boosting' if model_name == 'gradient_boosting' and args.booster == 'hist' else model_name]
+    
+    if groups is not None:
+        cv = GroupKFold(n_splits=args.cv_folds)
+    else:
+        logger.warning("No user groups in dataset, falling back to stratified folds")
+        cv = StratifiedKFold(n_splits=args.cv_folds, shuffle=True, random_state=42)
+    
+    common = dict(
+        scoring=args.scoring,
+        cv=cv,
+        n_jobs=-1,
+        random_state=42,
+        refit=True,
+        verbose=1
+    )
+    if args.search == 'halving':
+        search = HalvingRandomSearchCV(
+            estimator, space, n_candidates=args.search_iterations, factor=3,
+            min_resources='exhaust', **common
+        )
+    else:
+        search = RandomizedSearchCV(
+            estimator, space, n_iter=args.search_iterations, **common
+        )
+    
+    fit_params = {} if sample_weight is None else {'sample_weight': sample_weight}
+    start = time.time()
+    search.fit(X_train, y_train, groups=groups, **fit_params)
+    elapsed = time.time() - start
+    
+    results = search.cv_results_
+    report = {
+        'strategy': args.search,
+        'scoring': args.scoring,
+        'cv_folds': args.cv_folds,
+        'grouped_folds': groups is not None,
+        'candidates': len(results['params']),
+        'best_params': {k: (v.item() if hasattr(v, 'item') else v) for k, v in search.best_params_.items()},
+        'best_score': float(search.best_score_),
+        'timing': {
+            'search_seconds': round(elapsed, 2),
+            'mean_fit_seconds': float(np.mean(results['mean_fit_time'])),
+            'max_fit_seconds': float(np.max(results['mean_fit_time'])),
+            'mean_score_seconds': float(np.mean(results['mean_score_time'])),
+            'cpu_count': os.cpu_count()
+        }
+    }
+    if model_name == 'gradient_boosting' and args.early_stopping_rounds:
+        best = search.best_estimator_
+        report['best_n_estimators_used'] = int(best.n_iter_ if args.booster == 'hist' else best.n_estimators_)
+    
+    logger.info(f"{model_name} best {args.scoring}: {report['best_score']:.4f} "
+                f"with {report['best_params']} ({elapsed:.1f}s, {report['candidates']} candidates)")
+    
+    return search.best_estimator_, report
+
+
+def process_peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+
+
+def _reset_peak_rss():
+    """Reset the kernel's RSS high-water mark so a stage reports its own peak (Linux only)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _stage_peak_rss_mb():
+    """RSS high-water mark since the last reset, in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+@contextmanager
+def profile_stage(profile, name):
+    """Record wall time, CPU time and peak RSS of a training stage into profile['stages'].
+
+    CPU time includes reaped child processes; joblib's worker pool is only
+    reaped at exit, so parallel stages can under-report CPU. Peak RSS is the
+    stage's own high-water mark where the kernel allows resetting it,
+    otherwise the process peak so far.
+    """
+    per_stage_peak = _reset_peak_rss()
+    wall_start = time.perf_counter()
+    cpu_start = sum(os.times()[:4])
+    try:
+        yield
+    finally:
+        peak = _stage_peak_rss_mb() if per_stage_peak else None
+        profile['stages'][name] = {
+            'wall_seconds': round(time.perf_counter() - wall_start, 3),
+            'cpu_seconds': round(sum(os.times()[:4]) - cpu_start, 3),
+            'peak_rss_mb': peak if peak is not None else process_peak_rss_mb()
+        }
+        logger.info(f"Stage {name}: {profile['stages'][name]}")
+
+
+def take_rows(X, idx):
+    """Materialize the given rows of a DataFrame, array or memmap"""
+    if isinstance(X, pd.DataFrame):
+        return X.iloc[idx]
+    return np.array(X[idx])
+
+
+def measure_inference_latency(models, name='Ensemble', batch_sizes=LATENCY_BATCH_SIZES, repeats=5):
+    """Time the averaged predict_proba of (model, X) pairs for several batch sizes.
+
+    Rows are tiled when the sample is smaller than a batch. Reports the
+    median batch latency and the per-sample latency derived from it.
+    """
+    latency = {}
+    n_rows = len(models[0][1])
+    for batch_size in batch_sizes:
+        idx = np.arange(batch_size) % n_rows
+        batches = [(model, take_rows(X, idx)) for model, X in models]
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            sum(model.predict_proba(batch)[:, 1] for model, batch in batches) / len(batches)
+            timings.append(time.perf_counter() - start)
+        batch_seconds = float(np.median(timings))
+        latency[f'batch_{batch_size}'] = {
+            'batch_ms': round(batch_seconds * 1000, 3),
+            'per_sample_us': round(batch_seconds / batch_size * 1e6, 3)
+        }
+    logger.info(f"{name} inference latency: {latency}")
+    return latency
+
+
+def model_size_mb(*models):
+    """Serialized size of one or more models, in MB"""
+    return round(sum(len(pickle.dumps(model)) for model in models) / (1024 * 1024), 3)
+
+
+def evaluate_model(model, X, y, model_name, batch_rows=None, medians=None):
+    """Evaluate model performance (in batches when batch_rows is set)"""
     logger.info(f"Evaluating {model_name}...")
     
     # Predictions
-    y_pred = model.predict(X)
-    y_prob = model.predict_proba(X)[:, 1]
+    if batch_rows:
+        y_prob = predict_proba_batched(model, X, batch_rows, medians)
+        y_pred = (y_prob > 0.5).astype(int)
+    else:
+        y_pred = model.predict(X)
+        y_prob = model.predict_proba(X)[:, 1]
     
     # Metrics
     auc = roc_auc_score(y, y_prob)
@@ -174,13 +773,77 @@ def evaluate_ensemble(rf_prob, gb_prob, y, threshold=0.5):
     return metrics
 
 
-def get_feature_importance(rf_model, gb_model, feature_names):
+def distill_student(X_train, teacher_prob, args, sample_weight=None):
+    """Fit a compact student model on the ensemble's soft probabilities.
+
+    Every row is presented once as positive weighted by p and once as
+    negative weighted by 1 - p, so the weighted log loss is the cross-entropy
+    against the teacher's soft targets and the student stays a plain,
+    NaN-tolerant HistGradientBoostingClassifier.
+    """
+    logger.info(f"Distilling ensemble into a student (max_depth={args.student_max_depth}, "
+                f"max_iter={args.student_max_iter})...")
+    
+    n_rows = len(X_train)
+    if isinstance(X_train, pd.DataFrame):
+        X_pair = pd.concat([X_train, X_train], ignore_index=True)
+    else:
+        X_pair = np.concatenate([X_train, X_train])
+    y_pair = np.concatenate([np.ones(n_rows, dtype=np.int8), np.zeros(n_rows, dtype=np.int8)])
+    teacher_prob = np.asarray(teacher_prob, dtype=np.float64)
+    w_pair = np.concatenate([teacher_prob, 1.0 - teacher_prob])
+    if sample_weight is not None:
+        w_pair *= np.concatenate([sample_weight, sample_weight])
+    
+    student = HistGradientBoostingClassifier(
+        max_depth=args.student_max_depth,
+        max_iter=args.student_max_iter,
+        learning_rate=0.1,
+        early_stopping=False,
+        random_state=42
+    )
+    student.fit(X_pair, y_pair, sample_weight=w_pair)
+    
+    logger.info("Student training complete")
+    return student
+
+
+def distillation_parity(student_metrics, teacher_metrics, args):
+    """Compare student and teacher metrics and decide whether the student can serve by default"""
+    parity = {
+        'auc_delta': student_metrics['auc'] - teacher_metrics['auc'],
+        'recall_delta': student_metrics['recall'] - teacher_metrics['recall'],
+        'precision_delta': student_metrics['precision'] - teacher_metrics['precision'],
+        'max_auc_drop': args.distill_max_auc_drop,
+        'max_recall_drop': args.distill_max_recall_drop
+    }
+    parity['promoted'] = (
+        -parity['auc_delta'] <= args.distill_max_auc_drop
+        and -parity['recall_delta'] <= args.distill_max_recall_drop
+    )
+    logger.info(f"Distillation parity: AUC {parity['auc_delta']:+.4f}, recall {parity['recall_delta']:+.4f} "
+                f"-> {'student' if parity['promoted'] else 'ensemble'} serves by default")
+    return parity
+
+
+def model_importance(model, X, y):
+    """Impurity importance, or normalized permutation importance for models without it"""
+    if hasattr(model, 'feature_importances_'):
+        return model.feature_importances_
+    
+    result = permutation_importance(model, X, y, scoring='roc_auc', n_repeats=5, random_state=42, n_jobs=-1)
+    importance = np.clip(result.importances_mean, 0, None)
+    total = importance.sum()
+    return importance / total if total > 0 else importance
+
+
+def get_feature_importance(rf_model, gb_model, feature_names, X_val=None, y_val=None):
     """Get feature importance from both models"""
     logger.info("Calculating feature importance...")
     
     # Average importance from both models
     rf_importance = rf_model.feature_importances_
-    gb_importance = gb_model.feature_importances_
+    gb_importance = model_importance(gb_model, X_val, y_val)
     avg_importance = (rf_importance + gb_importance) / 2
     
     # Create DataFrame
@@ -198,13 +861,25 @@ def get_feature_importance(rf_model, gb_model, feature_names):
     return importance_df
 
 
-def save_models(rf_model, gb_model, feature_importance, metrics, model_dir):
+def save_models(rf_model, gb_model, feature_importance, metrics, model_dir, student_model=None, serving=None,
+                holdout=None):
     """Save trained models and artifacts"""
     logger.info(f"Saving models to {model_dir}")
     
     # Save models
     joblib.dump(rf_model, os.path.join(model_dir, 'rf_model.pkl'))
     joblib.dump(gb_model, os.path.join(model_dir, 'gb_model.pkl'))
+    if student_model is not None:
+        joblib.dump(student_model, os.path.join(model_dir, 'student_model.pkl'))
+    
+    # Save the fixed holdout for next month's warm start
+    if holdout is not None:
+        np.savez_compressed(os.path.join(model_dir, HOLDOUT_FILE), X=holdout[0], y=holdout[1])
+    
+    # Save serving manifest (default model, feature order, imputation medians)
+    if serving is not None:
+        with open(os.path.join(model_dir, 'serving.json'), 'w') as f:
+            json.dump(serving, f, indent=2)
     
     # Save feature importance
     feature_importance.to_csv(os.path.join(model_dir, 'feature_importance.csv'), index=False)
@@ -213,6 +888,11 @@ def save_models(rf_model, gb_model, feature_importance, metrics, model_dir):
     with open(os.path.join(model_dir, 'metrics.json'), 'w') as f:
         json.dump(metrics, f, indent=2)
     
+    # Save hyperparameter search report
+    if 'search' in metrics:
+        with open(os.path.join(model_dir, 'search_report.json'), 'w') as f:
+            json.dump(metrics['search'], f, indent=2)
+    
     logger.info("Models and artifacts saved successfully")
 
 
@@ -225,6 +905,36 @@ def main():
     parser.add_argument('--max_depth', type=int, default=10)
     parser.add_argument('--min_samples_split', type=int, default=5)
     parser.add_argument('--class_weight', type=str, default='balanced')
+    parser.add_argument('--learning_rate', type=float, default=0.1)
+    parser.add_argument('--early_stopping_rounds', type=int, default=0)  # 0 disables
+    parser.add_argument('--booster', type=str, default='gb', choices=['gb', 'hist'])
+    parser.add_argument('--compare_boosters', type=str2bool, default=False)
+    
+    # Distillation into a single serving model
+    parser.add_argument('--distill', type=str2bool, default=True)
+    parser.add_argument('--student_max_depth', type=int, default=3)
+    parser.add_argument('--student_max_iter', type=int, default=100)
+    parser.add_argument('--distill_max_auc_drop', type=float, default=0.01)
+    parser.add_argument('--distill_max_recall_drop', type=float, default=0.02)
+    
+    # Out-of-core training (0 keeps everything in memory)
+    parser.add_argument('--memory_budget_mb', type=int, default=0)
+    parser.add_argument('--trees_per_batch', type=int, default=25)
+    
+    # Hyperparameter search (none, random, halving)
+    parser.add_argument('--search', type=str, default='none', choices=['none', 'random', 'halving'])
+    parser.add_argument('--search_iterations', type=int, default=20)
+    parser.add_argument('--cv_folds', type=int, default=5)
+    parser.add_argument('--scoring', type=str, default='roc_auc')
+    
+    # Warm-start retraining from the previous model (falls back to a full retrain)
+    parser.add_argument('--warm_start_from', type=str, default=os.environ.get('SM_CHANNEL_PREVIOUS_MODEL'))
+    parser.add_argument('--new_data', type=str, default=os.environ.get('SM_CHANNEL_NEW_DATA'))
+    parser.add_argument('--holdout', type=str, default=os.environ.get('SM_CHANNEL_HOLDOUT'))
+    parser.add_argument('--warm_start_trees', type=int, default=50)
+    parser.add_argument('--warm_start_stages', type=int, default=50)
+    parser.add_argument('--max_feature_drift', type=float, default=0.2)  # PSI
+    parser.add_argument('--max_auc_regression', type=float, default=0.01)
     
     # SageMaker specific arguments
     parser.add_argument('--train', type=str, default=os.environ.get('SM_CHANNEL_TRAIN'))
@@ -241,39 +951,235 @@ def main():
     logger.info(f"  max_depth: {args.max_depth}")
     logger.info(f"  min_samples_split: {args.min_samples_split}")
     logger.info(f"  class_weight: {args.class_weight}")
+    logger.info(f"  learning_rate: {args.learning_rate}")
+    logger.info(f"  early_stopping_rounds: {args.early_stopping_rounds}")
+    logger.info(f"  booster: {args.booster}")
+    logger.info(f"  search: {args.search}")
+    logger.info(f"  memory_budget_mb: {args.memory_budget_mb or 'unbounded'}")
+    logger.info(f"  warm_start_from: {args.warm_start_from or 'none'}")
     logger.info("="*60)
     
-    # Load data
-    train_df, val_df = load_data(args.train, args.validation)
+    profile = {'stages': {}}
     
-    # Prepare features
-    X_train, y_train, feature_names = prepare_features(train_df)
-    X_val, y_val, _ = prepare_features(val_df)
+    # Warm start: extend last month's models with the new samples unless drift or regression says otherwise
+    warm_start = None
+    warm_models = None
+    holdout = load_fixed_holdout(args)
+    if args.warm_start_from:
+        with profile_stage(profile, 'warm_start'):
+            warm_start, warm_models = warm_start_models(args, holdout)
+    
+    # Load data and prepare features (the new month's samples only after an accepted warm start)
+    with profile_stage(profile, 'load'):
+        if warm_models is not None:
+            X_train, y_train, feature_names, sample_weight, groups = warm_models[2]
+            X_val, y_val, _, _, _ = load_dataset(args.validation, 'validation.csv')
+        elif is_columnar(args.train):
+            X_train, y_train, feature_names = load_columnar(args.train)
+            X_val, y_val, _ = load_columnar(args.validation)
+            sample_weight = load_optional_array(args.train, 'weights')
+            groups = load_optional_array(args.train, 'groups')
+        elif args.memory_budget_mb:
+            cache_dir = tempfile.mkdtemp(prefix='mindmate-train-')
+            X_train, y_train, feature_names, extras = load_csv_chunked(args.train, 'train.csv', cache_dir)
+            X_val, y_val, _, _ = load_csv_chunked(args.validation, 'validation.csv', cache_dir)
+            sample_weight = extras.get('sample_weight')
+            groups = extras.get('group_id')
+        else:
+            train_df, val_df = load_data(args.train, args.validation)
+            X_train, y_train, feature_names = prepare_features(train_df, impute=False)
+            X_val, y_val, _ = prepare_features(val_df, impute=False)
+            sample_weight = train_df['sample_weight'].to_numpy() if 'sample_weight' in train_df else None
+            groups = train_df['group_id'].to_numpy() if 'group_id' in train_df else None
+    
+    # Random Forest (and the classic booster) need imputed features; the histogram booster does not
+    if warm_models is not None:
+        warm_medians = np.asarray(warm_models[3]['imputation_medians'], dtype=np.float32)
+    with profile_stage(profile, 'prepare'):
+        if args.memory_budget_mb:
+            # Out-of-core: the forest streams subsamples from disk, boosters and search fit one
+            # in-budget subsample, and validation is imputed and scored batch by batch
+            rng = np.random.default_rng(42)
+            budget_rows = rows_for_budget(len(feature_names), args.memory_budget_mb)
+            medians = warm_medians if warm_models is not None else column_medians(X_train, budget_rows, rng)
+            logger.info(f"Out-of-core mode: {args.memory_budget_mb} MB budget -> {budget_rows} rows per batch")
+            
+            fit_idx = sample_rows(len(X_train), budget_rows, rng)
+            X_fit = np.array(X_train[fit_idx])
+            y_fit = np.asarray(y_train[fit_idx])
+            w_fit = None if sample_weight is None else np.asarray(sample_weight[fit_idx])
+            g_fit = None if groups is None else np.asarray(groups[fit_idx])
+            X_fit_imputed = fill_missing(X_fit.copy(), medians)
+            X_val_imputed = X_val
+        elif warm_models is not None:
+            # Extended models keep imputing with the medians they were first trained with
+            budget_rows = None
+            medians = warm_medians
+            X_fit, y_fit, w_fit, g_fit = X_train, y_train, sample_weight, groups
+            X_fit_imputed = impute_with(X_train, medians)
+            X_val_imputed = impute_with(X_val, medians)
+        else:
+            budget_rows = medians = None
+            X_fit, y_fit, w_fit, g_fit = X_train, y_train, sample_weight, groups
+            X_fit_imputed = impute_missing(X_train)
+            X_val_imputed = impute_missing(X_val)
+    booster_inputs = {
+        'gb': (X_fit_imputed, X_val_imputed, medians),
+        'hist': (X_fit, X_val, None)
+    }
+    X_train_gb, X_val_gb, gb_medians = booster_inputs[args.booster]
     
     # Train models
-    rf_model = train_random_forest(X_train, y_train, args)
-    gb_model = train_gradient_boosting(X_train, y_train, args)
+    search_reports = {}
+    with profile_stage(profile, 'rf_fit'):
+        if warm_models is not None:
+            rf_model = warm_models[0]
+        elif args.search != 'none':
+            rf_model, search_reports['random_forest'] = search_hyperparameters(
+                'random_forest', X_fit_imputed, y_fit, g_fit, w_fit, args)
+        elif args.memory_budget_mb:
+            rf_model = train_random_forest_out_of_core(X_train, y_train, args, sample_weight, medians, budget_rows, rng)
+        else:
+            rf_model = train_random_forest(X_fit_imputed, y_fit, args, w_fit)
+    with profile_stage(profile, 'gb_fit'):
+        if warm_models is not None:
+            gb_model = warm_models[1]
+        elif args.search != 'none':
+            gb_model, search_reports['gradient_boosting'] = search_hyperparameters(
+                'gradient_boosting', X_train_gb, y_fit, g_fit, w_fit, args)
+        else:
+            gb_model = train_gradient_boosting(X_train_gb, y_fit, args, w_fit)
+    training_time = {
+        'random_forest': profile['stages']['rf_fit']['wall_seconds'],
+        'gradient_boosting': profile['stages']['gb_fit']['wall_seconds']
+    }
+    if warm_models is not None:
+        training_time = warm_start['fit_seconds']
     
     # Evaluate on validation set
-    rf_metrics, rf_prob = evaluate_model(rf_model, X_val, y_val, "Random Forest")
-    gb_metrics, gb_prob = evaluate_model(gb_model, X_val, y_val, "Gradient Boosting")
-    ensemble_metrics = evaluate_ensemble(rf_prob, gb_prob, y_val)
+    with profile_stage(profile, 'evaluation'):
+        rf_metrics, rf_prob = evaluate_model(rf_model, X_val_imputed, y_val, "Random Forest", budget_rows, medians)
+        gb_metrics, gb_prob = evaluate_model(gb_model, X_val_gb, y_val, "Gradient Boosting", budget_rows, gb_medians)
+        ensemble_metrics = evaluate_ensemble(rf_prob, gb_prob, y_val)
+    
+    # Optionally train the other booster to compare training time and quality
+    booster_comparison = None
+    if args.compare_boosters:
+        other = 'gb' if args.booster == 'hist' else 'hist'
+        other_train, other_val, other_medians = booster_inputs[other]
+        with profile_stage(profile, f'{other}_comparison_fit'):
+            other_model = train_gradient_boosting(other_train, y_fit, args, w_fit, booster=other)
+        other_seconds = profile['stages'][f'{other}_comparison_fit']['wall_seconds']
+        other_metrics, _ = evaluate_model(other_model, other_val, y_val, f"Gradient Boosting ({other})",
+                                          budget_rows, other_medians)
+        booster_comparison = {
+            args.booster: {'fit_seconds': training_time['gradient_boosting'], 'auc': gb_metrics['auc'], 'recall': gb_metrics['recall']},
+            other: {'fit_seconds': other_seconds, 'auc': other_metrics['auc'], 'recall': other_metrics['recall']}
+        }
+        logger.info(f"Booster comparison: {booster_comparison}")
     
-    # Feature importance
-    feature_importance = get_feature_importance(rf_model, gb_model, feature_names)
+    # Feature importance (permutation importance uses an in-budget validation sample out-of-core)
+    with profile_stage(profile, 'importance'):
+        X_importance, y_importance = X_val_gb, y_val
+        if args.memory_budget_mb:
+            importance_idx = sample_rows(len(X_val), budget_rows, rng)
+            X_importance = np.array(X_val[importance_idx])
+            if gb_medians is not None:
+                fill_missing(X_importance, gb_medians)
+            y_importance = np.asarray(y_val[importance_idx])
+        feature_importance = get_feature_importance(rf_model, gb_model, feature_names, X_importance, y_importance)
+    
+    # Distill the ensemble into a compact student that takes raw (NaN-bearing) features
+    student_model = None
+    distillation = None
+    if args.distill:
+        with profile_stage(profile, 'distillation'):
+            teacher_prob = (rf_model.predict_proba(X_fit_imputed)[:, 1] + gb_model.predict_proba(X_train_gb)[:, 1]) / 2
+            student_model = distill_student(X_fit, teacher_prob, args, w_fit)
+            student_metrics, student_prob = evaluate_model(student_model, X_val, y_val, "Distilled Student", budget_rows)
+            distillation = {
+                'student': student_metrics,
+                'parity': distillation_parity(student_metrics, ensemble_metrics, args),
+                'fidelity_mae': float(np.mean(np.abs(student_prob - (rf_prob + gb_prob) / 2))),
+                'model_size_mb': {'student': model_size_mb(student_model), 'ensemble': model_size_mb(rf_model, gb_model)}
+            }
+    
+    # Inference latency of the final models, on validation rows prepared the way serving sees them
+    sample_idx = np.arange(min(len(X_val), max(LATENCY_BATCH_SIZES)))
+    X_latency_rf = take_rows(X_val_imputed, sample_idx)
+    X_latency_gb = take_rows(X_val_gb, sample_idx)
+    if medians is not None:
+        fill_missing(X_latency_rf, medians)
+        if gb_medians is not None:
+            fill_missing(X_latency_gb, gb_medians)
+    profile['inference_latency'] = measure_inference_latency([(rf_model, X_latency_rf), (gb_model, X_latency_gb)])
+    if student_model is not None:
+        profile['student_inference_latency'] = measure_inference_latency(
+            [(student_model, take_rows(X_val, sample_idx))], name='Student')
+    profile['peak_rss_mb'] = process_peak_rss_mb()
+    
+    # Serving manifest: calculateRiskScore builds feature vectors in this order and imputes
+    # with the training medians, so training and serving agree on missing values
+    if medians is None:
+        medians = np.nan_to_num(np.asarray(X_train.median() if isinstance(X_train, pd.DataFrame)
+                                           else np.nanmedian(X_train, axis=0), dtype=np.float64))
+    serving = {
+        'schema_version': 1,
+        'default_model': 'student' if distillation and distillation['parity']['promoted'] else 'ensemble',
+        'feature_names': list(feature_names),
+        'imputation_medians': [float(m) for m in medians],
+        # Drift is measured against the last full retrain, so warm starts keep its reference
+        'drift_reference': ((warm_models[3].get('drift_reference') if warm_models is not None else None)
+                            or drift_reference(X_train, np.random.default_rng(42))),
+        'models': {
+            'ensemble': {
+                'artifacts': {'rf': 'rf_model.pkl', 'gb': 'gb_model.pkl'},
+                'gb_input': 'raw' if args.booster == 'hist' else 'imputed'
+            }
+        }
+    }
+    if student_model is not None:
+        serving['models']['student'] = {'artifact': 'student_model.pkl', 'input': 'raw'}
     
     # Combine metrics
     all_metrics = {
         'random_forest': rf_metrics,
         'gradient_boosting': gb_metrics,
         'ensemble': ensemble_metrics,
-        'training_samples': len(train_df),
-        'validation_samples': len(val_df),
-        'num_features': len(feature_names)
+        'training_samples': len(X_train),
+        'validation_samples': len(X_val),
+        'num_features': len(feature_names),
+        'booster': args.booster,
+        'training_seconds': training_time,
+        'profile': profile
     }
+    if args.memory_budget_mb:
+        all_metrics['out_of_core'] = {
+            'memory_budget_mb': args.memory_budget_mb,
+            'rows_per_batch': budget_rows,
+            'trees_per_batch': args.trees_per_batch
+        }
+    if booster_comparison:
+        all_metrics['booster_comparison'] = booster_comparison
+    if distillation:
+        all_metrics['distillation'] = distillation
+    if warm_start:
+        all_metrics['warm_start'] = warm_start
+    all_metrics['serving_model'] = serving['default_model']
+    if search_reports:
+        all_metrics['search'] = search_reports
+    
+    # The holdout travels with the models, so every warm start compares against the same rows.
+    # The first run (or a feature schema change) freezes a sample of this validation set.
+    if holdout is None or holdout[0].shape[1] != len(feature_names):
+        holdout_idx = sample_rows(len(X_val), HOLDOUT_MAX_ROWS, np.random.default_rng(42))
+        holdout = (np.asarray(take_rows(X_val, holdout_idx), dtype=np.float32),
+                   np.asarray(y_val)[holdout_idx], 'validation')
+    all_metrics['holdout'] = {'samples': len(holdout[0]), 'source': holdout[2]}
     
     # Save models
-    save_models(rf_model, gb_model, feature_importance, all_metrics, args.model_dir)
+    save_models(rf_model, gb_model, feature_importance, all_metrics, args.model_dir, student_model, serving,
+                holdout)
     
     logger.info("="*60)
     logger.info("Training Complete!")
@@ -53,16 +53,20 @@ def main():
     train_file = os.path.join(args.train, train_files[0])
     logger.info(f"Loading data from: {train_file}")
     
-    df = pd.read_csv(train_file)
+    # Parse features straight to float32 so the frame is not copied again after loading
+    exclude_cols = ['label', 'sample_id', 'userId', 'group_id', 'sample_weight']
+    columns = pd.read_csv(train_file, nrows=0).columns
+    feature_cols = [col for col in columns if col not in exclude_cols]
+    
+    df = pd.read_csv(train_file, dtype={col: np.float32 for col in feature_cols})
     logger.info(f"Total samples: {len(df)}")
     logger.info(f"Columns: {list(df.columns)}")
     
-    # Prepare features
-    exclude_cols = ['label', 'sample_id', 'userId']
-    feature_cols = [col for col in df.columns if col not in exclude_cols]
-    
-    X = df[feature_cols].fillna(df[feature_cols].median())
-    y = df['label']
+    # Prepare features (label popped and ids dropped in place, NaNs filled in place)
+    y = df.pop('label')
+    df.drop(columns=[col for col in exclude_cols if col in df.columns], inplace=True)
+    X = df
+    X.fillna(X.median(), inplace=True)
     
     logger.info(f"Features: {len(feature_cols)}")
     logger.info(f"Class distribution: {y.value_counts().to_dict()}")
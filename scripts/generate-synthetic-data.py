@@ -1,17 +1,31 @@
 #!/usr/bin/env python3
 """
-Generate Synthetic Training Data for Hackathon Demo
-Creates realistic mood logs and training data without real users
+Generate Synthetic Training Data
+Creates realistic mood logs, chat messages and selfies without real users.
+
+Without --users, writes the five demo users used in the hackathon demo.
+With --users N, builds a population of N users with NumPy (configurable
+pattern mix, crisis episodes) and writes it to DynamoDB through parallel
+batch writers, or to local columnar .npz chunks for scale benchmarks.
+The same --seed, --chunk-users and --end-date always give the same data.
+
+Examples:
+  python3 scripts/generate-synthetic-data.py
+  python3 scripts/generate-synthetic-data.py --users 1000000 --sink local --output-dir synthetic-data
+  python3 scripts/generate-synthetic-data.py --users 50000 --mix stable=0.6,crisis=0.4 --workers 16
 """
 
-import boto3
-import random
+import argparse
 import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('EmoCompanion')
+import boto3
+import numpy as np
 
 # Synthetic user profiles
 DEMO_USERS = [
@@ -42,6 +56,10 @@ DEMO_USERS = [
     }
 ]
 
+PATTERNS = [user['pattern'] for user in DEMO_USERS]
+CRISIS_RISK = np.array([user['crisis_risk'] for user in DEMO_USERS])
+DEFAULT_MIX = 'stable=0.4,declining=0.2,crisis=0.1,recovering=0.15,volatile=0.15'
+
 # Mood notes templates
 STABLE_NOTES = [
     "Feeling good today, work went well",
@@ -85,157 +103,335 @@ VOLATILE_NOTES = [
     "Emotional rollercoaster today"
 ]
 
+# One flat note table: each pattern's notes, then crisis-episode notes (also used as chat messages)
+PATTERN_NOTES = [STABLE_NOTES, DECLINING_NOTES, CRISIS_NOTES, RECOVERING_NOTES, VOLATILE_NOTES]
+NOTES = [note for notes in PATTERN_NOTES for note in notes] + CRISIS_NOTES
+NOTE_OFFSETS = np.cumsum([0] + [len(notes) for notes in PATTERN_NOTES])[:-1]
+NOTE_COUNTS = np.array([len(notes) for notes in PATTERN_NOTES])
+EPISODE_NOTE_OFFSET = len(NOTES) - len(CRISIS_NOTES)
+
+# Tag bits: 0-2 for good days (mood >= 7), 3-5 for bad days (mood <= 4)
+TAGS = ['happy', 'productive', 'social', 'stressed', 'tired', 'anxious']
+
+MISSING_DAY_RATE = 0.15
+EPISODE_DAYS = (3, 10)
+
+# Precomputed DynamoDB numbers (moods have one decimal, emotions two)
+MOOD_DECIMALS = [Decimal(f'{i / 10:.1f}') for i in range(101)]
+SCORE_DECIMALS = [Decimal(f'{i / 100:.2f}') for i in range(101)]
+
+_local = threading.local()
+
+
+def parse_mix(mix):
+    """Parse 'stable=0.4,crisis=0.1,...' into pattern probabilities (normalized)"""
+    weights = np.zeros(len(PATTERNS))
+    for part in mix.split(','):
+        name, _, value = part.partition('=')
+        if name.strip() not in PATTERNS:
+            raise ValueError(f"Unknown pattern '{name}' (expected one of {', '.join(PATTERNS)})")
+        weights[PATTERNS.index(name.strip())] = float(value)
+    if weights.sum() <= 0:
+        raise ValueError("Pattern mix must have a positive weight")
+    return weights / weights.sum()
+
+
+def mood_baselines(days):
+    """Per-pattern mood baseline and noise amplitude for every day, shape (patterns, days)"""
+    progress = np.arange(days) / days
+    base = np.empty((len(PATTERNS), days))
+    base[0] = 7                                               # stable: consistently good (6-8)
+    base[1] = 7 - 4 * progress                                # declining: 7 -> 3
+    base[2] = np.select([progress < 1 / 3, progress < 2 / 3], [5, 3], 2)  # crisis: 5 -> 3 -> 2
+    base[3] = 4 + 3 * progress                                # recovering: 4 -> 7
+    base[4] = 5.5                                             # volatile: swings between 3 and 8
+    amplitude = np.array([1.0, 0.5, 0.5, 0.5, 2.5])[:, None].repeat(days, axis=1)
+    return base, amplitude
+
+
+def generate_chunk(rng, patterns, days, chat_rate, selfie_rate, episode_rate):
+    """Generate all items for a block of users as column arrays.
+
+    patterns holds one pattern index per user; returned 'user' columns are
+    indices into that block. Times are (day, millisecond-of-day) pairs.
+    """
+    n_users = len(patterns)
+    base, amplitude = mood_baselines(days)
+    day_index = np.arange(days)
 
-def generate_mood_pattern(pattern, day, total_days=90):
-    """Generate mood score based on pattern"""
-    
-    if pattern == 'stable':
-        # Consistently good mood (6-8)
-        base = 7
-        variation = random.uniform(-1, 1)
-        return max(1, min(10, base + variation))
-    
-    elif pattern == 'declining':
-        # Gradual decline from 7 to 3
-        progress = day / total_days
-        base = 7 - (4 * progress)
-        variation = random.uniform(-0.5, 0.5)
-        return max(1, min(10, base + variation))
-    
-    elif pattern == 'crisis':
-        # Severe decline to crisis levels
-        if day < 30:
-            base = 5
-        elif day < 60:
-            base = 3
-        else:
-            base = 2  # Crisis level
-        variation = random.uniform(-0.5, 0.5)
-        return max(1, min(10, base + variation))
-    
-    elif pattern == 'recovering':
-        # Improving from 4 to 7
-        progress = day / total_days
-        base = 4 + (3 * progress)
-        variation = random.uniform(-0.5, 0.5)
-        return max(1, min(10, base + variation))
-    
-    elif pattern == 'volatile':
-        # Random swings between 3 and 8
-        return random.uniform(3, 8)
-    
-    return 5
-
-
-def get_notes_for_pattern(pattern, mood):
-    """Get appropriate notes based on pattern and mood"""
-    
-    if pattern == 'stable':
-        return random.choice(STABLE_NOTES)
-    elif pattern == 'declining':
-        return random.choice(DECLINING_NOTES)
-    elif pattern == 'crisis':
-        return random.choice(CRISIS_NOTES)
-    elif pattern == 'recovering':
-        return random.choice(RECOVERING_NOTES)
-    elif pattern == 'volatile':
-        return random.choice(VOLATILE_NOTES)
-    
-    return "Feeling okay today"
-
-
-def generate_user_data(user_profile, days=90):
-    """Generate synthetic mood logs for a user"""
-    
-    user_id = user_profile['userId']
-    pattern = user_profile['pattern']
-    
-    print(f"\nGenerating data for {user_id} ({pattern} pattern)...")
-    
-    # Create user profile
-    table.put_item(Item={
-        'PK': f'USER#{user_id}',
-        'SK': 'PROFILE',
-        'type': 'PROFILE',
-        'userId': user_id,
-        'personality': 'gentle',
-        'petName': 'Demo Buddy',
-        'createdAt': (datetime.utcnow() - timedelta(days=days)).isoformat()
-    })
-    
-    # Generate mood logs
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    for day in range(days):
-        # Skip some days randomly (realistic)
-        if random.random() < 0.15:  # 15% missing days
-            continue
-        
-        current_date = start_date + timedelta(days=day)
-        mood = generate_mood_pattern(pattern, day, days)
-        notes = get_notes_for_pattern(pattern, mood)
-        
-        # Add some tags
-        tags = []
-        if mood >= 7:
-            tags = random.sample(['happy', 'productive', 'social'], k=random.randint(0, 2))
-        elif mood <= 4:
-            tags = random.sample(['stressed', 'tired', 'anxious'], k=random.randint(0, 2))
-        
-        # Store mood log
-        table.put_item(Item={
+    # Mood curves with per-pattern noise
+    mood = base[patterns] + amplitude[patterns] * rng.uniform(-1, 1, (n_users, days))
+
+    # Crisis episodes: a few consecutive days at crisis level, likelier for high-risk patterns
+    has_episode = rng.random(n_users) < CRISIS_RISK[patterns] * episode_rate
+    episode_len = rng.integers(EPISODE_DAYS[0], EPISODE_DAYS[1] + 1, n_users)
+    episode_start = np.where(has_episode, (rng.random(n_users) * np.maximum(days - episode_len, 1)).astype(np.int32), -1)
+    in_episode = (day_index >= episode_start[:, None]) & (day_index < (episode_start + episode_len)[:, None])
+    in_episode &= has_episode[:, None]
+    mood = np.where(in_episode, rng.uniform(1, 2.5, (n_users, days)), mood)
+    mood = np.clip(np.round(mood, 1), 1, 10).astype(np.float32)
+
+    # Mood logs on ~85% of days
+    present = rng.random((n_users, days)) >= MISSING_DAY_RATE
+    users, log_days = np.nonzero(present)
+    log_mood = mood[users, log_days]
+    log_episode = in_episode[users, log_days]
+    note_pick = rng.random(len(users))
+    log_note = np.where(
+        log_episode,
+        EPISODE_NOTE_OFFSET + (note_pick * len(CRISIS_NOTES)).astype(np.int16),
+        NOTE_OFFSETS[patterns[users]] + (note_pick * NOTE_COUNTS[patterns[users]]).astype(np.int16)
+    ).astype(np.int16)
+    tag_bits = (rng.random((len(users), 3)) < 1 / 3) * np.array([1, 2, 4])
+    tag_bits = tag_bits.sum(axis=1).astype(np.uint8)
+    log_tags = np.where(log_mood >= 7, tag_bits, np.where(log_mood <= 4, tag_bits << 3, 0)).astype(np.uint8)
+
+    # Selfies on ~10% of logged days, emotions derived from the mood
+    selfie = rng.random(len(users)) < selfie_rate
+    selfie_mood = log_mood[selfie]
+
+    # Chat messages: Poisson per logged day, three times as many during an episode
+    chat_counts = rng.poisson(chat_rate * np.where(log_episode, 3.0, 1.0))
+    chat_row = np.repeat(np.arange(len(users)), chat_counts)
+    chat_episode = log_episode[chat_row]
+    chat_pick = rng.random(len(chat_row))
+    chat_note = np.where(
+        chat_episode,
+        EPISODE_NOTE_OFFSET + (chat_pick * len(CRISIS_NOTES)).astype(np.int16),
+        NOTE_OFFSETS[patterns[users[chat_row]]] + (chat_pick * NOTE_COUNTS[patterns[users[chat_row]]]).astype(np.int16)
+    ).astype(np.int16)
+
+    return {
+        'user_pattern': patterns.astype(np.int8),
+        'user_episode_start': episode_start.astype(np.int16),
+        'mood_user': users.astype(np.int32),
+        'mood_day': log_days.astype(np.int16),
+        'mood_ms': rng.integers(0, 86400000, len(users), dtype=np.int32),
+        'mood_value': log_mood,
+        'mood_note': log_note,
+        'mood_tags': log_tags,
+        'selfie_user': users[selfie].astype(np.int32),
+        'selfie_day': log_days[selfie].astype(np.int16),
+        'selfie_ms': rng.integers(0, 86400000, int(selfie.sum()), dtype=np.int32),
+        'selfie_happy': np.clip((selfie_mood - 5) / 5, 0, 1).astype(np.float32),
+        'selfie_sad': np.clip((5 - selfie_mood) / 5, 0, 1).astype(np.float32),
+        'chat_user': users[chat_row].astype(np.int32),
+        'chat_day': log_days[chat_row].astype(np.int16),
+        'chat_ms': rng.integers(0, 86400000, len(chat_row), dtype=np.int32),
+        'chat_note': chat_note,
+        'chat_crisis': chat_episode
+    }
+
+
+def timestamps(start, day, ms):
+    """ISO-8601 timestamps (millisecond precision, 'Z' suffix) for day/millisecond columns"""
+    instants = np.datetime64(start, 'ms') + day.astype('timedelta64[D]') + ms.astype('timedelta64[ms]')
+    return np.char.add(np.datetime_as_string(instants, unit='ms'), 'Z')
+
+
+def build_items(chunk, user_ids, start):
+    """Turn a generated chunk into EmoCompanion items (PROFILE, MOOD, SELFIE, CHAT)"""
+    created_at = start.isoformat()
+    items = []
+    for user_id in user_ids:
+        items.append({
             'PK': f'USER#{user_id}',
-            'SK': f'MOOD#{current_date.isoformat()}Z',
+            'SK': 'PROFILE',
+            'type': 'PROFILE',
+            'userId': user_id,
+            'personality': 'gentle',
+            'petName': 'Demo Buddy',
+            'createdAt': created_at
+        })
+
+    ts = timestamps(start, chunk['mood_day'], chunk['mood_ms'])
+    for user, stamp, mood, note, tags in zip(chunk['mood_user'].tolist(), ts.tolist(), chunk['mood_value'].tolist(),
+                                             chunk['mood_note'].tolist(), chunk['mood_tags'].tolist()):
+        user_id = user_ids[user]
+        items.append({
+            'PK': f'USER#{user_id}',
+            'SK': f'MOOD#{stamp}',
             'type': 'MOOD',
             'userId': user_id,
-            'mood': Decimal(str(round(mood, 1))),
-            'notes': notes,
-            'tags': tags,
-            'ts': current_date.isoformat() + 'Z'
+            'mood': MOOD_DECIMALS[int(round(mood * 10))],
+            'notes': NOTES[note],
+            'tags': [tag for bit, tag in enumerate(TAGS) if tags >> bit & 1],
+            'ts': stamp
         })
-        
-        # Occasionally add selfies
-        if random.random() < 0.1:  # 10% of days
-            emotions = {
-                'HAPPY': Decimal(str(max(0, (mood - 5) / 5))),
-                'SAD': Decimal(str(max(0, (5 - mood) / 5))),
-                'CALM': Decimal(str(0.3))
-            }
-            
-            table.put_item(Item={
-                'PK': f'USER#{user_id}',
-                'SK': f'SELFIE#{current_date.isoformat()}Z',
-                'type': 'SELFIE',
-                'userId': user_id,
-                'emotions': emotions,
-                'ts': current_date.isoformat() + 'Z'
-            })
-    
-    print(f"  ✓ Generated {days} days of data for {user_id}")
-
-
-def generate_all_demo_data():
-    """Generate data for all demo users"""
-    
-    print("="*60)
-    print("Generating Synthetic Training Data for Demo")
-    print("="*60)
-    
-    for user_profile in DEMO_USERS:
-        generate_user_data(user_profile, days=90)
-    
-    print("\n" + "="*60)
-    print("✅ Synthetic data generation complete!")
-    print("="*60)
-    print(f"\nGenerated data for {len(DEMO_USERS)} demo users:")
-    for user in DEMO_USERS:
-        print(f"  - {user['userId']}: {user['pattern']} pattern (crisis risk: {user['crisis_risk']*100:.0f}%)")
-    
-    print("\nNext steps:")
-    print("1. Run feature extraction: aws lambda invoke --function-name mindmate-extractMoodFeatures ...")
-    print("2. Run data preparation: aws lambda invoke --function-name mindmate-prepareTrainingData ...")
-    print("3. Train model with generated data")
+
+    ts = timestamps(start, chunk['selfie_day'], chunk['selfie_ms'])
+    for user, stamp, happy, sad in zip(chunk['selfie_user'].tolist(), ts.tolist(),
+                                       chunk['selfie_happy'].tolist(), chunk['selfie_sad'].tolist()):
+        user_id = user_ids[user]
+        items.append({
+            'PK': f'USER#{user_id}',
+            'SK': f'SELFIE#{stamp}',
+            'type': 'SELFIE',
+            'userId': user_id,
+            'emotions': {
+                'HAPPY': SCORE_DECIMALS[int(round(happy * 100))],
+                'SAD': SCORE_DECIMALS[int(round(sad * 100))],
+                'CALM': SCORE_DECIMALS[30]
+            },
+            'ts': stamp
+        })
+
+    ts = timestamps(start, chunk['chat_day'], chunk['chat_ms'])
+    for user, stamp, note, crisis in zip(chunk['chat_user'].tolist(), ts.tolist(),
+                                         chunk['chat_note'].tolist(), chunk['chat_crisis'].tolist()):
+        user_id = user_ids[user]
+        items.append({
+            'PK': f'USER#{user_id}',
+            'SK': f'CHAT#{stamp}',
+            'type': 'CHAT',
+            'userId': user_id,
+            'userMessage': NOTES[note],
+            'aiResponse': "I'm here with you. Would you like to talk about it?",
+            'riskLevel': 'HIGH' if crisis else 'LOW',
+            'timestamp': stamp,
+            'ts': stamp
+        })
+
+    return items
+
+
+def thread_table(table_name):
+    """DynamoDB table for the current writer thread (boto3 resources are not thread-safe)"""
+    if getattr(_local, 'table', None) is None:
+        _local.table = boto3.session.Session().resource('dynamodb').Table(table_name)
+    return _local.table
+
+
+def write_items(table_name, items):
+    """Write items with a batch writer (25 items per request, unprocessed items retried)"""
+    with thread_table(table_name).batch_writer(overwrite_by_pkeys=['PK', 'SK']) as batch:
+        for item in items:
+            batch.put_item(Item=item)
+    return len(items)
+
+
+def write_dynamodb(executor, table_name, items, workers):
+    """Split items across the writer threads; a user's items stay together"""
+    slice_size = max(1, -(-len(items) // workers))
+    slices = [items[i:i + slice_size] for i in range(0, len(items), slice_size)]
+    return sum(executor.map(lambda part: write_items(table_name, part), slices))
+
+
+def item_count(chunk):
+    return (len(chunk['user_pattern']) + len(chunk['mood_user'])
+            + len(chunk['selfie_user']) + len(chunk['chat_user']))
+
+
+def generate_population(args):
+    """Generate --users users in chunks and write them to the selected sink"""
+    end = datetime.strptime(args.end_date, '%Y-%m-%d') if args.end_date else datetime.utcnow().replace(
+        hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=args.days)
+
+    if args.users:
+        mix = parse_mix(args.mix)
+        user_ids_for = lambda first, count: [f'{args.user_prefix}{i:08d}' for i in range(first, first + count)]
+        n_users = args.users
+    else:
+        demo_ids = [user['userId'] for user in DEMO_USERS]
+        user_ids_for = lambda first, count: demo_ids[first:first + count]
+        n_users = len(DEMO_USERS)
+
+    print("=" * 60)
+    print(f"Generating {n_users} synthetic users ({args.days} days, seed {args.seed}, sink {args.sink})")
+    print("=" * 60)
+
+    if args.sink == 'local':
+        os.makedirs(args.output_dir, exist_ok=True)
+    executor = ThreadPoolExecutor(max_workers=args.workers) if args.sink == 'dynamodb' else None
+
+    chunk_files = []
+    totals = {'users': 0, 'mood': 0, 'selfie': 0, 'chat': 0, 'items': 0}
+    started = time.perf_counter()
+    try:
+        for chunk_index, first in enumerate(range(0, n_users, args.chunk_users)):
+            count = min(args.chunk_users, n_users - first)
+            # One generator per chunk keeps the output independent of how chunks are written
+            rng = np.random.default_rng([args.seed, chunk_index])
+            if args.users:
+                patterns = rng.choice(len(PATTERNS), size=count, p=mix)
+            else:
+                patterns = np.arange(first, first + count)
+            chunk = generate_chunk(rng, patterns, args.days, args.chat_rate, args.selfie_rate, args.episode_rate)
+
+            if args.sink == 'local':
+                filename = f'chunk_{chunk_index:05d}.npz'
+                np.savez(os.path.join(args.output_dir, filename), **chunk)
+                chunk_files.append({'file': filename, 'firstUser': first, 'users': count})
+            else:
+                write_dynamodb(executor, args.table, build_items(chunk, user_ids_for(first, count), start),
+                               args.workers)
+
+            totals['users'] += count
+            totals['mood'] += len(chunk['mood_user'])
+            totals['selfie'] += len(chunk['selfie_user'])
+            totals['chat'] += len(chunk['chat_user'])
+            totals['items'] += item_count(chunk)
+            elapsed = time.perf_counter() - started
+            print(f"  ✓ {totals['users']}/{n_users} users, {totals['items']} items "
+                  f"({totals['items'] / max(elapsed, 1e-9):,.0f} items/s)")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    if args.sink == 'local':
+        manifest = {
+            'seed': args.seed,
+            'users': n_users,
+            'days': args.days,
+            'startDate': start.isoformat() + 'Z',
+            'userIdFormat': f'{args.user_prefix}{{index:08d}}' if args.users else None,
+            'demoUserIds': None if args.users else [user['userId'] for user in DEMO_USERS],
+            'patterns': PATTERNS,
+            'mix': args.mix if args.users else None,
+            'notes': NOTES,
+            'tags': TAGS,
+            'chunkUsers': args.chunk_users,
+            'chunks': chunk_files,
+            'counts': totals
+        }
+        with open(os.path.join(args.output_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print(f"✅ Generated {totals['items']} items in {elapsed:.1f}s ({totals['items'] / max(elapsed, 1e-9):,.0f} items/s)")
+    print(f"   {totals['mood']} mood logs, {totals['selfie']} selfies, {totals['chat']} chat messages")
+    print("=" * 60)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic MindMate users')
+    parser.add_argument('--users', type=int, default=0, help='Population size (0 writes the five demo users)')
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--mix', type=str, default=DEFAULT_MIX, help='Pattern probabilities, e.g. stable=0.5,crisis=0.5')
+    parser.add_argument('--chat-rate', type=float, default=0.5, help='Mean chat messages per logged day')
+    parser.add_argument('--selfie-rate', type=float, default=0.1, help='Share of logged days with a selfie')
+    parser.add_argument('--episode-rate', type=float, default=0.3, help='Crisis episode probability per unit of pattern risk')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end-date', type=str, default=None, help='Last day (YYYY-MM-DD, default today UTC)')
+    parser.add_argument('--sink', type=str, default='dynamodb', choices=['dynamodb', 'local'])
+    parser.add_argument('--table', type=str, default='EmoCompanion')
+    parser.add_argument('--output-dir', type=str, default='synthetic-data')
+    parser.add_argument('--user-prefix', type=str, default='synthetic_user_')
+    parser.add_argument('--chunk-users', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=8, help='Parallel DynamoDB batch writers')
+    args = parser.parse_args()
+
+    generate_population(args)
+
+    if args.sink == 'dynamodb':
+        print("\nNext steps:")
+        print("1. Run feature extraction: aws lambda invoke --function-name mindmate-extractMoodFeatures ...")
+        print("2. Run data preparation: aws lambda invoke --function-name mindmate-prepareTrainingData ...")
+        print("3. Train model with generated data")
 
 
 if __name__ == '__main__':
-    generate_all_demo_data()
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the feature extraction and risk scoring hot paths.
+
+Each case runs on synthetic histories of 10, 100, 1,000 and 10,000 events and
+reports ops/sec plus peak traced allocations. Results are compared against
+bench/baseline.json; the run exits non-zero when a case gets slower or
+allocates more than the tolerance allows.
+
+Handlers are imported in-process with the load-test fakes (no AWS needed). The
+DynamoDB fetch of each extractor is swapped for the prepared history, so only
+the feature computation is timed; query cost is covered by load/harness.py.
+
+Usage:
+  python3 test/bench/bench.py
+  python3 test/bench/bench.py --sizes 10,100 -k mood --report bench.json
+  python3 test/bench/bench.py --update-baseline
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+import joblib
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+BASELINE = os.path.join(HERE, 'baseline.json')
+SIZES = [10, 100, 1000, 10000]
+
+sys.path.insert(0, os.path.join(ROOT, 'test', 'load'))
+from fakes import FakeAWS  # noqa: E402
+from harness import GENERATOR, LAMBDAS_DIR, load_module  # noqa: E402
+
+CHAT_MESSAGES = [
+    "I had a good day today, feeling grateful",
+    "Work is stressful and I feel tired all the time",
+    "I feel so alone, nobody cares",
+    "Things are improving, therapy is helping",
+    "Everything feels hopeless, I want to give up",
+    "I need help, what should i do about my sleep",
+    "Feeling better after a walk with a friend",
+    "I'm worried and anxious about tomorrow",
+]
+
+
+def load_lambda(name):
+    """Import backend/lambdas/<name>/lambda_function.py (FakeAWS must be installed)"""
+    with redirect_stdout(io.StringIO()):
+        return load_module(f'bench_{name}', os.path.join(LAMBDAS_DIR, name, 'lambda_function.py'))
+
+
+def build_history(n, seed):
+    """n events of each kind, spread over the last 29 days, in the shapes the extractors' fetches return"""
+    notes = load_module('generate_synthetic_data', GENERATOR).NOTES
+    rng = np.random.default_rng([seed, n])
+    end = datetime.utcnow()
+    offsets = np.sort(rng.uniform(0, 29 * 86400, size=n))[::-1]
+    stamps = [(end - timedelta(seconds=float(s))).isoformat() + 'Z' for s in offsets]
+    moods = rng.integers(1, 11, size=n).astype(float)
+    note_idx = rng.integers(0, len(notes), size=n)
+    chat_idx = rng.integers(0, len(CHAT_MESSAGES), size=n)
+    kinds = rng.choice(3, size=n, p=[0.4, 0.1, 0.5])
+
+    history = {'moods': [], 'interactions': [], 'messages': [], 'sentiments': []}
+    for i, ts in enumerate(stamps):
+        note = notes[note_idx[i]]
+        history['moods'].append({'mood': float(moods[i]), 'timestamp': ts, 'tags': ['tired'] if i % 3 else [], 'notes': note})
+        if kinds[i] == 0:
+            history['interactions'].append({'type': 'mood_log', 'timestamp': ts, 'mood': float(moods[i]),
+                                            'notes': note, 'tags': ['tired'] if i % 3 else []})
+        elif kinds[i] == 1:
+            history['interactions'].append({'type': 'selfie', 'timestamp': ts, 'emotions': {'CALM': 70.0}})
+        else:
+            message = CHAT_MESSAGES[chat_idx[i]]
+            history['interactions'].append({'type': 'chat_message', 'timestamp': ts,
+                                            'message': message, 'length': len(message)})
+        text = note if i % 2 else CHAT_MESSAGES[chat_idx[i]]
+        history['messages'].append({'text': text, 'timestamp': ts, 'mood': float(moods[i])})
+
+    negative = rng.dirichlet([2, 2, 3, 1], size=n)
+    for i, ts in enumerate(stamps):
+        scores = dict(zip(['Negative', 'Positive', 'Neutral', 'Mixed'], negative[i].tolist()))
+        history['sentiments'].append({'sentiment': max(scores, key=scores.get).upper(), 'scores': scores,
+                                      'timestamp': ts, 'mood': float(moods[i])})
+    return history
+
+
+def feature_rows(extractors, n, seed):
+    """n feature dicts in the combined extractor schema, with values spread over realistic ranges"""
+    history = build_history(10, seed)
+    names = sorted(set(extractors['mood_features'](history)) | set(extractors['behavioral_features'](history))
+                   | set(extractors['sentiment_features'](history)))
+    rng = np.random.default_rng([seed, n, 1])
+    values = rng.random((n, len(names)))
+    rows = []
+    for row in values:
+        features = dict(zip(names, row.tolist()))
+        features['mood_mean_7day'] = 1 + 9 * features['mood_mean_7day']
+        features['consecutive_low_days'] = int(7 * features['consecutive_low_days'])
+        features['crisis_keywords'] = int(features['crisis_keywords'] > 0.9)
+        features['total_mood_entries'] = int(30 * features['total_mood_entries'])
+        features['mood_trend_7day'] = features['mood_trend_7day'] - 0.5
+        rows.append(features)
+    return names, rows
+
+
+def publish_models(aws, feature_names, seed):
+    """Fit a small RF + hist-GB ensemble and serve it from the stub S3 bucket"""
+    from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+
+    rng = np.random.default_rng(seed)
+    X = rng.random((2000, len(feature_names))).astype(np.float32)
+    y = (X[:, :5].sum(axis=1) + rng.normal(0, 0.3, size=len(X)) > 2.5).astype(int)
+    rf = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=seed, n_jobs=1).fit(X, y)
+    gb = HistGradientBoostingClassifier(max_iter=100, random_state=seed).fit(X, y)
+
+    s3 = aws.client('s3')
+    bucket = os.environ.get('MODEL_BUCKET', 'mindmate-ml-models')
+    for key, model in [('models/rf_model.pkl', rf), ('models/gb_model.pkl', gb)]:
+        buffer = io.BytesIO()
+        joblib.dump(model, buffer)
+        s3.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+    serving = {
+        'schema_version': 1,
+        'default_model': 'ensemble',
+        'feature_names': feature_names,
+        'imputation_medians': np.median(X, axis=0).tolist(),
+        'models': {'ensemble': {'artifacts': ['rf_model.pkl', 'gb_model.pkl'], 'gb_input': 'imputed'}}
+    }
+    s3.put_object(Bucket=bucket, Key='models/serving.json', Body=json.dumps(serving))
+
+
+def build_cases(aws, seed):
+    """name -> setup(n) returning a zero-argument callable that processes one n-event history"""
+    mood = load_lambda('extractMoodFeatures')
+    behavioral = load_lambda('extractBehavioralFeatures')
+    sentiment = load_lambda('extractSentimentFeatures')
+    risk = load_lambda('calculateRiskScore')
+
+    def mood_features(history):
+        mood.get_user_moods = lambda user_id, days=30: history['moods']
+        return mood.extract_mood_features('bench_user')
+
+    def behavioral_features(history):
+        behavioral.get_user_interactions = lambda user_id, days=30: history['interactions']
+        return behavioral.extract_behavioral_features('bench_user')
+
+    def sentiment_features(history):
+        sentiment.get_user_messages = lambda user_id, days=30: history['messages']
+        sentiment.analyze_sentiment_batch = lambda messages: history['sentiments']
+        return sentiment.extract_sentiment_features('bench_user')
+
+    extractors = {'mood_features': mood_features, 'behavioral_features': behavioral_features,
+               'sentiment_features': sentiment_features}
+    feature_names, _ = feature_rows(extractors, 1, seed)
+    publish_models(aws, feature_names, seed)
+    with redirect_stdout(io.StringIO()):
+        manifest = risk.load_serving_manifest()
+        rf_model, gb_model = risk.load_ml_models()
+
+    def over_history(fn):
+        def setup(n):
+            history = build_history(n, seed)
+            return lambda: fn(history)
+        return setup
+
+    def rule_based_risk(n):
+        rows = feature_rows(extractors, n, seed)[1]
+        return lambda: [risk.calculate_rule_based_risk(features) for features in rows]
+
+    def realtime_message(n):
+        messages = [m['text'] for m in build_history(n, seed)['messages']]
+        return lambda: [risk.analyze_realtime_message('bench_user', message) for message in messages]
+
+    def model_inference(n):
+        rows = feature_rows(extractors, n, seed)[1]
+
+        def run():
+            X = np.vstack([risk.prepare_feature_vector(features, manifest) for features in rows])
+            return (rf_model.predict_proba(X)[:, 1] + gb_model.predict_proba(X)[:, 1]) / 2
+        return run
+
+    return {
+        'extract_mood_features': over_history(mood_features),
+        'extract_behavioral_features': over_history(behavioral_features),
+        'sentiment_aggregations': over_history(sentiment_features),
+        'calculate_rule_based_risk': rule_based_risk,
+        'analyze_realtime_message': realtime_message,
+        'model_inference': model_inference,
+    }
+
+
+def measure(fn, min_time, rounds):
+    """Best-of-rounds ops/sec (each round runs for at least min_time) and peak traced KiB of one call"""
+    fn()  # warm caches and lazy imports
+    best = 0.0
+    for _ in range(rounds):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, calls / elapsed)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 1024
+
+
+def run(args, only=None):
+    """Benchmark every selected case; only= limits the run to these result keys"""
+    aws = FakeAWS().install()
+    try:
+        with redirect_stdout(io.StringIO()):
+            cases = build_cases(aws, args.seed)
+        results = {}
+        for name, setup in cases.items():
+            if args.k and args.k not in name:
+                continue
+            for n in args.sizes:
+                if only is not None and f'{name}[{n}]' not in only:
+                    continue
+                fn = setup(n)
+                with redirect_stdout(open(os.devnull, 'w')):
+                    ops, peak_kib = measure(fn, args.min_time, args.rounds)
+                key = f'{name}[{n}]'
+                results[key] = {'ops_per_sec': round(ops, 2), 'events_per_sec': round(ops * n, 1),
+                                'peak_kib': round(peak_kib, 1)}
+                print(f"{key:<42}{ops:>12.1f} ops/s{ops * n:>14.0f} ev/s{peak_kib:>12.1f} KiB")
+        return results
+    finally:
+        aws.uninstall()
+
+
+def compare(results, baseline, speed_tolerance, memory_tolerance):
+    """Cases slower or heavier than the baseline allows: [(key, reason)]"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        floor = base['ops_per_sec'] * (1 - speed_tolerance)
+        if result['ops_per_sec'] < floor:
+            regressions.append((key, f"{result['ops_per_sec']:.1f} ops/s < {floor:.1f} "
+                                     f"(baseline {base['ops_per_sec']:.1f})"))
+        # Small absolute allowance so tiny cases don't flap on interpreter noise
+        ceiling = base['peak_kib'] * (1 + memory_tolerance) + 16
+        if result['peak_kib'] > ceiling:
+            regressions.append((key, f"{result['peak_kib']:.1f} KiB > {ceiling:.1f} "
+                                     f"(baseline {base['peak_kib']:.1f})"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark feature extraction and risk scoring')
+    parser.add_argument('--sizes', type=lambda s: [int(x) for x in s.split(',')], default=SIZES,
+                        help='Comma-separated history sizes')
+    parser.add_argument('-k', help='Only run cases whose name contains this string')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per timing round')
+    parser.add_argument('--rounds', type=int, default=5, help='Timing rounds per case (best is kept)')
+    parser.add_argument('--speed-tolerance', type=float, default=0.3,
+                        help='Allowed ops/sec drop vs baseline (0.3 = 30%%)')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2,
+                        help='Allowed peak allocation growth vs baseline')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='Record this run as the new baseline')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--report', help='Write the JSON results to this path')
+    args = parser.parse_args()
+
+    print(f"{'case':<42}{'ops/sec':>18}{'events/sec':>19}{'peak alloc':>16}")
+    results = run(args)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Report written to {args.report}")
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f).get('cases', {})
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'recorded': datetime.utcnow().isoformat() + 'Z', 'cases': baseline}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline recorded; run with --update-baseline")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('python') != platform.python_version():
+        print(f"⚠️ Baseline was recorded on Python {baseline.get('python')}, running {platform.python_version()}")
+    regressions = compare(results, baseline.get('cases', {}), args.speed_tolerance, args.memory_tolerance)
+    if regressions:
+        # Re-measure before failing: a single slow round on a busy machine is not a regression
+        print(f"\nRe-running {len({key for key, _ in regressions})} regressed case(s) to confirm")
+        rerun = run(args, only={key for key, _ in regressions})
+        regressions = compare(rerun, baseline.get('cases', {}), args.speed_tolerance, args.memory_tolerance)
+    for key, reason in regressions:
+        print(f"❌ {key}: {reason}")
+    if regressions:
+        return 1
+    print(f"✅ No regressions against {os.path.relpath(args.baseline, ROOT)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Cold-start import profile of every Lambda handler.
+
+Each handler's lambda_function.py is imported in a fresh interpreter, laid out
+like its deployment package (the Lambda directory, then backend/lambdas/shared,
+on sys.path). The run reports init time, the median of several processes, plus
+the modules the handler imports directly, ranked by cumulative import cost
+(python -X importtime). A module is charged to the first import that loads it.
+
+Init times are compared with bench/import_baseline.json; the run exits
+non-zero when a handler's init gets slower than the tolerance allows.
+
+Usage:
+  python3 test/bench/imports.py
+  python3 test/bench/imports.py -k chat --top 10 --report imports.json
+  python3 test/bench/imports.py --update-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+LAMBDAS_DIR = os.path.join(ROOT, 'backend', 'lambdas')
+SHARED_DIR = os.path.join(LAMBDAS_DIR, 'shared')
+BASELINE = os.path.join(HERE, 'import_baseline.json')
+MARKER = '-- handler import --'
+
+# Only sys and time are loaded before the clock starts; both are built in
+PROBE = f"""
+import sys, time
+sys.path[:0] = [{{lambda_dir!r}}, {SHARED_DIR!r}]
+sys.stderr.write({MARKER!r} + '\\n')
+start = time.perf_counter()
+import lambda_function
+sys.stdout.write('%.3f\\n' % ((time.perf_counter() - start) * 1000))
+"""
+
+
+def handlers():
+    return sorted(name for name in os.listdir(LAMBDAS_DIR)
+                  if os.path.exists(os.path.join(LAMBDAS_DIR, name, 'lambda_function.py')))
+
+
+def parse_importtime(stderr):
+    """Modules imported directly by lambda_function: {name: cumulative ms}, plus its own self ms"""
+    modules, own = {}, 0.0
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    for line in lines:
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        if not self_us.strip().isdigit():
+            continue  # column header
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        name = name.strip()
+        if depth == 0 and name == 'lambda_function':
+            own = int(self_us) / 1000
+        elif depth == 1:
+            modules[name] = int(cumulative_us) / 1000
+    return modules, own
+
+
+def profile_once(name):
+    """(init ms, direct imports, own ms) for one fresh import of a handler"""
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+               PYTHONDONTWRITEBYTECODE='1')
+    lambda_dir = os.path.join(LAMBDAS_DIR, name)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE.format(lambda_dir=lambda_dir)],
+                          cwd=lambda_dir, env=env, capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f'exit {proc.returncode}'
+        raise RuntimeError(error)
+    modules, own = parse_importtime(proc.stderr)
+    return float(proc.stdout.strip().splitlines()[-1]), modules, own
+
+
+def run(args, only=None):
+    """Profile every selected handler: {name: {'init_ms', 'modules', 'own_ms'} or {'error'}}"""
+    results = {}
+    for name in handlers():
+        if (args.k and args.k not in name) or (only is not None and name not in only):
+            continue
+        try:
+            runs = sorted((profile_once(name) for _ in range(args.rounds)), key=lambda r: r[0])
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            results[name] = {'error': str(e)}
+            print(f"{name:<28}{'error':>12}   {e}")
+            continue
+        init_ms, modules, own = runs[len(runs) // 2]
+        top = sorted(modules.items(), key=lambda item: -item[1])[:args.top]
+        results[name] = {
+            'init_ms': round(statistics.median(r[0] for r in runs), 1),
+            'own_ms': round(own, 1),
+            'modules': {module: round(ms, 1) for module, ms in top}
+        }
+        print(f"{name:<28}{results[name]['init_ms']:>9.1f} ms")
+        for module, ms in top:
+            print(f"    {module:<36}{ms:>9.1f} ms")
+    return results
+
+
+def compare(results, baseline, tolerance, allowance):
+    """Handlers whose init is slower than the baseline allows: [(name, reason)]"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or 'init_ms' not in result or 'init_ms' not in base:
+            continue
+        # Absolute allowance so small handlers don't flap on process start noise
+        ceiling = base['init_ms'] * (1 + tolerance) + allowance
+        if result['init_ms'] > ceiling:
+            regressions.append((name, f"{result['init_ms']:.1f} ms > {ceiling:.1f} "
+                                      f"(baseline {base['init_ms']:.1f})"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile Lambda handler cold-start imports')
+    parser.add_argument('-k', help='Only profile handlers whose name contains this string')
+    parser.add_argument('--rounds', type=int, default=5, help='Fresh processes per handler (median is kept)')
+    parser.add_argument('--top', type=int, default=5, help='Direct imports listed per handler')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='Allowed init time growth vs baseline (0.3 = 30%%)')
+    parser.add_argument('--allowance', type=float, default=10.0, help='Extra ms allowed on top of the tolerance')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='Record this run as the new baseline')
+    parser.add_argument('--report', help='Write the JSON results to this path')
+    args = parser.parse_args()
+
+    print(f"{'handler':<28}{'init':>12}")
+    results = run(args)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Report written to {args.report}")
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f).get('handlers', {})
+        baseline.update({name: {'init_ms': r['init_ms']} for name, r in results.items() if 'init_ms' in r})
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'recorded': datetime.utcnow().isoformat() + 'Z', 'handlers': baseline}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline recorded; run with --update-baseline")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('python') != platform.python_version():
+        print(f"⚠️ Baseline was recorded on Python {baseline.get('python')}, running {platform.python_version()}")
+    regressions = compare(results, baseline.get('handlers', {}), args.tolerance, args.allowance)
+    if regressions:
+        # Re-measure before failing: one slow batch of processes on a busy machine is not a regression
+        print(f"\nRe-running {len(regressions)} regressed handler(s) to confirm")
+        rerun = run(args, only={name for name, _ in regressions})
+        regressions = compare(rerun, baseline.get('handlers', {}), args.tolerance, args.allowance)
+    for name, reason in regressions:
+        print(f"❌ {name}: {reason}")
+    if regressions:
+        return 1
+    print(f"✅ No regressions against {os.path.relpath(args.baseline, ROOT)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
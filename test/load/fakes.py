@@ -0,0 +1,915 @@
+"""
+In-process stand-ins for the AWS services the Lambdas use, for load testing
+on a laptop.
+
+- InMemoryTable: DynamoDB table with hash/range keys, key conditions
+  (=, <, <=, >, >=, BETWEEN, begins_with), filter expressions, 1 MB
+  pagination (Limit / ExclusiveStartKey / LastEvaluatedKey), GSIs,
+  projections, Select='COUNT', update expressions, condition expressions,
+  transactional puts (table.meta.client.transact_write_items), and the real
+  client's Decimal-only number rule.
+- Stub Bedrock (including response streams), Bedrock Agent, Comprehend,
+  Rekognition, S3, the WebSocket management API and a generic stub for
+  everything else, each with a configurable latency.
+
+Every call is counted against the request running on the current thread
+(see RequestStats), so the harness can report reads per request.
+"""
+
+import copy
+import io
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from contextlib import ExitStack
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.conditions import ConditionBase
+from botocore.exceptions import ClientError
+
+# Key schemas of the tables in infrastructure/ (unknown tables default to PK/SK)
+TABLE_SCHEMAS = {
+    'EmoCompanion': {'hash': 'PK', 'range': 'SK'},
+    'MindMate-RiskAssessments': {'hash': 'userId', 'range': 'timestamp'},
+    'MindMate-TrainingJobs': {'hash': 'jobId', 'range': None},
+    'MindMate-EmotionCache': {'hash': 'cacheKey', 'range': None},
+    'MindMate-Interventions': {
+        'hash': 'interventionId', 'range': None,
+        'indexes': {'UserInterventionsIndex': {'hash': 'userId', 'range': 'timestamp'}}
+    },
+}
+
+PAGE_BYTES = 1024 * 1024
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+
+_current = threading.local()
+
+
+class RequestStats:
+    """Counters for one handler invocation (bound to the invoking thread and threads it starts)"""
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, amount=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def __enter__(self):
+        _current.stats = self
+        return self
+
+    def __exit__(self, *exc):
+        _current.stats = None
+
+
+class _StatsThread(threading.Thread):
+    """Thread that counts its calls against the request that started it (e.g. background writes)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats = getattr(_current, 'stats', None)
+
+    def run(self):
+        _current.stats = self._stats
+        super().run()
+
+
+def record(name, amount=1):
+    stats = getattr(_current, 'stats', None)
+    if stats is not None:
+        stats.add(name, amount)
+
+
+def client_error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+def item_size(value):
+    """Approximate DynamoDB item size in bytes (names + values)"""
+    if isinstance(value, dict):
+        return sum(len(k) + item_size(v) for k, v in value.items()) + 3
+    if isinstance(value, (list, tuple, set)):
+        return sum(item_size(v) for v in value) + 3
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (Decimal, int)):
+        return 21
+    return len(str(value).encode('utf-8'))
+
+
+def check_types(value, path='Item'):
+    """Reject floats like the real DynamoDB resource does"""
+    if isinstance(value, float):
+        raise TypeError('Float types are not supported. Use Decimal types instead.')
+    if isinstance(value, dict):
+        for k, v in value.items():
+            check_types(v, f'{path}.{k}')
+    elif isinstance(value, (list, tuple, set)):
+        for v in value:
+            check_types(v, path)
+
+
+# ---------------------------------------------------------------------------
+# Expressions
+# ---------------------------------------------------------------------------
+
+_CLAUSE = re.compile(
+    r'\s*(?:'
+    r'(?P<fn>begins_with|contains|attribute_exists|attribute_not_exists)\(\s*(?P<fa>[#\w.]+)\s*(?:,\s*(?P<fv>:\w+))?\s*\)'
+    r'|(?P<ba>[#\w.]+)\s+BETWEEN\s+(?P<lo>:\w+)\s+AND\s+(?P<hi>:\w+)'
+    r'|(?P<ca>[#\w.]+)\s*(?P<op><>|<=|>=|=|<|>)\s*(?P<cv>:\w+)'
+    r')\s*(?:AND\s+|$)',
+    re.IGNORECASE
+)
+
+
+def parse_condition(expression, names=None, values=None):
+    """Turn a condition (string or boto3 Key/Attr object) into (attribute, operator, operands) clauses.
+
+    Supports comparisons, BETWEEN, begins_with, contains and
+    attribute_(not_)exists joined by AND and OR (without parentheses), which
+    is what the Lambdas use. An OR becomes one (None, 'or', [clauses, ...]) clause.
+    """
+    names = names or {}
+    values = values or {}
+    if expression is None:
+        return []
+    if isinstance(expression, ConditionBase):
+        return _parse_condition_object(expression)
+
+    # AND binds tighter than OR, so split on OR first
+    alternatives = re.split(r'\s+OR\s+', expression, flags=re.IGNORECASE)
+    if len(alternatives) > 1:
+        return [(None, 'or', [parse_condition(part, names, values) for part in alternatives])]
+
+    clauses = []
+    pos = 0
+    while pos < len(expression):
+        match = _CLAUSE.match(expression, pos)
+        if not match or match.end() == pos:
+            raise NotImplementedError(f"Unsupported expression in load-test table: {expression[pos:]!r}")
+        pos = match.end()
+        if match.group('fn'):
+            operands = [values[match.group('fv')]] if match.group('fv') else []
+            clauses.append((names.get(match.group('fa'), match.group('fa')), match.group('fn').lower(), operands))
+        elif match.group('ba'):
+            clauses.append((names.get(match.group('ba'), match.group('ba')), 'between',
+                            [values[match.group('lo')], values[match.group('hi')]]))
+        else:
+            clauses.append((names.get(match.group('ca'), match.group('ca')), match.group('op'), [values[match.group('cv')]]))
+    return clauses
+
+
+def _parse_condition_object(condition):
+    expression = condition.get_expression()
+    operator = expression['operator']
+    if operator == 'AND':
+        return [clause for part in expression['values'] for clause in _parse_condition_object(part)]
+    if operator == 'OR':
+        return [(None, 'or', [_parse_condition_object(part) for part in expression['values']])]
+    attribute, *operands = expression['values']
+    operator = {'BETWEEN': 'between'}.get(operator, operator)
+    if operator not in ('=', '<>', '<', '<=', '>', '>=', 'between', 'begins_with', 'contains',
+                        'attribute_exists', 'attribute_not_exists'):
+        raise NotImplementedError(f"Unsupported condition operator in load-test table: {operator}")
+    return [(attribute.name, operator, list(operands))]
+
+
+def matches(item, clauses):
+    for attribute, operator, operands in clauses:
+        present = item is not None and attribute in item
+        if operator == 'or':
+            ok = any(matches(item, alternative) for alternative in operands)
+        elif operator == 'attribute_exists':
+            ok = present
+        elif operator == 'attribute_not_exists':
+            ok = not present
+        elif not present:
+            ok = False
+        else:
+            value = item[attribute]
+            try:
+                if operator == '=':
+                    ok = value == operands[0]
+                elif operator == '<>':
+                    ok = value != operands[0]
+                elif operator == '<':
+                    ok = value < operands[0]
+                elif operator == '<=':
+                    ok = value <= operands[0]
+                elif operator == '>':
+                    ok = value > operands[0]
+                elif operator == '>=':
+                    ok = value >= operands[0]
+                elif operator == 'between':
+                    ok = operands[0] <= value <= operands[1]
+                elif operator == 'begins_with':
+                    ok = isinstance(value, str) and value.startswith(operands[0])
+                else:  # contains
+                    ok = operands[0] in value
+            except TypeError:
+                ok = False
+        if not ok:
+            return False
+    return True
+
+
+def project(item, projection, names=None):
+    if not projection:
+        return item
+    names = names or {}
+    fields = [names.get(f.strip(), f.strip()) for f in projection.split(',')]
+    return {f: item[f] for f in fields if f in item}
+
+
+_UPDATE_SECTION = re.compile(r'\b(SET|ADD|REMOVE|DELETE)\b', re.IGNORECASE)
+
+
+def apply_update(item, expression, names=None, values=None):
+    """Apply SET (incl. a + :v and if_not_exists), ADD and REMOVE actions in place"""
+    names = names or {}
+    values = values or {}
+    name = lambda token: names.get(token.strip(), token.strip())
+
+    parts = _UPDATE_SECTION.split(expression)
+    for keyword, body in zip(parts[1::2], parts[2::2]):
+        keyword = keyword.upper()
+        for action in [a for a in re.split(r',(?![^()]*\))', body) if a.strip()]:
+            if keyword == 'SET':
+                target, _, value_expr = action.partition('=')
+                item[name(target)] = _eval_operand(item, value_expr.strip(), name, values)
+            elif keyword == 'ADD':
+                target, operand = action.split()
+                current = item.get(name(target))
+                delta = values[operand]
+                item[name(target)] = (current | delta) if isinstance(delta, set) else (current or 0) + delta
+            elif keyword == 'REMOVE':
+                item.pop(name(action), None)
+            else:
+                raise NotImplementedError(f"Unsupported update action in load-test table: {keyword}")
+
+
+def _eval_operand(item, expr, name, values):
+    depth = 0
+    for i, ch in enumerate(expr):
+        depth += (ch == '(') - (ch == ')')
+        if ch in '+-' and depth == 0 and i > 0:
+            left = _eval_operand(item, expr[:i].strip(), name, values)
+            right = _eval_operand(item, expr[i + 1:].strip(), name, values)
+            return left + right if ch == '+' else left - right
+    match = re.fullmatch(r'if_not_exists\(\s*([#\w.]+)\s*,\s*(:\w+)\s*\)', expr)
+    if match:
+        attribute = name(match.group(1))
+        return item[attribute] if attribute in item else values[match.group(2)]
+    if expr.startswith(':'):
+        return values[expr]
+    return item[name(expr)]
+
+
+# ---------------------------------------------------------------------------
+# DynamoDB
+# ---------------------------------------------------------------------------
+
+class _Index:
+    """Items of one key schema, grouped by hash key and sorted by range key"""
+
+    def __init__(self, hash_key, range_key):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.partitions = {}  # hash value -> (sorted range values, {range value: primary key})
+
+    def put(self, item, primary):
+        if self.hash_key not in item or (self.range_key and self.range_key not in item):
+            return  # sparse index
+        sort_keys, rows = self.partitions.setdefault(item[self.hash_key], ([], {}))
+        range_value = (item[self.range_key], primary) if self.range_key else (None, primary)
+        if range_value not in rows:
+            sort_keys.insert(bisect_left(sort_keys, range_value), range_value)
+        rows[range_value] = primary
+
+    def delete(self, item, primary):
+        if self.hash_key not in item or (self.range_key and self.range_key not in item):
+            return
+        sort_keys, rows = self.partitions.get(item[self.hash_key], ([], {}))
+        range_value = (item[self.range_key], primary) if self.range_key else (None, primary)
+        if rows.pop(range_value, None) is not None:
+            sort_keys.pop(bisect_left(sort_keys, range_value))
+
+
+class InMemoryTable:
+    """Thread-safe DynamoDB Table stand-in (boto3 resource API subset)"""
+
+    def __init__(self, name, hash_key='PK', range_key='SK', indexes=None):
+        self.name = name
+        self.table_name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.items = {}
+        self.base = _Index(hash_key, range_key)
+        self.indexes = {index: _Index(schema['hash'], schema.get('range')) for index, schema in (indexes or {}).items()}
+        self.lock = threading.RLock()
+
+    # -- keys --------------------------------------------------------------
+
+    def _primary(self, key):
+        try:
+            return (key[self.hash_key], key[self.range_key]) if self.range_key else (key[self.hash_key],)
+        except KeyError:
+            raise client_error('ValidationException', 'The provided key element does not match the schema', 'GetItem')
+
+    def _key_of(self, item):
+        key = {self.hash_key: item[self.hash_key]}
+        if self.range_key:
+            key[self.range_key] = item[self.range_key]
+        return key
+
+    def load(self, items):
+        """Bulk-load items without counting them (for seeding)"""
+        with self.lock:
+            for item in items:
+                self._store(item)
+
+    def _store(self, item):
+        primary = self._primary(item)
+        previous = self.items.get(primary)
+        if previous is not None:
+            for index in self.indexes.values():
+                index.delete(previous, primary)
+        self.items[primary] = item
+        self.base.put(item, primary)
+        for index in self.indexes.values():
+            index.put(item, primary)
+
+    def _remove(self, primary):
+        item = self.items.pop(primary, None)
+        if item is not None:
+            self.base.delete(item, primary)
+            for index in self.indexes.values():
+                index.delete(item, primary)
+        return item
+
+    # -- single item operations ---------------------------------------------
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, ConsistentRead=False):
+        record('dynamodb.get_item')
+        with self.lock:
+            item = self.items.get(self._primary(Key))
+            item = copy.deepcopy(item) if item is not None else None
+        record('dynamodb.read_units', math.ceil(item_size(item) / READ_UNIT_BYTES) if item else 1)
+        if item is None:
+            return {}
+        record('dynamodb.items_read')
+        return {'Item': project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                 ReturnValues='NONE'):
+        check_types(Item)
+        record('dynamodb.put_item')
+        record('dynamodb.write_units', math.ceil(item_size(Item) / WRITE_UNIT_BYTES))
+        item = copy.deepcopy(Item)
+        with self.lock:
+            primary = self._primary(item)
+            previous = self.items.get(primary)
+            if ConditionExpression is not None:
+                clauses = parse_condition(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+                if not matches(previous, clauses):
+                    raise client_error('ConditionalCheckFailedException', 'The conditional request failed', 'PutItem')
+            self._store(item)
+        return {'Attributes': copy.deepcopy(previous)} if ReturnValues == 'ALL_OLD' and previous else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                    ConditionExpression=None, ReturnValues='NONE'):
+        check_types(ExpressionAttributeValues or {})
+        record('dynamodb.update_item')
+        with self.lock:
+            primary = self._primary(Key)
+            previous = self.items.get(primary)
+            if ConditionExpression is not None:
+                clauses = parse_condition(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+                if not matches(previous, clauses):
+                    raise client_error('ConditionalCheckFailedException', 'The conditional request failed', 'UpdateItem')
+            item = copy.deepcopy(previous) if previous is not None else dict(Key)
+            apply_update(item, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            self._store(item)
+        record('dynamodb.write_units', math.ceil(item_size(item) / WRITE_UNIT_BYTES))
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': copy.deepcopy(item)}
+        if ReturnValues == 'ALL_OLD' and previous:
+            return {'Attributes': copy.deepcopy(previous)}
+        return {}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None):
+        record('dynamodb.delete_item')
+        record('dynamodb.write_units')
+        with self.lock:
+            primary = self._primary(Key)
+            if ConditionExpression is not None:
+                clauses = parse_condition(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+                if not matches(self.items.get(primary), clauses):
+                    raise client_error('ConditionalCheckFailedException', 'The conditional request failed', 'DeleteItem')
+            self._remove(primary)
+        return {}
+
+    # -- query / scan --------------------------------------------------------
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues=None, ExpressionAttributeNames=None,
+              IndexName=None, FilterExpression=None, ProjectionExpression=None, Limit=None,
+              ScanIndexForward=True, ExclusiveStartKey=None, Select=None, ConsistentRead=False):
+        record('dynamodb.query')
+        index = self.indexes[IndexName] if IndexName else self.base
+        clauses = parse_condition(KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        hash_clause = [c for c in clauses if c[0] == index.hash_key and c[1] == '=']
+        if not hash_clause:
+            raise client_error('ValidationException', 'Query condition missed key schema element', 'Query')
+        range_clauses = [c for c in clauses if c is not hash_clause[0]]
+        filters = parse_condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+
+        with self.lock:
+            sort_keys, rows = index.partitions.get(hash_clause[0][2][0], ([], {}))
+            lo, hi = 0, len(sort_keys)
+            for attribute, operator, operands in range_clauses:
+                if attribute != index.range_key:
+                    raise client_error('ValidationException', f'Query key condition not supported: {attribute}', 'Query')
+                lo, hi = _narrow(sort_keys, lo, hi, operator, operands)
+            candidates = [rows[k] for k in (sort_keys[lo:hi] if ScanIndexForward else reversed(sort_keys[lo:hi]))]
+
+            if ExclusiveStartKey:
+                start = self._primary(ExclusiveStartKey)
+                position = next((i for i, primary in enumerate(candidates) if primary == start), None)
+                candidates = candidates[position + 1:] if position is not None else candidates
+            return self._page(candidates, filters, ProjectionExpression, ExpressionAttributeNames, Limit, Select, index)
+
+    def scan(self, FilterExpression=None, ExpressionAttributeValues=None, ExpressionAttributeNames=None,
+             ProjectionExpression=None, Limit=None, ExclusiveStartKey=None, Select=None, IndexName=None):
+        record('dynamodb.scan')
+        filters = parse_condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        with self.lock:
+            candidates = list(self.items)
+            if ExclusiveStartKey:
+                start = self._primary(ExclusiveStartKey)
+                candidates = candidates[candidates.index(start) + 1:] if start in self.items else candidates
+            return self._page(candidates, filters, ProjectionExpression, ExpressionAttributeNames, Limit, Select, self.base)
+
+    def _page(self, candidates, filters, projection, names, limit, select, index):
+        """Evaluate candidates up to Limit items or 1 MB, like a DynamoDB page"""
+        matched, scanned, size = [], 0, 0
+        last = None
+        for primary in candidates:
+            if (limit is not None and scanned >= limit) or size >= PAGE_BYTES:
+                break
+            item = self.items[primary]
+            scanned += 1
+            size += item_size(item)
+            last = item
+            if matches(item, filters):
+                matched.append(item)
+        record('dynamodb.items_read', scanned)
+        record('dynamodb.read_units', max(1, math.ceil(size / READ_UNIT_BYTES)))
+
+        response = {'Count': len(matched), 'ScannedCount': scanned}
+        if select != 'COUNT':
+            response['Items'] = [project(copy.deepcopy(item), projection, names) for item in matched]
+        more = scanned < len(candidates) or (limit is not None and scanned == limit)
+        if last is not None and more:
+            key = self._key_of(last)
+            if index is not self.base:
+                key[index.hash_key] = last[index.hash_key]
+                if index.range_key:
+                    key[index.range_key] = last[index.range_key]
+            response['LastEvaluatedKey'] = key
+        return response
+
+    # -- batching ----------------------------------------------------------
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _BatchWriter(self, overwrite_by_pkeys)
+
+
+def _narrow(sort_keys, lo, hi, operator, operands):
+    """Narrow [lo, hi) of a sorted (range value, primary) list by a range-key condition"""
+    first = lambda value: bisect_left(sort_keys, (value,), lo, hi)
+    after = lambda value: bisect_right(sort_keys, (value, (chr(0x10FFFF),) * 2), lo, hi)
+    if operator == '=':
+        return first(operands[0]), after(operands[0])
+    if operator == '<':
+        return lo, first(operands[0])
+    if operator == '<=':
+        return lo, after(operands[0])
+    if operator == '>':
+        return after(operands[0]), hi
+    if operator == '>=':
+        return first(operands[0]), hi
+    if operator == 'between':
+        return first(operands[0]), after(operands[1])
+    if operator == 'begins_with':
+        prefix = operands[0]
+        return first(prefix), first(prefix + chr(0x10FFFF))
+    raise client_error('ValidationException', f'Unsupported key condition operator: {operator}', 'Query')
+
+
+class _BatchWriter:
+    def __init__(self, table, overwrite_by_pkeys=None):
+        self.table = table
+        self.pending = 0
+
+    def put_item(self, Item):
+        self.pending += 1
+        self.table.put_item(Item=Item)
+        self._flush_if_full()
+
+    def delete_item(self, Key):
+        self.pending += 1
+        self.table.delete_item(Key=Key)
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if self.pending == 25:
+            record('dynamodb.batch_write_item')
+            self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.pending:
+            record('dynamodb.batch_write_item')
+        return False
+
+
+class FakeDynamoDBResource:
+    """boto3.resource('dynamodb') stand-in backed by InMemoryTable objects"""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def Table(self, name):
+        return self.registry.table(name)
+
+    def batch_get_item(self, RequestItems):
+        record('dynamodb.batch_get_item')
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.registry.table(name)
+            found = []
+            for key in request['Keys']:
+                with table.lock:
+                    item = table.items.get(table._primary(key))
+                if item is not None:
+                    record('dynamodb.items_read')
+                    found.append(project(copy.deepcopy(item), request.get('ProjectionExpression'),
+                                         request.get('ExpressionAttributeNames')))
+            responses[name] = found
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+
+class FakeDynamoDBClient:
+    """Low-level client behind table.meta.client (Python types, like the resource's own client)"""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def transact_write_items(self, TransactItems):
+        record('dynamodb.transact_write_items')
+        puts = []
+        for entry in TransactItems:
+            if set(entry) != {'Put'}:
+                raise NotImplementedError(f"No load-test fake for transaction action {next(iter(entry))}")
+            check_types(entry['Put']['Item'])
+            puts.append((self.registry.table(entry['Put']['TableName']), entry['Put']))
+
+        with ExitStack() as stack:
+            for table in sorted({table.name: table for table, _ in puts}.values(), key=lambda t: t.name):
+                stack.enter_context(table.lock)
+            reasons = []
+            for table, put in puts:
+                previous = table.items.get(table._primary(put['Item']))
+                condition = put.get('ConditionExpression')
+                ok = condition is None or matches(previous, parse_condition(
+                    condition, put.get('ExpressionAttributeNames'), put.get('ExpressionAttributeValues')))
+                reasons.append({'Code': 'None' if ok else 'ConditionalCheckFailed'})
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise ClientError({
+                    'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                    'CancellationReasons': reasons
+                }, 'TransactWriteItems')
+            for table, put in puts:
+                table._store(copy.deepcopy(put['Item']))
+                # Transactional writes cost two write units per KB
+                record('dynamodb.write_units', 2 * math.ceil(item_size(put['Item']) / WRITE_UNIT_BYTES))
+        return {}
+
+
+class TableRegistry:
+    """All in-memory tables of a run, created on first use with their known key schema"""
+
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.client = FakeDynamoDBClient(self)
+
+    def table(self, name):
+        with self.lock:
+            if name not in self.tables:
+                schema = TABLE_SCHEMAS.get(name, {'hash': 'PK', 'range': 'SK'})
+                table = InMemoryTable(name, schema['hash'], schema.get('range'), schema.get('indexes'))
+                table.meta = type('Meta', (), {'client': self.client})()
+                self.tables[name] = table
+            return self.tables[name]
+
+
+# ---------------------------------------------------------------------------
+# Service stubs
+# ---------------------------------------------------------------------------
+
+class Latency:
+    """Per-service latency in seconds, +/-20% jitter"""
+
+    def __init__(self, settings=None):
+        self.settings = settings or {}
+
+    def seconds(self, service):
+        return self.settings.get(service, 0) * random.uniform(0.8, 1.2)
+
+    def wait(self, service):
+        seconds = self.seconds(service)
+        if seconds:
+            time.sleep(seconds)
+
+
+# Bedrock replies chosen by a marker in the request body (first match wins)
+BEDROCK_REPLIES = [
+    ('primary_emotion', json.dumps({
+        'primary_emotion': 'stressed', 'sentiment': 'negative', 'risk_indicators': ['low_mood'],
+        'confidence': 80, 'explanation': 'Load-test stub analysis'
+    })),
+    ('"activity"', json.dumps([
+        {'activity': 'Take 5 deep breaths', 'duration': '2 min', 'reason': 'Helps calm your mind'},
+        {'activity': 'Step outside for fresh air', 'duration': '5 min', 'reason': 'Nature can lift your mood'}
+    ])),
+]
+BEDROCK_DEFAULT_REPLY = ("I hear you, and it makes sense to feel that way. "
+                         "Would you like to talk a bit more about what happened today?")
+TINY_PNG_BASE64 = ('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+class StubClient:
+    """Generic client: records calls, waits the service latency, returns an empty response"""
+
+    def __init__(self, service, latency):
+        self.service = service
+        self.latency = latency
+
+    def _call(self, operation):
+        record(f'{self.service}.{operation}')
+        self.latency.wait(self.service)
+
+    def __getattr__(self, operation):
+        if operation.startswith('_'):
+            raise AttributeError(operation)
+
+        def call(*args, **kwargs):
+            self._call(operation)
+            return {}
+        return call
+
+
+class StubBedrockRuntime(StubClient):
+    # Share of the service latency spent before the first streamed token
+    FIRST_TOKEN_SHARE = 0.15
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self._call('invoke_model')
+        request = body if isinstance(body, str) else body.decode('utf-8')
+        if modelId.startswith('amazon.titan-image'):
+            payload = {'images': [TINY_PNG_BASE64]}
+        else:
+            text = self._reply(request)
+            payload = {
+                'content': [{'type': 'text', 'text': text}],
+                'usage': {'input_tokens': len(request) // 4, 'output_tokens': len(text) // 4}
+            }
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8')), 'contentType': 'application/json'}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        """Anthropic messages event stream: the reply arrives as word deltas spread over the service latency"""
+        record(f'{self.service}.invoke_model_with_response_stream')
+        request = body if isinstance(body, str) else body.decode('utf-8')
+        text = self._reply(request)
+        words = text.split(' ')
+        deltas = [word + ' ' for word in words[:-1]] + [words[-1]]
+        total = self.latency.seconds(self.service)
+        first, step = total * self.FIRST_TOKEN_SHARE, total * (1 - self.FIRST_TOKEN_SHARE) / len(deltas)
+
+        def events():
+            time.sleep(first)
+            yield {'chunk': {'bytes': json.dumps({'type': 'message_start', 'message': {
+                'usage': {'input_tokens': len(request) // 4, 'output_tokens': 0}}}).encode('utf-8')}}
+            for delta in deltas:
+                yield {'chunk': {'bytes': json.dumps({'type': 'content_block_delta', 'index': 0, 'delta': {
+                    'type': 'text_delta', 'text': delta}}).encode('utf-8')}}
+                time.sleep(step)
+            yield {'chunk': {'bytes': json.dumps({'type': 'message_stop', 'amazon-bedrock-invocationMetrics': {
+                'inputTokenCount': len(request) // 4, 'outputTokenCount': len(text) // 4,
+                'invocationLatency': int(total * 1000), 'firstByteLatency': int(first * 1000)}}).encode('utf-8')}}
+        return {'body': events(), 'contentType': 'application/json'}
+
+    @staticmethod
+    def _reply(request):
+        batch = StubBedrockRuntime._batch_items(request)
+        if batch is not None:
+            # Indexed batch analysis: one stub result per {"i": n} item
+            result = json.loads(BEDROCK_REPLIES[0][1])
+            return json.dumps({'results': [dict(result, i=item['i']) for item in batch]})
+        return next((reply for marker, reply in BEDROCK_REPLIES if marker in request), BEDROCK_DEFAULT_REPLY)
+
+    @staticmethod
+    def _batch_items(request):
+        """The [{"i", "text"}] items when the user turn is an indexed batch, else None"""
+        try:
+            content = json.loads(request)['messages'][-1]['content']
+            items = json.loads(content) if isinstance(content, str) else None
+        except (ValueError, KeyError, IndexError, TypeError):
+            return None
+        if isinstance(items, list) and items and all(isinstance(item, dict) and 'i' in item for item in items):
+            return items
+        return None
+
+
+class StubBedrockAgentRuntime(StubClient):
+    # Share of the service latency spent orchestrating (action groups) before the first chunk
+    FIRST_CHUNK_SHARE = 0.6
+
+    def invoke_agent(self, agentId, agentAliasId, sessionId, inputText, enableTrace=False, **kwargs):
+        record(f'{self.service}.invoke_agent')
+        words = BEDROCK_DEFAULT_REPLY.split(' ')
+        pieces = [' '.join(words[i:i + 4]) + ' ' for i in range(0, len(words), 4)]
+        total = self.latency.seconds(self.service)
+        first, step = total * self.FIRST_CHUNK_SHARE, total * (1 - self.FIRST_CHUNK_SHARE) / len(pieces)
+
+        def events():
+            if enableTrace:
+                yield {'trace': {'agentId': agentId, 'sessionId': sessionId, 'trace': {'orchestrationTrace': {
+                    'invocationInput': {'invocationType': 'ACTION_GROUP', 'actionGroupInvocationInput': {
+                        'actionGroupName': 'WellnessTools', 'function': 'getMoodHistory'}}}}}}
+            time.sleep(first)
+            if enableTrace:
+                yield {'trace': {'agentId': agentId, 'sessionId': sessionId, 'trace': {'orchestrationTrace': {
+                    'observation': {'type': 'FINISH'}}}}}
+            for piece in pieces:
+                yield {'chunk': {'bytes': piece.encode('utf-8')}}
+                time.sleep(step)
+        return {'sessionId': sessionId, 'completion': events()}
+
+
+class StubComprehend(StubClient):
+    def _sentiment(self, text):
+        negative = sum(word in text.lower() for word in ('sad', 'hopeless', 'alone', 'tired', 'stressed', 'worthless'))
+        score = min(0.9, 0.2 + 0.2 * negative)
+        return {
+            'Sentiment': 'NEGATIVE' if negative else 'POSITIVE',
+            'SentimentScore': {'Positive': 1 - score, 'Negative': score, 'Neutral': 0.0, 'Mixed': 0.0}
+        }
+
+    def detect_sentiment(self, Text, LanguageCode='en'):
+        self._call('detect_sentiment')
+        return self._sentiment(Text)
+
+    def batch_detect_sentiment(self, TextList, LanguageCode='en'):
+        self._call('batch_detect_sentiment')
+        return {'ResultList': [dict(self._sentiment(t), Index=i) for i, t in enumerate(TextList)], 'ErrorList': []}
+
+
+class StubRekognition(StubClient):
+    def detect_faces(self, Image, Attributes=None):
+        self._call('detect_faces')
+        return {'FaceDetails': [{
+            'Confidence': 99.0,
+            'Emotions': [{'Type': 'CALM', 'Confidence': 70.0}, {'Type': 'HAPPY', 'Confidence': 20.0}],
+            'AgeRange': {'Low': 25, 'High': 35},
+            'Smile': {'Value': False, 'Confidence': 90.0}
+        }]}
+
+
+class StubS3(StubClient):
+    """S3 with an in-memory object store"""
+
+    def __init__(self, service, latency):
+        super().__init__(service, latency)
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        self._call('put_object')
+        self.objects[(Bucket, Key)] = Body.encode('utf-8') if isinstance(Body, str) else bytes(Body)
+        return {'ETag': '"stub"'}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._call('get_object')
+        if (Bucket, Key) not in self.objects:
+            raise client_error('NoSuchKey', 'The specified key does not exist.', 'GetObject')
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        body = self.get_object(Bucket, Key)['Body'].read()
+        with open(Filename, 'wb') as f:
+            f.write(body)
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket, Key, f.read())
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        return f"https://stub-s3.local/{(Params or {}).get('Bucket')}/{(Params or {}).get('Key')}"
+
+
+class StubApiGatewayManagement(StubClient):
+    """WebSocket connection API: frames posted to each connection are kept for inspection"""
+
+    class exceptions:
+        class GoneException(ClientError):
+            pass
+
+    def __init__(self, service, latency):
+        super().__init__(service, latency)
+        self.frames = {}
+        self.lock = threading.Lock()
+
+    def post_to_connection(self, ConnectionId, Data):
+        self._call('post_to_connection')
+        with self.lock:
+            self.frames.setdefault(ConnectionId, []).append(Data if isinstance(Data, bytes) else Data.encode('utf-8'))
+        return {}
+
+
+class StubLambda(StubClient):
+    def invoke(self, FunctionName, Payload=b'{}', **kwargs):
+        self._call('invoke')
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps({'statusCode': 200, 'body': '{}'}).encode('utf-8'))}
+
+
+STUB_CLIENTS = {
+    'bedrock-runtime': StubBedrockRuntime,
+    'bedrock-agent-runtime': StubBedrockAgentRuntime,
+    'comprehend': StubComprehend,
+    'rekognition': StubRekognition,
+    's3': StubS3,
+    'lambda': StubLambda,
+    'apigatewaymanagementapi': StubApiGatewayManagement,
+}
+
+
+class FakeAWS:
+    """Replaces boto3.client/boto3.resource (and Session equivalents) with the fakes above; threads
+    started during a request count against it"""
+
+    def __init__(self, latency=None):
+        self.latency = Latency(latency)
+        self.tables = TableRegistry()
+        self.clients = {}
+        self.lock = threading.Lock()
+        self._originals = None
+
+    def client(self, service, *args, **kwargs):
+        with self.lock:
+            if service not in self.clients:
+                self.clients[service] = STUB_CLIENTS.get(service, StubClient)(service, self.latency)
+            return self.clients[service]
+
+    def resource(self, service, *args, **kwargs):
+        if service != 'dynamodb':
+            raise NotImplementedError(f"No load-test fake for boto3.resource('{service}')")
+        return FakeDynamoDBResource(self.tables)
+
+    def install(self):
+        fake = self
+
+        class FakeSession:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def client(self, service, *args, **kwargs):
+                return fake.client(service)
+
+            def resource(self, service, *args, **kwargs):
+                return fake.resource(service)
+
+        self._originals = (boto3.client, boto3.resource, boto3.session.Session, boto3.Session, threading.Thread)
+        boto3.client = self.client
+        boto3.resource = self.resource
+        boto3.session.Session = boto3.Session = FakeSession
+        threading.Thread = _StatsThread
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+        return self
+
+    def uninstall(self):
+        if self._originals:
+            boto3.client, boto3.resource, boto3.session.Session, boto3.Session, threading.Thread = self._originals
+            self._originals = None
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Local load harness: runs Lambda handlers in-process against an in-memory
+EmoCompanion table and stub AWS clients, replays a request mix at a target
+rate and reports latency percentiles and DynamoDB work per request.
+
+Usage:
+  python3 test/load/harness.py --mix test/load/mixes/default.json --rps 50 --duration 20
+  python3 test/load/harness.py --users 2000 --latency bedrock-runtime=400ms,comprehend=60ms --report load.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+LAMBDAS_DIR = os.path.join(ROOT, 'backend', 'lambdas')
+GENERATOR = os.path.join(ROOT, 'scripts', 'generate-synthetic-data.py')
+
+sys.path.insert(0, HERE)
+# Modules shared between Lambdas are copied into each package at deploy time
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, 'shared'))
+from fakes import FakeAWS, RequestStats  # noqa: E402
+
+REPORTED_COUNTERS = [
+    ('dynamodb.items_read', 'items read'),
+    ('dynamodb.read_units', 'RCU'),
+    ('dynamodb.query', 'queries'),
+    ('dynamodb.get_item', 'gets'),
+    ('dynamodb.scan', 'scans'),
+    ('dynamodb.write_units', 'WCU'),
+]
+
+
+def parse_latency(spec):
+    """'bedrock-runtime=400ms,comprehend=0.05' -> {service: seconds}"""
+    latency = {}
+    for part in filter(None, (spec or '').split(',')):
+        service, _, value = part.partition('=')
+        value = value.strip()
+        seconds = float(value[:-2]) / 1000 if value.endswith('ms') else float(value.rstrip('s'))
+        latency[service.strip()] = seconds
+    return latency
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_handler(name):
+    """Import backend/lambdas/<name>/lambda_function.py under a unique module name"""
+    path = os.path.join(LAMBDAS_DIR, name, 'lambda_function.py')
+    if not os.path.exists(path):
+        raise SystemExit(f"Unknown Lambda in request mix: {name}")
+    with redirect_stdout(open(os.devnull, 'w')):
+        return load_module(f'lambda_{name}', path).lambda_handler
+
+
+def seed_population(aws, users, days, seed):
+    """Fill the EmoCompanion table with a synthetic population from scripts/generate-synthetic-data.py"""
+    generator = load_module('generate_synthetic_data', GENERATOR)
+    table = aws.tables.table('EmoCompanion')
+    end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    start = end - timedelta(days=days)
+    mix = generator.parse_mix(generator.DEFAULT_MIX)
+    user_ids = []
+    items = 0
+    for chunk_index, first in enumerate(range(0, users, 10000)):
+        count = min(10000, users - first)
+        rng = np.random.default_rng([seed, chunk_index])
+        patterns = rng.choice(len(generator.PATTERNS), size=count, p=mix)
+        chunk = generator.generate_chunk(rng, patterns, days, 0.5, 0.1, 0.3)
+        ids = [f'load_user_{i:08d}' for i in range(first, first + count)]
+        batch = generator.build_items(chunk, ids, start)
+        table.load(batch)
+        user_ids.extend(ids)
+        items += len(batch)
+    return user_ids, items
+
+
+def fill(template, values):
+    """Substitute {userId}-style placeholders in every string of a JSON-like template"""
+    if isinstance(template, str):
+        for key, value in values.items():
+            template = template.replace('{' + key + '}', value)
+        return template
+    if isinstance(template, dict):
+        return {k: fill(v, values) for k, v in template.items()}
+    if isinstance(template, list):
+        return [fill(v, values) for v in template]
+    return template
+
+
+def build_event(entry, user_id, request_id):
+    event = fill(entry.get('event', {}), {'userId': user_id, 'requestId': request_id})
+    if isinstance(event.get('body'), (dict, list)):
+        event = dict(event, body=json.dumps(event['body']))  # API Gateway passes the body as a string
+    return event
+
+
+def schedule(mix, total, rng):
+    """Request entries in replay order: weighted sampling, or the recorded order repeated"""
+    requests = mix['requests']
+    if mix.get('order', 'weighted') == 'sequential':
+        return [requests[i % len(requests)] for i in range(total)]
+    weights = [entry.get('weight', 1) for entry in requests]
+    return rng.choices(requests, weights=weights, k=total)
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def invoke(handler, event):
+    """Run one handler call; returns (service ms, ok, counters)"""
+    with RequestStats() as stats:
+        start = time.perf_counter()
+        try:
+            response = handler(event, None)
+            ok = not (isinstance(response, dict) and int(response.get('statusCode', 200)) >= 500)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, ok, stats.counts
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    with open(args.mix) as f:
+        mix = json.load(f)
+
+    aws = FakeAWS(parse_latency(args.latency)).install()
+    user_ids, seeded = seed_population(aws, args.users, args.days, args.seed)
+    print(f"Seeded {seeded} items for {len(user_ids)} users")
+
+    handlers = {name: load_handler(name) for name in sorted({entry['lambda'] for entry in mix['requests']})}
+    total = int(args.rps * args.duration)
+    plan = schedule(mix, total, rng)
+    users = [rng.choice(user_ids) for _ in range(total)]
+
+    results = {name: {'service_ms': [], 'total_ms': [], 'errors': 0, 'counters': {}} for name in handlers}
+    lock = threading.Lock()
+
+    def task(i, entry, user_id, scheduled):
+        event = build_event(entry, user_id, f'load-{i}')
+        service_ms, ok, counters = invoke(handlers[entry['lambda']], event)
+        total_ms = (time.perf_counter() - scheduled) * 1000  # includes time queued behind busy workers
+        with lock:
+            result = results[entry['lambda']]
+            result['service_ms'].append(service_ms)
+            result['total_ms'].append(max(total_ms, service_ms))
+            result['errors'] += 0 if ok else 1
+            for name, value in counters.items():
+                result['counters'][name] = result['counters'].get(name, 0) + value
+
+    print(f"Replaying {total} requests at {args.rps} rps with {args.concurrency} workers "
+          f"({', '.join(f'{k}={v * 1000:.0f}ms' for k, v in aws.latency.settings.items()) or 'no stub latency'})")
+    # Handler logging is silenced for the run (stdout is process-wide, so not per request)
+    with redirect_stdout(open(os.devnull, 'w')), ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        begin = time.perf_counter()
+        futures = []
+        for i, (entry, user_id) in enumerate(zip(plan, users)):
+            # Open loop: requests are released on schedule whether or not earlier ones finished
+            scheduled = begin + i / args.rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(task, i, entry, user_id, scheduled))
+        for future in futures:
+            future.result()
+        wall = time.perf_counter() - begin
+    aws.uninstall()
+
+    report = {
+        'mix': os.path.relpath(args.mix, ROOT),
+        'target_rps': args.rps,
+        'achieved_rps': round(total / wall, 2),
+        'requests': total,
+        'concurrency': args.concurrency,
+        'users': len(user_ids),
+        'latency_settings_ms': {k: v * 1000 for k, v in aws.latency.settings.items()},
+        'lambdas': {}
+    }
+    for name, result in results.items():
+        count = len(result['service_ms'])
+        if not count:
+            continue
+        report['lambdas'][name] = {
+            'requests': count,
+            'errors': result['errors'],
+            'p50_ms': round(percentile(result['service_ms'], 50), 2),
+            'p95_ms': round(percentile(result['service_ms'], 95), 2),
+            'p99_ms': round(percentile(result['service_ms'], 99), 2),
+            'p99_with_queueing_ms': round(percentile(result['total_ms'], 99), 2),
+            'per_request': {k: round(v / count, 2) for k, v in sorted(result['counters'].items())}
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\nAchieved {report['achieved_rps']} rps (target {report['target_rps']}), {report['requests']} requests")
+    header = f"{'Lambda':<28}{'reqs':>6}{'errs':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    header += ''.join(f'{label:>12}' for _, label in REPORTED_COUNTERS)
+    print(header)
+    print('-' * len(header))
+    for name, row in sorted(report['lambdas'].items()):
+        line = f"{name:<28}{row['requests']:>6}{row['errors']:>6}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+        line += ''.join(f"{row['per_request'].get(key, 0):>12.1f}" for key, _ in REPORTED_COUNTERS)
+        print(line)
+    print("\nPer-request counters are averages; see --report for every stub call.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a request mix against in-process Lambda handlers')
+    parser.add_argument('--mix', default=os.path.join(HERE, 'mixes', 'default.json'))
+    parser.add_argument('--rps', type=float, default=20)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of traffic to replay')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent handler invocations')
+    parser.add_argument('--users', type=int, default=500, help='Synthetic users seeded into the table')
+    parser.add_argument('--days', type=int, default=90, help='Days of history per seeded user')
+    parser.add_argument('--latency', default='bedrock-runtime=300ms,bedrock-agent-runtime=800ms,comprehend=50ms,rekognition=150ms',
+                        help='Stub latency per service, e.g. bedrock-runtime=400ms,s3=20ms')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--report', help='Write the JSON report to this path')
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
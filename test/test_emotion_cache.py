@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Emotion cache checks for analyzeEmotions: results Bedrock returns in batch
+mode ({"messages": [...]}) are stored in the in-memory LRU and the
+MindMate-EmotionCache table, so the same message sent on its own is served
+from the cache.
+
+DynamoDB is the load harness's in-memory table and the batch Bedrock call is
+a stub, so no AWS access is needed.
+
+Usage:
+  python3 -m pytest -q test/test_emotion_cache.py
+"""
+
+import importlib.util
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LAMBDAS_DIR = os.path.join(os.path.dirname(HERE), 'backend', 'lambdas')
+# Modules shared between Lambdas are copied into each package at deploy time
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, 'shared'))
+sys.path.insert(0, os.path.join(HERE, 'load'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+from fakes import FakeAWS
+
+MESSAGES = [
+    "I feel hopeless and nothing matters anymore",
+    "everyone would be better off without me",
+]
+EMOTION_DATA = {
+    'primary_emotion': 'hopeless', 'sentiment': 'negative',
+    'risk_indicators': ['hopelessness'], 'confidence': 88, 'explanation': 'stub'
+}
+
+
+@pytest.fixture
+def analyze():
+    fake = FakeAWS().install()
+    spec = importlib.util.spec_from_file_location(
+        'lambda_analyzeEmotions', os.path.join(LAMBDAS_DIR, 'analyzeEmotions', 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.batch_calls = []
+
+    def analyze_batch(chunk):
+        module.batch_calls.append(len(chunk))
+        return {index: dict(EMOTION_DATA) for index, _ in chunk}
+
+    def analyze_single(message):
+        raise AssertionError('cached message reached Bedrock')
+
+    module.analyze_batch_with_bedrock = analyze_batch
+    module.analyze_with_bedrock = analyze_single
+    yield module
+    fake.uninstall()
+
+
+def run_batch(module, messages):
+    with redirect_stdout(open(os.devnull, 'w')):
+        return module.analyze_messages(messages)
+
+
+def test_batch_results_served_from_memory_cache(analyze):
+    results, bedrock_calls = run_batch(analyze, MESSAGES)
+    assert bedrock_calls == 1
+    assert [result['source'] for result in results] == ['bedrock', 'bedrock']
+
+    for message in MESSAGES:
+        emotion_data, source, writer = analyze.get_emotion_data(message)
+        assert source == 'cache-memory'
+        assert emotion_data == EMOTION_DATA
+        assert writer is None
+
+
+def test_batch_results_written_to_cache_table(analyze):
+    run_batch(analyze, MESSAGES)
+    # A cold container only has the table tier
+    analyze._cache.clear()
+    emotion_data, source, _ = analyze.get_emotion_data(MESSAGES[0].upper() + '!')
+    assert source == 'cache-table'
+    assert emotion_data == EMOTION_DATA
+
+
+def test_repeat_batch_skips_bedrock(analyze):
+    run_batch(analyze, MESSAGES)
+    results, bedrock_calls = run_batch(analyze, MESSAGES)
+    assert bedrock_calls == 0
+    assert [result['source'] for result in results] == ['cache-memory', 'cache-memory']
+
+
+def test_truncated_messages_not_cached(analyze):
+    # Normalizes to a short key, but only the first BATCH_MESSAGE_CHARS reach Bedrock
+    message = 'I feel hopeless' + '.' * analyze.BATCH_MESSAGE_CHARS
+    run_batch(analyze, [message])
+    assert len(analyze._cache) == 0
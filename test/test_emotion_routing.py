@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Routing checks for analyzeEmotions' local pre-classifier: crisis, farewell
+and intent messages must reach Bedrock however positive the rest of the
+message sounds; plain check-ins may stay local.
+
+Bedrock and the emotion cache are replaced by in-process stubs, so no AWS
+access is needed.
+
+Usage:
+  python3 -m pytest -q test/test_emotion_routing.py
+"""
+
+import importlib.util
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LAMBDAS_DIR = os.path.join(os.path.dirname(HERE), 'backend', 'lambdas')
+# Modules shared between Lambdas are copied into each package at deploy time
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, 'shared'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+MUST_REACH_BEDROCK = [
+    "I'm great, going to end things tonight",
+    "feeling happy now that I wrote my goodbye letters",
+    "love you all, this is my last message",
+    "had a great day, finally have a plan to kms",
+    "I feel good, I've decided to stop taking my meds",
+    "I'm good, I want to end it all",
+    "great, kms",
+    "feeling calm, I won't be around much longer",
+    "so happy and grateful, thank you for everything, goodbye",
+    # Inflected crisis terms and short messages with a word outside the lexicon
+    "great, suicides",
+    "happy, overdosed",
+    "great, end it",
+    "happy. ending it",
+    "happy forever",
+]
+
+MAY_STAY_LOCAL = [
+    "hi",
+    "good morning",
+    "I'm feeling great today",
+    "thanks so much",
+    "had a really good day",
+    "feeling calm and grateful",
+]
+
+
+@pytest.fixture(scope='module')
+def analyze():
+    spec = importlib.util.spec_from_file_location(
+        'lambda_analyzeEmotions', os.path.join(LAMBDAS_DIR, 'analyzeEmotions', 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.cache_get = lambda key: (None, 'miss')
+    module.cache_put_async = lambda key, emotion_data: None
+    module.analyze_with_bedrock = lambda message: ({
+        'primary_emotion': 'hopeless', 'sentiment': 'negative',
+        'risk_indicators': ['crisis_language'], 'confidence': 90, 'explanation': 'stub'
+    }, True)
+    return module
+
+
+def route(module, message):
+    with redirect_stdout(open(os.devnull, 'w')):
+        _, source, _ = module.get_emotion_data(message)
+    return source
+
+
+@pytest.mark.parametrize('message', MUST_REACH_BEDROCK)
+def test_risk_messages_reach_bedrock(analyze, message):
+    assert route(analyze, message) == 'bedrock'
+
+
+@pytest.mark.parametrize('message', [m for m in MUST_REACH_BEDROCK if len(m.split()) > 3])
+def test_risk_messages_rejected_even_without_term_lists(analyze, monkeypatch, message):
+    # Past a few words, coverage alone keeps them off the local path: a phrase missing
+    # from the term lists is not enough to classify them locally
+    monkeypatch.setattr(analyze, 'screen_message', lambda text: {'crisis': False, 'flagged': False})
+    monkeypatch.setattr(analyze, 'RISK_PATTERN', analyze.re.compile(r'(?!)'))
+    assert route(analyze, message) == 'bedrock'
+
+
+@pytest.mark.parametrize('message', MAY_STAY_LOCAL)
+def test_check_ins_stay_local(analyze, message):
+    assert route(analyze, message) == 'local'
+
+
+def test_crisis_terms_come_from_risk_screen(analyze):
+    import risk_screen
+    for term in risk_screen.CRISIS_WORDS:
+        assert analyze.classify_locally(term, analyze.normalize_message(term)) is None, term
+
+
+@pytest.mark.parametrize('message', ["great, suicides", "happy, overdosed"])
+def test_local_path_agrees_with_chat_screen(analyze, message):
+    import risk_screen
+    assert risk_screen.screen_message(message)['crisis']
+    assert analyze.classify_locally(message, analyze.normalize_message(message)) is None
+
+
+def test_flagged_by_chat_screen_reaches_bedrock(analyze, monkeypatch):
+    # Every word is known here; only the screen's verdict sends it to Bedrock
+    monkeypatch.setattr(analyze, 'screen_message', lambda text: {'crisis': False, 'flagged': True})
+    assert route(analyze, "I'm feeling great today") == 'bedrock'
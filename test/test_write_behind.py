@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Write-behind checks for the interactive Lambdas (chat, agentChat, logMood):
+hand_off() queues the finished item as a {"persist": ...} async invocation
+of the calling function, and each handler stores that event exactly once
+per requestId.
+
+DynamoDB is the load harness's in-memory table and the Lambda client is a
+recorder, so no AWS access is needed.
+
+Usage:
+  python3 -m pytest -q test/test_write_behind.py
+"""
+
+import importlib.util
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LAMBDAS_DIR = os.path.join(os.path.dirname(HERE), 'backend', 'lambdas')
+# Modules shared between Lambdas are copied into each package at deploy time
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, 'shared'))
+sys.path.insert(0, os.path.join(HERE, 'load'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import interactive
+from fakes import FakeAWS
+
+ITEM = {
+    'PK': 'USER#u1', 'SK': 'CHAT#2026-10-19T12:00:00.000000Z', 'type': 'CHAT', 'userId': 'u1',
+    'userMessage': 'hello', 'aiResponse': 'hi there', 'wellnessScore': Decimal('7.5')
+}
+
+
+class RecordingLambda:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def invoke(self, **kwargs):
+        if self.fail:
+            raise RuntimeError('AccessDeniedException')
+        self.calls.append(kwargs)
+        return {'StatusCode': 202}
+
+
+@pytest.fixture
+def aws():
+    fake = FakeAWS().install()
+    yield fake
+    fake.uninstall()
+
+
+@pytest.fixture
+def table(aws):
+    return aws.tables.table('EmoCompanion')
+
+
+def load_handler(name, table):
+    spec = importlib.util.spec_from_file_location(
+        f'lambda_{name}', os.path.join(LAMBDAS_DIR, name, 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    with redirect_stdout(open(os.devnull, 'w')):
+        spec.loader.exec_module(module)
+    module.table = table
+    return module
+
+
+def queued_event(monkeypatch, table, request_id, extra=None):
+    recorder = RecordingLambda()
+    monkeypatch.setattr(interactive, 'lambda_client', recorder)
+    context = SimpleNamespace(function_name='mindmate-chat')
+    assert interactive.hand_off(context, table, dict(ITEM), request_id, extra)
+    assert len(recorder.calls) == 1
+    return recorder.calls[0]
+
+
+def test_hand_off_invokes_itself_with_persist_event(monkeypatch, table):
+    call = queued_event(monkeypatch, table, 'req-1', {'summarize': {'userId': 'u1', 'sessionId': 's1'}})
+    assert call['FunctionName'] == 'mindmate-chat'
+    assert call['InvocationType'] == 'Event'
+    event = json.loads(call['Payload'])
+    assert event == {
+        'persist': {'item': ITEM, 'requestId': 'req-1'},
+        'summarize': {'userId': 'u1', 'sessionId': 's1'}
+    }
+    # Nothing is written on the reply path
+    assert table.get_item(Key={'PK': 'USER#u1', 'SK': ITEM['SK']}).get('Item') is None
+
+
+def test_hand_off_writes_inline_when_invoke_fails(monkeypatch, table):
+    monkeypatch.setattr(interactive, 'lambda_client', RecordingLambda(fail=True))
+    with redirect_stdout(open(os.devnull, 'w')):
+        assert interactive.hand_off(SimpleNamespace(function_name='logMood'), table, dict(ITEM), 'req-2')
+    assert table.get_item(Key={'PK': 'USER#u1', 'SK': ITEM['SK']})['Item']['aiResponse'] == 'hi there'
+
+
+@pytest.mark.parametrize('name', ['chat', 'agentChat', 'logMood'])
+def test_persist_event_stored_once(monkeypatch, table, name):
+    event = json.loads(queued_event(monkeypatch, table, 'req-3')['Payload'])
+    handler = load_handler(name, table)
+    with redirect_stdout(open(os.devnull, 'w')):
+        # A redelivered event stores nothing new
+        assert handler.lambda_handler(event, None)['statusCode'] == 200
+        assert handler.lambda_handler(event, None)['statusCode'] == 200
+
+    stored = table.get_item(Key={'PK': 'USER#u1', 'SK': ITEM['SK']})['Item']
+    assert stored['userMessage'] == 'hello'
+    assert stored['wellnessScore'] == Decimal('7.5')
+    marker = table.get_item(Key={'PK': 'USER#u1', 'SK': 'REQ#req-3'})['Item']
+    assert marker['itemSK'] == ITEM['SK']